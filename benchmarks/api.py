@@ -0,0 +1,272 @@
+"""Прогон всех маршрутов API с подсчётом SQL-запросов и замером задержки"""
+import base64
+import itertools
+import json
+import math
+import re
+import time
+from contextlib import contextmanager
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from config.lms.models import Course, Lesson, Subscription
+from config.lms.paginators import LessonPageNumberPaginator
+from config.lms.tasks import flush_course_update_notification, generate_image_variants
+from .factories import BENCHMARK_PASSWORD, make_image
+from .stripe_server import LocalStripeServer
+
+_counter = itertools.count()
+
+
+class Endpoint:
+    """Описание одного вызова API и его бюджета.
+
+    ``build`` получает Dataset и возвращает (url, data) для очередного вызова,
+    поэтому разрушающие запросы (DELETE, unsubscribe) каждый раз получают свежий объект.
+    """
+
+    def __init__(self, name, method, build, user='user', max_queries=None, p95_ms=None, format=None):
+        self.name = name
+        self.method = method
+        self.build = build
+        self.user = user
+        self.max_queries = max_queries
+        self.p95_ms = p95_ms
+        self.format = format
+
+
+def _course_url(dataset, name='course-detail'):
+    return reverse(name, kwargs={'pk': dataset.course_ids[0]})
+
+
+def _lesson_url(dataset):
+    return reverse('lesson-detail', kwargs={'pk': dataset.lesson_ids[0]})
+
+
+def _fresh_course(dataset):
+    course = Course.objects.create(title='На удаление', preview='courses/previews/bench.png', owner=dataset.user)
+    return reverse('course-detail', kwargs={'pk': course.pk}), None
+
+
+def _fresh_lesson(dataset):
+    lesson = Lesson.objects.create(
+        title='На удаление',
+        course_id=dataset.course_ids[0],
+        preview='lessons/previews/bench.png',
+        video_link='https://youtube.com/embed/x',
+        owner=dataset.user,
+    )
+    return reverse('lesson-detail', kwargs={'pk': lesson.pk}), None
+
+
+def _fresh_subscription(dataset):
+    course_id = dataset.course_ids[-1]
+    Subscription.objects.get_or_create(user=dataset.user, course_id=course_id)
+    return reverse('unsubscribe'), {'course_id': course_id}
+
+
+def _fresh_subscriptions(dataset):
+    course_ids = dataset.course_ids[-20:]
+    Subscription.objects.bulk_create(
+        [Subscription(user=dataset.user, course_id=course_id) for course_id in course_ids], ignore_conflicts=True
+    )
+    return reverse('unsubscribe-bulk'), {'course_ids': course_ids}
+
+
+def _new_course(dataset):
+    return reverse('course-list'), {'title': 'Новый курс', 'description': 'Описание', 'preview': make_image()}
+
+
+def _new_lesson(dataset):
+    return reverse('lesson-list'), {
+        'title': 'Новый урок',
+        'course': dataset.course_ids[0],
+        'description': 'Описание',
+        'video_link': 'https://youtube.com/embed/new',
+        'preview': make_image(),
+    }
+
+
+def _register(dataset):
+    return reverse('auth_register'), {
+        'email': f'new{next(_counter)}@bench.local',
+        'password': 'Str0ng-pass-42',
+        'password2': 'Str0ng-pass-42',
+    }
+
+
+def _token(dataset):
+    return reverse('token_obtain_pair'), {'email': dataset.user.email, 'password': BENCHMARK_PASSWORD}
+
+
+def _token_refresh(dataset):
+    if not hasattr(dataset, 'refresh_token'):
+        response = APIClient().post(*_token(dataset), format='json')
+        dataset.refresh_token = response.data['refresh']
+    return reverse('token_refresh'), {'refresh': dataset.refresh_token}
+
+
+def _deep_cursor_url(name, ids_attr):
+    """Keyset-страница из середины таблицы: курсор указывает на запись в центре набора"""
+    def build(dataset):
+        ids = getattr(dataset, ids_attr)
+        model = Course if ids_attr == 'course_ids' else Lesson
+        obj = model.objects.get(pk=ids[len(ids) // 2])
+        payload = json.dumps({'p': [obj.created_at.isoformat(), obj.id], 'r': 0}, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+        return f'{reverse(name)}?cursor={cursor}', None
+    return build
+
+
+def _deep_page_url(dataset):
+    """Страница номер N из середины списка уроков (1000 при scale=1.0)"""
+    page = max(1, len(dataset.lesson_ids) // LessonPageNumberPaginator.page_size // 2)
+    return f'{reverse("lesson-list")}?page={page}', None
+
+
+def _payment(dataset, name):
+    return reverse(name, kwargs={'pk': dataset.payment_ids[0]}), None
+
+
+# Бюджеты сняты на SQLite при scale=1.0 с запасом по времени; число запросов - точный потолок
+# без управления транзакциями (см. TRANSACTION_CONTROL), одинаковый в команде и в тестах
+ENDPOINTS = [
+    # lms
+    Endpoint('course-list', 'get', lambda d: (reverse('course-list'), None), max_queries=2, p95_ms=150),
+    Endpoint('course-list-expanded', 'get', lambda d: (reverse('course-list') + '?expand=lessons', None),
+             max_queries=3, p95_ms=150),
+    # Валидатор ETag и is_subscribed страницы из кэша
+    Endpoint('course-list-cursor', 'get', _deep_cursor_url('course-list', 'course_ids'), max_queries=2, p95_ms=150),
+    Endpoint('course-detail', 'get', lambda d: (_course_url(d), None), max_queries=2, p95_ms=100),
+    Endpoint('course-create', 'post', _new_course, max_queries=4, p95_ms=150, format='multipart'),
+    Endpoint('course-update', 'patch', lambda d: (_course_url(d), {'title': f'Курс {next(_counter)}'}),
+             max_queries=6, p95_ms=150),
+    Endpoint('course-delete', 'delete', _fresh_course, user='admin', max_queries=8, p95_ms=150),
+    Endpoint('course-publish', 'post', lambda d: (_course_url(d, 'course-publish'), None), user='admin',
+             max_queries=3, p95_ms=100),
+    Endpoint('lesson-list', 'get', lambda d: (reverse('lesson-list'), None), max_queries=2, p95_ms=150),
+    Endpoint('lesson-list-deep', 'get', _deep_page_url, max_queries=2, p95_ms=150),
+    Endpoint('lesson-list-cursor', 'get', _deep_cursor_url('lesson-list', 'lesson_ids'), max_queries=1, p95_ms=100),
+    Endpoint('lesson-create', 'post', _new_lesson, max_queries=3, p95_ms=150, format='multipart'),
+    Endpoint('lesson-detail', 'get', lambda d: (_lesson_url(d), None), max_queries=1, p95_ms=100),
+    Endpoint('lesson-update', 'patch', lambda d: (_lesson_url(d), {'title': f'Урок {next(_counter)}'}),
+             max_queries=3, p95_ms=100),
+    Endpoint('lesson-delete', 'delete', _fresh_lesson, max_queries=5, p95_ms=150),
+    Endpoint('subscribe', 'post', lambda d: (reverse('subscribe'), {'course_id': d.course_ids[-2]}),
+             max_queries=3, p95_ms=100),
+    Endpoint('unsubscribe', 'post', _fresh_subscription, max_queries=4, p95_ms=100),
+    Endpoint('subscribe-bulk', 'post', lambda d: (reverse('subscribe-bulk'), {'course_ids': d.course_ids[-20:]}),
+             max_queries=6, p95_ms=150, format='json'),
+    Endpoint('unsubscribe-bulk', 'post', _fresh_subscriptions, max_queries=7, p95_ms=150, format='json'),
+    Endpoint('search', 'get', lambda d: (reverse('search') + '?q=курс+1', None), max_queries=4, p95_ms=150),
+    # users
+    Endpoint('token', 'post', _token, user=None, max_queries=1, p95_ms=1500, format='json'),
+    Endpoint('token-refresh', 'post', _token_refresh, user=None, max_queries=1, p95_ms=100, format='json'),
+    Endpoint('register', 'post', _register, user=None, max_queries=3, p95_ms=1500, format='json'),
+    Endpoint('user-list', 'get', lambda d: (reverse('user-list'), None), user='admin', max_queries=1, p95_ms=1000),
+    Endpoint('user-detail', 'get', lambda d: (reverse('user-detail', kwargs={'pk': d.user.pk}), None),
+             user='admin', max_queries=1, p95_ms=100),
+    Endpoint('current-user', 'get', lambda d: (reverse('current-user'), None), max_queries=0, p95_ms=100),
+    Endpoint('payment-create', 'post', lambda d: (reverse('payment-create'), {'course_id': d.course_ids[0]}),
+             max_queries=4, p95_ms=150, format='json'),
+    Endpoint('payment-list', 'get', lambda d: (reverse('payment-list'), None), user='admin', max_queries=2, p95_ms=150),
+    Endpoint('payment-list-cursor', 'get', lambda d: (reverse('payment-list') + '?pagination=cursor', None),
+             user='admin', max_queries=1, p95_ms=100),
+    Endpoint('payment-export', 'get', lambda d: (reverse('payment-export') + '?format=csv', None), user='admin',
+             max_queries=1, p95_ms=1500),
+    Endpoint('payment-export-course', 'get',
+             lambda d: (reverse('payment-export') + f'?format=ndjson&course={d.course_ids[0]}', None),
+             user='admin', max_queries=2, p95_ms=150),
+    Endpoint('revenue', 'get', lambda d: (reverse('revenue'), None), user='admin', max_queries=2, p95_ms=100),
+    Endpoint('payment-status', 'get', lambda d: _payment(d, 'payment-status'), max_queries=1, p95_ms=50),
+    Endpoint('payment-success', 'get', lambda d: _payment(d, 'payment-success'), max_queries=1, p95_ms=100),
+    Endpoint('payment-cancel', 'get', lambda d: _payment(d, 'payment-cancel'), max_queries=1, p95_ms=100),
+]
+
+
+@contextmanager
+def local_services():
+    """Направляет Stripe на локальную заглушку: бенчмарк не ходит во внешние сервисы"""
+    with LocalStripeServer() as stripe_server, stripe_server.settings(), \
+            mock.patch.object(flush_course_update_notification, 'apply_async'), \
+            mock.patch.object(generate_image_variants, 'delay'):
+        # Постановка рассылки и копий изображений в очередь не входит в стоимость запроса;
+        # рассылка и копии меряются отдельно
+        yield stripe_server
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = max(0, math.ceil(len(ordered) * percent / 100) - 1)
+    return ordered[index]
+
+
+# BEGIN/COMMIT/SAVEPOINT: вне TestCase каждый atomic() добавляет их в журнал запросов,
+# в бюджет они не входят, иначе числа команды и тестов расходятся
+TRANSACTION_CONTROL = re.compile(r'\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE SAVEPOINT)\b', re.I)
+
+
+def counted_queries(queries):
+    return [query for query in queries if not TRANSACTION_CONTROL.match(query['sql'])]
+
+
+def call(client, endpoint, dataset):
+    """Выполняет один вызов и возвращает (status_code, число запросов без управления транзакциями, время в мс)"""
+    url, data = endpoint.build(dataset)
+    kwargs = {'format': endpoint.format} if endpoint.format else {}
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        response = getattr(client, endpoint.method)(url, data, **kwargs)
+        if response.streaming:
+            b''.join(response.streaming_content)  # Выгрузка читает базу, пока отдаёт ответ
+        elapsed = (time.perf_counter() - started) * 1000
+    return response.status_code, len(counted_queries(queries.captured_queries)), elapsed
+
+
+def make_client(endpoint, dataset, **client_kwargs):
+    client = APIClient(raise_request_exception=False, **client_kwargs)
+    if endpoint.user:
+        client.force_authenticate(user=getattr(dataset, endpoint.user))
+    return client
+
+
+def run_endpoint(endpoint, dataset, iterations=20, warmup=1, **client_kwargs):
+    """Прогоняет эндпоинт и возвращает словарь с результатами для отчёта"""
+    client = make_client(endpoint, dataset, **client_kwargs)
+    for _ in range(warmup):
+        call(client, endpoint, dataset)
+
+    statuses, query_counts, timings = set(), [], []
+    for _ in range(iterations):
+        status_code, queries, elapsed = call(client, endpoint, dataset)
+        statuses.add(status_code)
+        query_counts.append(queries)
+        timings.append(elapsed)
+
+    result = {
+        'method': endpoint.method.upper(),
+        'status': sorted(statuses),
+        'queries': max(query_counts),
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'max_queries': endpoint.max_queries,
+        'p95_budget_ms': endpoint.p95_ms,
+    }
+    result['queries_ok'] = endpoint.max_queries is None or result['queries'] <= endpoint.max_queries
+    # Ошибка или 404 после пары запросов не должны проходить как уложившиеся в бюджет
+    result['status_ok'] = all(200 <= status < 400 for status in statuses)
+    result['latency_ok'] = endpoint.p95_ms is None or result['p95_ms'] <= endpoint.p95_ms
+    return result
+
+
+def run_all(dataset, iterations=20, only=None, **client_kwargs):
+    with local_services():
+        return {
+            endpoint.name: run_endpoint(endpoint, dataset, iterations, **client_kwargs)
+            for endpoint in ENDPOINTS
+            if not only or endpoint.name in only
+        }
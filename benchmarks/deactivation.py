@@ -0,0 +1,81 @@
+"""Деактивация неактивных пользователей: один UPDATE по всей таблице против пачек по диапазонам id"""
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from config.users.models import CustomUser
+from config.users.tasks import deactivation_batches, inactive_users
+from .factories import BATCH_SIZE, BENCHMARK_PASSWORD
+
+
+def seed_users(count, stale_ratio=0.5, months_inactive=6):
+    """count пользователей, у доли stale_ratio последний вход раньше даты отсечения"""
+    password_hash = make_password(BENCHMARK_PASSWORD)
+    now = timezone.now()
+    stale_login = now - timedelta(days=months_inactive * 30 + 1)
+    stale_every = round(1 / stale_ratio) if stale_ratio else 0
+    for start in range(0, count, BATCH_SIZE * 10):
+        CustomUser.objects.bulk_create([
+            CustomUser(
+                email=f'user{i}@bench.local',
+                password=password_hash,
+                is_active=True,
+                last_login=stale_login if stale_every and i % stale_every == 0 else now,
+            )
+            for i in range(start, min(start + BATCH_SIZE * 10, count))
+        ], batch_size=BATCH_SIZE)
+
+
+def reset():
+    CustomUser.objects.filter(is_active=False).update(is_active=True)
+
+
+def legacy(cutoff_date):
+    """Прежняя реализация: один UPDATE, строки заблокированы до конца транзакции"""
+    started = time.perf_counter()
+    count = inactive_users(cutoff_date).update(is_active=False)
+    elapsed = time.perf_counter() - started
+    return {
+        'name': 'legacy',
+        'seconds': round(elapsed, 3),
+        'deactivated': count,
+        'batches': 1,
+        'longest_update_seconds': round(elapsed, 3),
+        'median_update_seconds': round(elapsed, 3),
+    }
+
+
+def batched(cutoff_date, batch_size, pause):
+    """Пачки по диапазонам id; пауза между пачками не выполняется, а добавляется к общему времени"""
+    durations = []
+    counts = []
+    started = time.perf_counter()
+    batch_started = started
+    for _, count in deactivation_batches(cutoff_date, batch_size):
+        now = time.perf_counter()
+        durations.append(now - batch_started)
+        counts.append(count)
+        batch_started = now
+    elapsed = time.perf_counter() - started
+    return {
+        'name': f'batched {batch_size}',
+        'seconds': round(elapsed, 3),
+        'seconds_with_pauses': round(elapsed + pause * max(len(durations) - 1, 0), 3),
+        'deactivated': sum(counts),
+        'batches': len(durations),
+        'longest_update_seconds': round(max(durations, default=0), 4),
+        'median_update_seconds': round(statistics.median(durations), 4) if durations else 0,
+        'rows_per_batch': {'min': min(counts, default=0), 'max': max(counts, default=0)},
+    }
+
+
+def run(batch_sizes, pause, months_inactive=6):
+    cutoff_date = timezone.now() - timedelta(days=months_inactive * 30)
+    results = [legacy(cutoff_date)]
+    for batch_size in batch_sizes:
+        reset()
+        results.append(batched(cutoff_date, batch_size, pause))
+    return results
@@ -0,0 +1,85 @@
+"""Выгрузка платежей: потоковый CSV/NDJSON против сериализации всего списка в один ответ"""
+import random
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from config.users.models import CustomUser, Payment
+from config.users.serializers import PaymentSerializer
+from .factories import BATCH_SIZE, BENCHMARK_PASSWORD, create_courses, create_lessons, create_users
+
+
+def seed_payments(count, seed_value=42):
+    """count платежей пачками, без списка всех объектов в памяти; возвращает администратора"""
+    rng = random.Random(seed_value)
+    user_ids = create_users(1_000, make_password(BENCHMARK_PASSWORD))
+    course_ids = create_courses(100, user_ids)
+    lesson_ids = create_lessons(course_ids, 5, user_ids)
+    for start in range(0, count, BATCH_SIZE * 10):
+        Payment.objects.bulk_create([
+            Payment(
+                user_id=user_ids[i % len(user_ids)],
+                paid_course_id=rng.choice(course_ids) if i % 3 else None,
+                paid_lesson_id=None if i % 3 else rng.choice(lesson_ids),
+                amount=Decimal(rng.randrange(500, 50_000)) / 100,
+                payment_method=rng.choice(['cash', 'transfer', 'card']),
+            )
+            for i in range(start, min(start + BATCH_SIZE * 10, count))
+        ], batch_size=BATCH_SIZE)
+    return CustomUser.objects.create_superuser(email='finance@bench.local', password=BENCHMARK_PASSWORD)
+
+
+def streamed(admin, export_format, query=''):
+    """Эндпоинт выгрузки целиком; возвращает (байт, строк)"""
+    client = APIClient()
+    client.force_authenticate(user=admin)
+    response = client.get(f'{reverse("payment-export")}?format={export_format}{query}')
+    size = lines = 0
+    for chunk in response.streaming_content:
+        size += len(chunk)
+        lines += chunk.count(b'\n')
+    return size, lines
+
+
+def legacy(rows):
+    """Прежний путь: весь queryset через PaymentSerializer в один JSON-ответ"""
+    queryset = Payment.objects.select_related('user', 'paid_course', 'paid_lesson')[:rows]
+    content = JSONRenderer().render(PaymentSerializer(queryset, many=True).data)
+    return len(content), rows
+
+
+def measure(name, export, rows, track_memory=True):
+    started = time.perf_counter()
+    size, _ = export()
+    elapsed = time.perf_counter() - started
+    result = {
+        'name': name,
+        'rows': rows,
+        'seconds': round(elapsed, 2),
+        'rows_per_second': round(rows / elapsed) if elapsed else None,
+        'bytes': size,
+    }
+    if track_memory:
+        # Отдельный прогон: tracemalloc замедляет выполнение
+        tracemalloc.start()
+        try:
+            export()
+            result['peak_memory_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def run(admin, rows, legacy_rows, track_memory=True):
+    results = [
+        measure('csv', lambda: streamed(admin, 'csv'), rows, track_memory),
+        measure('ndjson', lambda: streamed(admin, 'ndjson'), rows, track_memory),
+    ]
+    if legacy_rows:
+        results.append(measure('legacy json', lambda: legacy(legacy_rows), legacy_rows, track_memory))
+    return results
@@ -0,0 +1,133 @@
+"""Фабрики для наполнения базы реалистичным объёмом данных перед бенчмарками"""
+import io
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+
+from config.lms.models import Course, Lesson, Subscription
+from config.users.models import CustomUser, Payment
+
+BENCHMARK_PASSWORD = 'benchpass123'
+
+# Объёмы при scale=1.0
+USERS = 10_000
+COURSES = 1_000
+LESSONS_PER_COURSE = 20
+SUBSCRIPTIONS_PER_USER = 10  # 100k подписок
+PAYMENTS = 50_000
+
+BATCH_SIZE = 2_000
+
+
+class Dataset:
+    """Идентификаторы созданных объектов, нужные для построения запросов"""
+
+    def __init__(self, admin, user, moderator, course_ids, lesson_ids, payment_ids):
+        self.admin = admin
+        self.user = user
+        self.moderator = moderator
+        self.course_ids = course_ids
+        self.lesson_ids = lesson_ids
+        self.payment_ids = payment_ids
+
+
+def make_image(name='preview.png'):
+    """Маленькая PNG-картинка для полей ImageField"""
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), color=(200, 30, 30)).save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+def scaled(value, scale):
+    return max(1, int(value * scale))
+
+
+def create_users(count, password_hash):
+    users = [
+        CustomUser(email=f'user{i}@bench.local', password=password_hash, is_active=True)
+        for i in range(count)
+    ]
+    CustomUser.objects.bulk_create(users, batch_size=BATCH_SIZE)
+    return list(
+        CustomUser.objects.filter(email__startswith='user', email__endswith='@bench.local')
+        .order_by('id').values_list('id', flat=True)
+    )
+
+
+def create_courses(count, owner_ids):
+    courses = [
+        Course(
+            title=f'Курс {i}',
+            description=f'Описание курса {i}. ' * 10,
+            preview='courses/previews/bench.png',
+            owner_id=owner_ids[i % len(owner_ids)],
+        )
+        for i in range(count)
+    ]
+    Course.objects.bulk_create(courses, batch_size=BATCH_SIZE)
+    return list(Course.objects.order_by('id').values_list('id', flat=True))
+
+
+def create_lessons(course_ids, per_course, owner_ids):
+    lessons = [
+        Lesson(
+            course_id=course_id,
+            title=f'Урок {n} курса {course_id}',
+            description=f'Описание урока {n}. ' * 20,
+            preview='lessons/previews/bench.png',
+            video_link=f'https://youtube.com/embed/{course_id}-{n}',
+            owner_id=owner_ids[(course_id + n) % len(owner_ids)],
+        )
+        for course_id in course_ids
+        for n in range(per_course)
+    ]
+    Lesson.objects.bulk_create(lessons, batch_size=BATCH_SIZE)
+    return list(Lesson.objects.order_by('id').values_list('id', flat=True))
+
+
+def create_subscriptions(user_ids, course_ids, per_user):
+    # Шаг 101 даёт разные курсы для одного пользователя, пока per_user * 101 < число курсов * 101
+    per_user = min(per_user, len(course_ids))
+    subscriptions = (
+        Subscription(user_id=user_id, course_id=course_ids[(i * 7 + k * 101) % len(course_ids)])
+        for i, user_id in enumerate(user_ids)
+        for k in range(per_user)
+    )
+    Subscription.objects.bulk_create(subscriptions, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def create_payments(count, user_ids, course_ids, lesson_ids, rng):
+    payments = []
+    for i in range(count):
+        by_course = i % 3 != 0
+        payments.append(Payment(
+            user_id=user_ids[i % len(user_ids)],
+            paid_course_id=rng.choice(course_ids) if by_course else None,
+            paid_lesson_id=None if by_course else rng.choice(lesson_ids),
+            amount=Decimal(rng.randrange(500, 50_000)) / 100,
+            payment_method=rng.choice(['cash', 'transfer']),
+        ))
+    Payment.objects.bulk_create(payments, batch_size=BATCH_SIZE)
+    return list(Payment.objects.order_by('id').values_list('id', flat=True))
+
+
+def seed(scale=1.0, seed_value=42):
+    """Создаёт пользователей, курсы, уроки, подписки и платежи. Возвращает Dataset."""
+    rng = random.Random(seed_value)
+    password_hash = make_password(BENCHMARK_PASSWORD)
+
+    admin = CustomUser.objects.create_superuser(email='admin@bench.local', password=BENCHMARK_PASSWORD)
+    moderator = CustomUser.objects.create_user(email='moderator@bench.local', password=BENCHMARK_PASSWORD)
+    moderator.groups.get_or_create(name='moderators')
+    user_ids = create_users(scaled(USERS, scale), password_hash)
+    user = CustomUser.objects.get(pk=user_ids[0])
+
+    course_ids = create_courses(scaled(COURSES, scale), user_ids)
+    lesson_ids = create_lessons(course_ids, LESSONS_PER_COURSE, user_ids)
+    create_subscriptions(user_ids, course_ids, SUBSCRIPTIONS_PER_USER)
+    payment_ids = create_payments(scaled(PAYMENTS, scale), user_ids, course_ids, lesson_ids, rng)
+
+    return Dataset(admin, user, moderator, course_ids, lesson_ids, payment_ids)
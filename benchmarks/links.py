@@ -0,0 +1,68 @@
+"""Микробенчмарк проверки ссылок: прежний validate_no_external_links против сканера lms.validators"""
+import re
+import statistics
+import time
+from urllib.parse import urlparse
+
+from config.lms.validators import DEFAULT_ALLOWED_LINK_DOMAINS, external_links
+
+WORDS = 'урок описание пример задача python функция список '.split()
+
+
+def legacy_external_links(text):
+    """Прежняя реализация (с её ошибкой: youtu.be считался сторонним доменом), без исключения"""
+    urls = re.findall(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', text)
+    found = []
+    for url in urls:
+        domain = urlparse(url).netloc.lower()
+        if not domain.endswith('youtube.com') or domain.endswith('youtu.be'):
+            found.append(url)
+    return found
+
+
+def make_text(size, link_every=200):
+    """Описание урока примерно из size символов со ссылкой на YouTube через каждые link_every слов"""
+    parts = []
+    length = 0
+    n = 0
+    while length < size:
+        word = f'https://www.youtube.com/watch?v=lesson{n}' if n % link_every == link_every - 1 else WORDS[n % len(WORDS)]
+        parts.append(word)
+        length += len(word) + 1
+        n += 1
+    return ' '.join(parts)
+
+
+CASES = (
+    ('short description', make_text(300, link_every=20)),
+    ('video link', 'https://youtu.be/dQw4w9WgXcQ'),
+    ('large lesson 100KB', make_text(100_000)),
+    ('large lesson 1MB', make_text(1_000_000)),
+    # Длинный "хвост" без разделителей после схемы
+    ('1MB unbroken url', 'https://youtube.com/' + 'a' * 1_000_000),
+)
+
+
+def _median(check, text, iterations):
+    times = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        check(text)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+def measure(iterations=20):
+    """Медианное время проверки одного текста (мкс) для каждого случая"""
+    results = []
+    for name, text in CASES:
+        legacy = _median(legacy_external_links, text, iterations)
+        scanner = _median(lambda value: external_links(value, DEFAULT_ALLOWED_LINK_DOMAINS), text, iterations)
+        results.append({
+            'name': name,
+            'chars': len(text),
+            'legacy_us': round(legacy * 1e6, 1),
+            'scanner_us': round(scanner * 1e6, 1),
+            'speedup': round(legacy / scanner, 1) if scanner else None,
+        })
+    return results
@@ -0,0 +1,77 @@
+"""Пропускная способность рассылки уведомлений об обновлении курса"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.mail import send_mail
+from django.db import connection
+from django.template.loader import render_to_string
+
+from config.lms.models import Course, Subscription
+from config.lms.tasks import NOTIFICATION_CHUNK_SIZE, send_course_update_chunk
+from .factories import BENCHMARK_PASSWORD, create_users
+
+
+def seed_course(subscribers):
+    """Курс с заданным числом подписчиков"""
+    user_ids = create_users(subscribers, make_password(BENCHMARK_PASSWORD))
+    course = Course.objects.create(title='Курс для рассылки', preview='courses/previews/bench.png')
+    Subscription.objects.bulk_create(
+        [Subscription(user_id=user_id, course=course) for user_id in user_ids], batch_size=2_000
+    )
+    return course
+
+
+def legacy_fan_out(course_id):
+    """Прежняя реализация: send_mail и рендер шаблона на каждого подписчика"""
+    subscriptions = Subscription.objects.filter(course_id=course_id).select_related('user', 'course')
+    for subscription in subscriptions:
+        message = render_to_string('emails/course_update.html', {
+            'course': subscription.course,
+            'user': subscription.user
+        })
+        send_mail(
+            subject=f"Обновление курса: {subscription.course.title}",
+            message='',
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=[subscription.user.email],
+            html_message=message,
+            fail_silently=False
+        )
+
+
+def _run_chunk(course_id, chunk):
+    try:
+        return send_course_update_chunk(course_id, chunk)
+    finally:
+        connection.close()
+
+
+def chunked_fan_out(course_id, workers=1, chunk_size=NOTIFICATION_CHUNK_SIZE):
+    """Новая реализация: пачки по одному SMTP-соединению, ``workers`` пачек одновременно
+    (как параллельные воркеры Celery при выполнении group)"""
+    user_ids = list(
+        Subscription.objects.filter(course_id=course_id).order_by('user_id').values_list('user_id', flat=True)
+    )
+    chunks = [user_ids[start:start + chunk_size] for start in range(0, len(user_ids), chunk_size)]
+    if workers == 1:
+        for chunk in chunks:
+            send_course_update_chunk(course_id, chunk)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lambda chunk: _run_chunk(course_id, chunk), chunks))
+
+
+def measure(name, fan_out, smtp_server, subscribers):
+    smtp_server.reset()
+    started = time.perf_counter()
+    fan_out()
+    elapsed = time.perf_counter() - started
+    return {
+        'name': name,
+        'seconds': round(elapsed, 3),
+        'messages': smtp_server.messages,
+        'smtp_connections': smtp_server.connections,
+        'messages_per_second': round(subscribers / elapsed, 1) if elapsed else None,
+    }
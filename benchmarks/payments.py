@@ -0,0 +1,86 @@
+"""Нагрузочный прогон оформления оплаты: синхронный эндпоинт против асинхронного при медленном Stripe"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, Client
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from config.lms.models import Course
+from config.lms.services.stripe_service import get_stripe_client
+from config.users.models import CustomUser
+from .api import percentile
+
+
+def seed_checkout():
+    """Покупатель и курс; возвращает (course_id, заголовок Authorization)"""
+    user = CustomUser.objects.create(email='buyer@bench.local')
+    course = Course.objects.create(title='Курс для оплаты', price=Decimal('990.00'))
+    return course.id, f'Bearer {AccessToken.for_user(user)}'
+
+
+def _summary(name, statuses, timings, elapsed):
+    return {
+        'name': name,
+        'requests': len(timings),
+        'errors': sum(1 for status in statuses if status != 201),
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(timings) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(percentile(timings, 50), 1),
+        'p95_ms': round(percentile(timings, 95), 1),
+    }
+
+
+def run_sync(course_id, authorization, requests, workers=1):
+    """Синхронный PaymentCreateAPIView; ``workers`` - число потоков, как sync-воркеры gunicorn"""
+    url = reverse('payment-create')
+
+    def checkout(_):
+        client = Client()
+        started = time.perf_counter()
+        response = client.post(url, {'course_id': course_id}, content_type='application/json',
+                               HTTP_AUTHORIZATION=authorization)
+        return response.status_code, (time.perf_counter() - started) * 1000
+
+    checkout(None)  # прогрев: продукт и цена создаются при первом оформлении
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(checkout, range(requests)))
+    elapsed = time.perf_counter() - started
+    statuses, timings = zip(*results)
+    return _summary(f'sync x{workers}', statuses, timings, elapsed)
+
+
+async def _run_async(course_id, authorization, requests, concurrency):
+    url = reverse('payment-create-async')
+    client = AsyncClient()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def checkout():
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(url, {'course_id': course_id}, content_type='application/json',
+                                         headers={'Authorization': authorization})
+            return response.status_code, (time.perf_counter() - started) * 1000
+
+    await checkout()
+    started = time.perf_counter()
+    try:
+        results = await asyncio.gather(*(checkout() for _ in range(requests)))
+    finally:
+        await get_stripe_client().aclose()
+    elapsed = time.perf_counter() - started
+    statuses, timings = zip(*results)
+    return _summary(f'async c{concurrency}', statuses, timings, elapsed)
+
+
+def run_async(course_id, authorization, requests, concurrency=100):
+    """Асинхронный эндпоинт в одном event loop; ``concurrency`` - запросов в работе одновременно.
+
+    Запуск через async_to_sync: запросы к базе из async ORM выполняются в этом же потоке,
+    как в одном воркере uvicorn.
+    """
+    return async_to_sync(_run_async)(course_id, authorization, requests, concurrency)
@@ -0,0 +1,86 @@
+"""Микробенчмарк сериализации списков: сериализаторы DRF против FastSerializer, стоимость одной строки"""
+import statistics
+import time
+
+from django.contrib.auth.hashers import make_password
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from config.lms.fastpath import FastJSONRenderer, FastSerializer
+from config.lms.models import Course, Lesson
+from config.lms.planning import plan_queryset
+from config.lms.serializers import CourseSerializer, LessonSerializer
+from config.users.models import CustomUser
+from .factories import BENCHMARK_PASSWORD, LESSONS_PER_COURSE, create_courses, create_lessons, create_users
+
+CASES = (
+    ('courses', Course, CourseSerializer),
+    ('lessons', Lesson, LessonSerializer),
+)
+
+
+def seed_catalog(courses):
+    """Курсы по LESSONS_PER_COURSE уроков; возвращает пользователя для запросов"""
+    user_ids = create_users(10, make_password(BENCHMARK_PASSWORD))
+    course_ids = create_courses(courses, user_ids)
+    create_lessons(course_ids, LESSONS_PER_COURSE, user_ids)
+    return CustomUser.objects.get(pk=user_ids[0])
+
+
+def make_request(user):
+    request = Request(APIRequestFactory().get('/api/', {'expand': 'lessons'}))
+    request.user = user
+    return request
+
+
+def drf_list(model, serializer_class, request, rows):
+    queryset = plan_queryset(model.objects.all(), serializer_class, request).order_by('id')[:rows]
+    return serializer_class(queryset, many=True, context={'request': request}).data
+
+
+def fast_list(model, serializer_class, request, rows):
+    serializer = FastSerializer(serializer_class, request)
+    queryset = plan_queryset(model.objects.all(), serializer_class, request).order_by('id')
+    return serializer.serialize(serializer.values(queryset)[:rows])
+
+
+def _timed(build, renderer, iterations):
+    data_times, render_times = [], []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        data = build()
+        built = time.perf_counter()
+        content = renderer.render(data)
+        data_times.append(built - started)
+        render_times.append(time.perf_counter() - built)
+    return statistics.median(data_times), statistics.median(render_times), content
+
+
+def measure(user, rows, iterations=20):
+    """Медианное время на строку (мкс): получение и сериализация данных, рендер JSON, всего"""
+    request = make_request(user)
+    results = []
+    for name, model, serializer_class in CASES:
+        timings = {}
+        outputs = {}
+        for mode, build, renderer in (
+            ('drf', drf_list, JSONRenderer()),
+            ('fast', fast_list, FastJSONRenderer()),
+        ):
+            data_time, render_time, outputs[mode] = _timed(
+                lambda: build(model, serializer_class, request, rows), renderer, iterations
+            )
+            timings[mode] = {
+                'data_us_per_row': round(data_time / rows * 1e6, 1),
+                'render_us_per_row': round(render_time / rows * 1e6, 1),
+                'total_us_per_row': round((data_time + render_time) / rows * 1e6, 1),
+            }
+        results.append({
+            'name': name,
+            'rows': rows,
+            'identical': outputs['drf'] == outputs['fast'],
+            'speedup': round(timings['drf']['total_us_per_row'] / timings['fast']['total_us_per_row'], 2),
+            **timings,
+        })
+    return results
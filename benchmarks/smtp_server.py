@@ -0,0 +1,97 @@
+"""Локальный SMTP-сервер для бенчмарков: принимает письма и только считает их.
+
+Запуск отдельно: ``python -m benchmarks.smtp_server --port 1025``
+(в настройках: EMAIL_HOST=127.0.0.1, EMAIL_PORT=1025, EMAIL_USE_SSL=False).
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        if server.connect_latency:
+            time.sleep(server.connect_latency)  # как TLS-рукопожатие у настоящего сервера
+        self.reply('220 localhost ESMTP bench')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250 localhost')
+            elif command.startswith(('MAIL', 'RCPT', 'RSET', 'NOOP')):
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                if server.latency:
+                    time.sleep(server.latency)
+                with server.lock:
+                    server.messages += 1
+                self.reply('250 OK queued')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """SMTP-заглушка. ``latency`` - задержка на каждое письмо, ``connect_latency`` - на соединение (в секундах)."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, connect_latency=0.0):
+        super().__init__((host, port), SMTPHandler)
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = 0
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def reset(self):
+        with self.lock:
+            self.connections = 0
+            self.messages = 0
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=1025)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--connect-latency', type=float, default=0.0)
+    args = parser.parse_args()
+    with LocalSMTPServer(args.host, args.port, args.latency, args.connect_latency) as server:
+        print(f'SMTP stand-in listening on {args.host}:{server.port}')
+        try:
+            while True:
+                time.sleep(5)
+                print(f'connections={server.connections} messages={server.messages}')
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""Локальная заглушка Stripe API: хранит объекты в памяти, считает вызовы и соединения.
+
+Запуск отдельно: ``python -m benchmarks.stripe_server --port 12111``
+(в настройках: STRIPE_API_BASE=http://127.0.0.1:12111, STRIPE_SECRET_KEY=sk_test_local).
+Поддерживает только вызовы, которые делает lms/services/stripe_service.py.
+"""
+import argparse
+import itertools
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+from django.test.utils import override_settings
+
+# Путь POST-запроса -> (операция, префикс ID, тип объекта)
+CREATE_ROUTES = {
+    '/v1/products': ('Product.create', 'prod', 'product'),
+    '/v1/prices': ('Price.create', 'price', 'price'),
+    '/v1/checkout/sessions': ('checkout.Session.create', 'cs', 'checkout.session'),
+}
+SESSION_PATH = '/v1/checkout/sessions/'
+
+
+class StripeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive: по числу соединений видно, переиспользует ли их клиент
+    disable_nagle_algorithm = True  # заголовки и тело пишутся отдельно, иначе +40 мс на delayed ACK
+
+    def handle(self):
+        with self.server.lock:
+            self.server.connections += 1
+        super().handle()
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def error(self, status, message, error_type='invalid_request_error'):
+        self.reply(status, {'error': {'type': error_type, 'message': message}})
+
+    def injected_failure(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        with server.lock:
+            if server.failures_left:
+                server.failures_left -= 1
+                return server.failure_status
+        return None
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        params = dict(parse_qsl(self.rfile.read(length).decode()))
+        route = CREATE_ROUTES.get(self.path)
+        if route is None:
+            return self.error(404, f'Unrecognized request URL (POST: {self.path})')
+        operation, prefix, object_type = route
+
+        server = self.server
+        with server.lock:
+            server.calls[operation] += 1
+        status = self.injected_failure()
+        if status:
+            return self.error(status, 'Injected failure', 'api_error')
+
+        key = self.headers.get('Idempotency-Key')
+        with server.lock:
+            # Как и настоящий Stripe, повтор с тем же ключом возвращает уже созданный объект
+            if key and key in server.idempotent:
+                return self.reply(200, server.idempotent[key])
+            obj = server.create(object_type, prefix, params)
+            if key:
+                server.idempotent[key] = obj
+        self.reply(200, obj)
+
+    def do_GET(self):
+        if not self.path.startswith(SESSION_PATH):
+            return self.error(404, f'Unrecognized request URL (GET: {self.path})')
+        server = self.server
+        with server.lock:
+            server.calls['checkout.Session.retrieve'] += 1
+        status = self.injected_failure()
+        if status:
+            return self.error(status, 'Injected failure', 'api_error')
+
+        obj = server.objects.get(self.path[len(SESSION_PATH):].split('?')[0])
+        if obj is None:
+            return self.error(404, 'No such checkout.session')
+        self.reply(200, obj)
+
+
+class LocalStripeServer(ThreadingHTTPServer):
+    """Заглушка Stripe. ``latency`` - задержка ответа в секундах, ``fail_next`` - ответить ошибкой N раз."""
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 256  # при очереди по умолчанию (5) одновременные подключения ждут повтора SYN
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        super().__init__((host, port), StripeHandler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.reset()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def reset(self):
+        with self.lock:
+            self.ids = itertools.count(1)
+            self.calls = Counter()
+            self.connections = 0
+            self.objects = {}
+            self.idempotent = {}
+            self.failures_left = 0
+            self.failure_status = 500
+
+    def handle_error(self, request, client_address):
+        # Клиент с коротким таймаутом закрывает соединение раньше ответа - это ожидаемо
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def fail_next(self, count, status=500):
+        with self.lock:
+            self.failures_left = count
+            self.failure_status = status
+
+    def create(self, object_type, prefix, params):
+        obj = {key: value for key, value in params.items() if '[' not in key}
+        obj.update(id=f'{prefix}_{next(self.ids)}', object=object_type, livemode=False)
+        if object_type == 'price':
+            obj['unit_amount'] = int(obj['unit_amount'])
+        if object_type == 'checkout.session':
+            obj.update(url=f'https://checkout.stripe.local/{obj["id"]}', payment_status='unpaid', status='open')
+        self.objects[obj['id']] = obj
+        return obj
+
+    def settings(self, **overrides):
+        """Настройки, направляющие stripe_service на эту заглушку"""
+        return override_settings(
+            STRIPE_API_BASE=self.url,
+            STRIPE_SECRET_KEY='sk_test_local',
+            **overrides,
+        )
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=12111)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+    with LocalStripeServer(args.host, args.port, args.latency) as server:
+        print(f'Stripe stand-in listening on {server.url}')
+        try:
+            while True:
+                time.sleep(5)
+                print(f'connections={server.connections} calls={dict(server.calls)}')
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
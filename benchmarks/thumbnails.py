@@ -0,0 +1,52 @@
+"""Объём, который скачивает клиент: оригинал превью против копий lms.thumbnails, и время построения копий"""
+import io
+import time
+
+from PIL import Image
+
+from config.lms.thumbnails import render
+
+# Типичная загрузка: фото с камеры телефона (JPEG) и скриншот (PNG)
+SOURCES = (
+    ('photo 4032x3024 jpeg', (4032, 3024), 'JPEG', {'quality': 92}),
+    ('screenshot 2560x1440 png', (2560, 1440), 'PNG', {}),
+)
+
+
+def make_source(size, image_format, options):
+    """Фрактал с деталями на всех масштабах и шум сенсора: сжимается примерно как фотография"""
+    detail = Image.effect_mandelbrot(size, (-2.0, -1.2, 1.0, 1.2), 100)
+    gradient = Image.linear_gradient('L').resize(size)
+    noise = Image.effect_noise(size, 12)
+    mirrored = detail.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+    image = Image.merge('RGB', (detail, Image.blend(gradient, noise, 0.3), mirrored))
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def measure(iterations=3):
+    """Байты оригинала и каждой копии, медианное время построения всех копий одного файла"""
+    results = []
+    for name, size, image_format, options in SOURCES:
+        content = make_source(size, image_format, options)
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            rendered = render(io.BytesIO(content))
+            timings.append(time.perf_counter() - started)
+        results.append({
+            'name': name,
+            'original_bytes': len(content),
+            'render_seconds': round(sorted(timings)[len(timings) // 2], 3),
+            'variants': [
+                {
+                    'width': width,
+                    'format': variant_format,
+                    'bytes': len(variant),
+                    'saved': round(1 - len(variant) / len(content), 3),
+                }
+                for width, variant_format, variant in rendered
+            ],
+        })
+    return results
@@ -0,0 +1,11 @@
+"""Настройки gunicorn: gunicorn config.wsgi:application -c config/gunicorn.py"""
+import os
+
+bind = '0.0.0.0:8000'
+
+
+def child_exit(server, worker):
+    # Live-gauge завершившегося воркера не должны попадать в сумму /metrics
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from config.lms.metrics import mark_process_dead
+        mark_process_dead(worker.pid)
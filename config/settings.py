@@ -48,6 +48,8 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
 MIDDLEWARE = [
+    'lms.profiling.ProfilingMiddleware',  # Первым, чтобы общее время включало остальные middleware
+    'lms.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -87,6 +89,15 @@ DATABASES = {
     }
 }
 
+# Локальный запуск без PostgreSQL (тесты, бенчмарки)
+if os.getenv('DB_ENGINE') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -123,13 +134,32 @@ AUTH_USER_MODEL = 'users.CustomUser'
 
 CACHES = {
     'default': {
-        'BACKEND': 'dgango.core.cache.backends.redis.RedisCache',
-        'LOCATION': 'redis://redis:6379/1',
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('CACHE_REDIS_URL', 'redis://redis:6379/1'),
     }
 }
 
+# В тестах и без Redis - кэш в памяти процесса
+if 'test' in sys.argv or os.getenv('CACHE_BACKEND') == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
 STRIPE_PUBLIC_KEY = os.getenv('STRIPE_PUBLIC_KEY')
+STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET')
+STRIPE_API_BASE = os.getenv('STRIPE_API_BASE')  # Например, адрес локальной заглушки benchmarks.stripe_server
+STRIPE_CONNECT_TIMEOUT = float(os.getenv('STRIPE_CONNECT_TIMEOUT', 3.05))
+STRIPE_READ_TIMEOUT = float(os.getenv('STRIPE_READ_TIMEOUT', 10))
+STRIPE_MAX_RETRIES = int(os.getenv('STRIPE_MAX_RETRIES', 2))
+
+# Профилирование запросов (lms/profiling.py): Server-Timing и сводка по маршрутам в кэше
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False') == 'True'
+PROFILING_SLOW_QUERY_MS = float(os.getenv('PROFILING_SLOW_QUERY_MS', 100))
+PROFILING_WINDOW_SECONDS = 60 * 60
+PROFILING_BUCKET_SECONDS = 5 * 60
 
 # Настройки документации
 SWAGGER_SETTINGS = {
@@ -193,4 +223,12 @@ CELERY_BEAT_SCHEDULE = {
             'timezone': 'Europe/Moscow'
         }
     },
+    'reconcile-pending-payments': {
+        'task': 'users.tasks.reconcile_pending_payments',
+        'schedule': crontab(minute='*/10'),  # Сверка платежей, по которым не пришёл вебхук
+    },
+    'refresh-revenue-rollups': {
+        'task': 'users.tasks.refresh_revenue_rollups',
+        'schedule': crontab(minute='*/5'),  # Свёртка новых оплат в таблицы дневной выручки
+    },
 }
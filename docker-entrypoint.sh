@@ -0,0 +1,11 @@
+#!/bin/sh
+set -e
+
+# Файлы метрик прошлого запуска службы: PID умерших процессов не повторятся, а их файлы
+# копились бы на постоянном томе и попадали в /metrics
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
+exec "$@"
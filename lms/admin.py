@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Course, Lesson
+from .search import matching, search_terms
 
 
 class LessonInline(admin.TabularInline):
@@ -7,15 +8,24 @@ class LessonInline(admin.TabularInline):
     extra = 1
 
 
+class FullTextSearchMixin:
+    """Поиск в админке по полнотекстовому индексу (lms.search) вместо icontains по search_fields"""
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_terms(search_term):
+            return super().get_search_results(request, queryset, search_term)
+        return matching(queryset, search_term), False
+
+
 @admin.register(Course)
-class CourseAdmin(admin.ModelAdmin):
-    list_display = ('title', 'created_at', 'updated_at')
+class CourseAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    list_display = ('title', 'lessons_count', 'subscribers_count', 'created_at', 'updated_at')
     search_fields = ('title', 'description')
     inlines = [LessonInline]
 
 
 @admin.register(Lesson)
-class LessonAdmin(admin.ModelAdmin):
+class LessonAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('title', 'course', 'created_at', 'updated_at')
     list_filter = ('course',)
-    search_fields = ('title', 'description')
\ No newline at end of file
+    search_fields = ('title', 'description')
@@ -0,0 +1,133 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from rest_framework.response import Response
+
+CACHE_TIMEOUT = 60 * 15
+
+
+def _new_version():
+    # Версия от времени не совпадёт со старыми ключами, если счётчик был вытеснен из кэша
+    return int(time.time() * 1000)
+
+
+def list_version_key(namespace):
+    return f'lms:{namespace}:list:version'
+
+
+def object_version_key(namespace, pk):
+    return f'lms:{namespace}:{pk}:version'
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """Инвалидирует все ответы, построенные на этой версии"""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), None)
+
+
+def invalidate_list(namespace):
+    bump_version(list_version_key(namespace))
+
+
+def invalidate_object(namespace, pk):
+    bump_version(object_version_key(namespace, pk))
+
+
+def changed_at_key(name):
+    return f'lms:{name}:changed_at'
+
+
+def get_changed_at(name):
+    """Время изменения, которое не видно по updated_at в базе (удаление, подписка).
+
+    Если отметка вытеснена из кэша, изменение считается только что случившимся.
+    """
+    key = changed_at_key(name)
+    changed_at = cache.get(key)
+    if changed_at is None:
+        cache.add(key, time.time(), None)
+        changed_at = cache.get(key)
+    return changed_at
+
+
+def touch(name):
+    cache.set(changed_at_key(name), time.time(), None)
+
+
+def list_cache_key(namespace, request):
+    version = get_version(list_version_key(namespace))
+    # В ключ входит полный URL: от хоста и параметров зависят next/previous в пагинации
+    url_hash = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f'lms:{namespace}:list:{version}:{url_hash}'
+
+
+def object_cache_key(namespace, pk, request=None):
+    version = get_version(object_version_key(namespace, pk))
+    key = f'lms:{namespace}:{pk}:{version}'
+    if request is not None and request.query_params:
+        # ?fields= и ?expand= меняют состав ответа
+        params = sorted((name, sorted(values)) for name, values in request.query_params.lists())
+        key += ':' + hashlib.md5(repr(params).encode()).hexdigest()
+    return key
+
+
+class CachedResponseMixin:
+    """Кэширует ответы list/retrieve в общем кэше.
+
+    Поля из ``user_fields`` зависят от пользователя: они вырезаются из кэшируемого ответа
+    и заново заполняются в ``personalize``. Подходит только для view без объектных
+    прав на чтение - при попадании в кэш get_object не вызывается.
+    """
+    cache_namespace = None
+    user_fields = ()
+
+    def personalize(self, items):
+        """Заполняет user_fields у сериализованных объектов для текущего пользователя"""
+
+    def list(self, request, *args, **kwargs):
+        key = list_cache_key(self.cache_namespace, request)
+        data = cache.get(key)
+        if data is None:
+            response = super().list(request, *args, **kwargs)
+            cache.set(key, self._shared(response.data), CACHE_TIMEOUT)
+            return response
+        self.personalize(self._items(data))
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        key = object_cache_key(self.cache_namespace, pk, request)
+        data = cache.get(key)
+        if data is None:
+            response = super().retrieve(request, *args, **kwargs)
+            cache.set(key, self._shared(response.data), CACHE_TIMEOUT)
+            return response
+        self.personalize([data])
+        return Response(data)
+
+    @staticmethod
+    def _items(data):
+        if isinstance(data, dict) and 'results' in data:
+            return data['results']
+        if isinstance(data, dict):
+            return [data]
+        return data
+
+    def _shared(self, data):
+        """Копия ответа без пользовательских полей"""
+        if isinstance(data, dict) and 'results' in data:
+            return {**data, 'results': self._shared(data['results'])}
+        if isinstance(data, dict):
+            return {key: value for key, value in data.items() if key not in self.user_fields}
+        return [self._shared(item) for item in data]
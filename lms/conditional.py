@@ -0,0 +1,81 @@
+"""Условные GET-запросы: ETag и Last-Modified для list/retrieve без сериализации ответа.
+
+Валидаторы считаются одним запросом к queryset view: max(updated_at) и count для списка,
+updated_at объекта для детального ответа. Изменения, которых не видно по updated_at (удаления,
+подписки пользователя), учитываются через отметки времени в кэше (``lms.cache.touch``).
+"""
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .cache import get_changed_at
+
+
+class ConditionalGetMixin:
+    """Миксин для view: 304 Not Modified, если у клиента актуальный ответ.
+
+    ``conditional_namespace`` - имя отметки удалений для списка (ставится в signals).
+    Как и CachedResponseMixin, подходит только для view без объектных прав на чтение:
+    304 отдаётся до get_object.
+    """
+    conditional_namespace = None
+    updated_field = 'updated_at'
+
+    def get_changed_at(self):
+        """Отметки времени из кэша, от которых зависит ответ, помимо updated_at"""
+        return []
+
+    def get_validator_queryset(self):
+        get_queryset = getattr(self, 'get_base_queryset', self.get_queryset)  # без аннотаций QueryPlanMixin
+        return self.filter_queryset(get_queryset()).order_by()
+
+    def list_validators(self):
+        stats = self.get_validator_queryset().aggregate(last=Max(self.updated_field), count=Count('pk'))
+        changed_at = [get_changed_at(f'{self.conditional_namespace}:list'), *self.get_changed_at()]
+        return self.make_validators(stats['last'], changed_at, stats['count'])
+
+    def retrieve_validators(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.get_validator_queryset()
+        try:
+            updated_at = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]}) \
+                .values_list(self.updated_field, flat=True).first()
+        except (TypeError, ValueError, ValidationError):
+            updated_at = None
+        if updated_at is None:
+            return None, None  # 404 отдаст сам view
+        return self.make_validators(updated_at, self.get_changed_at())
+
+    def make_validators(self, updated_at, changed_at, *state):
+        """(ETag, Last-Modified) для данных, изменённых не позже updated_at и отметок changed_at"""
+        timestamps = [*changed_at, updated_at.timestamp()] if updated_at else list(changed_at)
+        last_modified = int(max(timestamps)) if timestamps else None
+        # От URL зависят страница и ?fields=, от типа ответа - формат и отступы
+        key = repr([self.request.get_full_path(), self.request.accepted_media_type, updated_at, *changed_at, *state])
+        etag = 'W/' + quote_etag(hashlib.md5(key.encode()).hexdigest())
+        return etag, last_modified
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(self.list_validators, super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(self.retrieve_validators, super().retrieve, request, *args, **kwargs)
+
+    @staticmethod
+    def conditional(validators, view, request, *args, **kwargs):
+        etag, last_modified = validators()
+        response = None
+        if etag is not None:
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = view(request, *args, **kwargs)
+        if etag is not None and (200 <= response.status_code < 300 or response.status_code == 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            # Ответ зависит от пользователя: хранить только у клиента и сверять перед использованием
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -0,0 +1,133 @@
+"""Денормализованные счётчики курса: Course.lessons_count и Course.subscribers_count.
+
+Создание, удаление (в том числе каскадное) и перенос одной строки обновляют счётчик в signals,
+массовые операции - методы CounterQuerySet. Счётчик меняется выражением F() в одном UPDATE,
+без чтения текущего значения. Расхождения чинит команда ``reconcile_course_counters``.
+"""
+from collections import Counter, defaultdict
+
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+UPDATE_BATCH_SIZE = 1000  # Курсов в одном UPDATE ... WHERE id IN (...)
+
+
+def update_counters(course_model, field, deltas, course_ids=(), **updates):
+    """``field += deltas[pk]`` и ``updates`` для курсов из deltas и course_ids.
+
+    Один UPDATE на каждое значение приращения: у массовых операций оно обычно одно.
+    """
+    groups = defaultdict(set)
+    for pk, delta in deltas.items():
+        groups[delta].add(pk)
+    groups[0].update(set(course_ids) - set(deltas))
+    for delta, ids in groups.items():
+        ids = sorted(pk for pk in ids if pk is not None)
+        values = dict(updates)
+        if delta:
+            values[field] = Greatest(F(field) + delta, Value(0))
+        if not (ids and values):
+            continue
+        for start in range(0, len(ids), UPDATE_BATCH_SIZE):
+            course_model._default_manager.filter(pk__in=ids[start:start + UPDATE_BATCH_SIZE]).update(**values)
+
+
+def count_subquery(model, course_field='course'):
+    """Число строк model для курса из внешнего запроса"""
+    counted = model._default_manager.filter(**{course_field: OuterRef('pk')}).order_by() \
+        .values(course_field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counted), Value(0))
+
+
+def recount(model, course_ids, **updates):
+    """Пересчитывает счётчик model у курсов course_ids по фактическим строкам"""
+    course_ids = {pk for pk in course_ids if pk is not None}
+    if course_ids:
+        course_model = model._meta.get_field('course').related_model
+        course_model._default_manager.filter(pk__in=course_ids) \
+            .update(**{model.course_counter: count_subquery(model)}, **updates)
+
+
+class CountedInCourse:
+    """Миксин модели, строки которой считает поле курса ``course_counter``.
+
+    Запоминает курс, с которым объект загружен из базы, чтобы при переносе
+    уменьшить счётчик старого курса.
+    """
+    course_counter = None
+
+    @classmethod
+    def course_updates(cls):
+        """Дополнительные поля курса, которые меняются вместе со счётчиком"""
+        return {}
+
+    @classmethod
+    def update_courses(cls, deltas, course_ids=()):
+        course_model = cls._meta.get_field('course').related_model
+        update_counters(course_model, cls.course_counter, deltas, course_ids, **cls.course_updates())
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_course_id = instance.__dict__.get('course_id')
+        return instance
+
+    def counter_saved(self, created):
+        """Обновляет счётчики курсов после save"""
+        previous = getattr(self, '_loaded_course_id', None)
+        if created:
+            deltas = {self.course_id: 1}
+        elif previous is not None and previous != self.course_id:
+            deltas = {previous: -1, self.course_id: 1}
+        else:
+            deltas = {}
+        self._loaded_course_id = self.course_id
+        self.update_courses(deltas, [self.course_id])
+
+    def counter_deleted(self, origin):
+        """Обновляет счётчик курса после удаления, если его не учёл CounterQuerySet.delete"""
+        course_model = self._meta.get_field('course').related_model
+        if isinstance(origin, course_model) or getattr(origin, 'model', None) is course_model:
+            return  # каскад от удаления самого курса
+        if isinstance(origin, CounterQuerySet) and origin.model is type(self):
+            return
+        self.update_courses({self.course_id: -1})
+
+
+class CounterQuerySet(models.QuerySet):
+    """Массовые bulk_create и delete со счётчиком курса: один UPDATE вместо UPDATE на строку"""
+
+    def bulk_create(self, objs, batch_size=None, ignore_conflicts=False, update_conflicts=False, **kwargs):
+        with transaction.atomic(using=self.db, savepoint=False):
+            objs = super().bulk_create(
+                objs, batch_size=batch_size, ignore_conflicts=ignore_conflicts,
+                update_conflicts=update_conflicts, **kwargs
+            )
+            if ignore_conflicts or update_conflicts:
+                # Какие строки действительно вставлены, неизвестно - пересчитываем затронутые курсы
+                recount(self.model, {obj.course_id for obj in objs}, **self.model.course_updates())
+            else:
+                self.model.update_courses(Counter(obj.course_id for obj in objs))
+        return objs
+
+    bulk_create.alters_data = True
+
+    def delete(self):
+        with transaction.atomic(using=self.db, savepoint=False):
+            # Строки блокируются до подсчёта, а удаляются ровно заблокированные: параллельное удаление
+            # тех же строк ждёт и их уже не найдёт, вставленные после подсчёта строки не удаляются
+            rows = list(self.order_by().select_for_update().values_list('pk', 'course'))
+            pks = [pk for pk, _ in rows]
+            total, per_model = 0, Counter()
+            for start in range(0, len(pks), UPDATE_BATCH_SIZE):
+                # post_delete по строкам CounterQuerySet счётчик не трогает (см. counter_deleted)
+                batch = self.model._default_manager.filter(pk__in=pks[start:start + UPDATE_BATCH_SIZE])
+                count, counts = super(CounterQuerySet, batch).delete()
+                total += count
+                per_model.update(counts)
+            self.model.update_courses({pk: -total for pk, total in Counter(course for _, course in rows).items()})
+        return total, dict(per_model)
+
+    delete.alters_data = True
+    delete.queryset_only = True
@@ -0,0 +1,243 @@
+"""Быстрый путь сериализации read-only списков.
+
+Вместо экземпляров моделей и полного прохода DRF по полям строки читаются через ``.values()``,
+а поля сериализатора один раз превращаются в план: столбец и, если нужно, функция преобразования.
+Ответ совпадает байт в байт с ``serializer_class(many=True).data``, отрисованным JSONRenderer.
+Сериализатор с полями, которые план не умеет повторить, обрабатывается обычным путём DRF.
+"""
+from collections import defaultdict
+from datetime import datetime
+
+import orjson
+from django.core.exceptions import FieldDoesNotExist
+from django.core.files.storage import FileSystemStorage
+from django.utils.encoding import filepath_to_uri
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import ISO_8601, api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .planning import ordering_fields
+
+# Поля, у которых to_representation для значения из базы ничего не меняет
+IDENTITY_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.ReadOnlyField,
+)
+
+
+class Unsupported(Exception):
+    """Поле сериализатора нельзя вывести из строки .values()"""
+
+
+class FastSerializer:
+    """План сериализации списка: (имя поля, столбец, преобразование или None).
+
+    Вложенные списки (``lessons``) загружаются одним запросом на страницу, как prefetch_related.
+    """
+
+    def __init__(self, serializer_class, request):
+        serializer = serializer_class(context={'request': request})
+        self.model = serializer_class.Meta.model
+        self.annotations = {}
+        self.plan = []
+        self.nested = {}
+        annotations = getattr(serializer_class.Meta, 'annotations', {})
+
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if name in annotations:
+                expression = annotations[name](request)
+                if expression is None:
+                    raise Unsupported(name)
+                self.annotations[name] = expression
+                self.plan.append((name, name, None))
+            elif isinstance(field, serializers.ListSerializer):
+                self.plan.append(self._nested(name, field, request))
+            else:
+                self.plan.append(self._field(name, field, request))
+
+        self.columns = list(dict.fromkeys(column for _, column, _ in self.plan))
+
+    def _model_field(self, source):
+        if source == '*' or '.' in source:
+            raise Unsupported(source)
+        try:
+            return self.model._meta.get_field(source)
+        except FieldDoesNotExist:
+            raise Unsupported(source)
+
+    def _field(self, name, field, request):
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            convert = field.pk_field.to_representation if field.pk_field else None
+            return name, self._model_field(field.source).attname, convert
+        if isinstance(field, (serializers.RelatedField, serializers.ManyRelatedField, serializers.BaseSerializer,
+                              serializers.SerializerMethodField)):
+            raise Unsupported(name)
+
+        model_field = self._model_field(field.source)
+        if isinstance(field, serializers.FileField):
+            return name, model_field.attname, self._file_url(field, model_field, request)
+        if isinstance(field, serializers.DateTimeField):
+            return name, model_field.attname, self._datetime(field)
+        if isinstance(field, IDENTITY_FIELDS):
+            return name, model_field.attname, None
+        return name, model_field.attname, field.to_representation
+
+    @staticmethod
+    def _datetime(field):
+        # Как DateTimeField.to_representation, но формат и часовой пояс определяются один раз
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+            return field.to_representation
+
+        def convert(value):
+            if not isinstance(value, datetime) or value.utcoffset() is None:
+                return field.to_representation(value)
+            try:
+                value = value.astimezone(field_timezone).isoformat()
+            except OverflowError:
+                return field.to_representation(value)
+            if value.endswith('+00:00'):
+                value = value[:-6] + 'Z'
+            return value
+
+        return convert
+
+    @staticmethod
+    def _file_url(field, model_field, request):
+        # Как FileField.to_representation, но по имени файла вместо FieldFile
+        use_url = getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL)
+        storage = model_field.storage
+        prefix = _storage_url_prefix(storage, request)
+
+        def convert(name):
+            if not name:
+                return None
+            if not use_url:
+                return name
+            if prefix is not None:
+                path = filepath_to_uri(name).lstrip('/')
+                # urljoin склеил бы '//' и раскрыл '.'/'..' - такие имена идут обычным путём
+                if '//' not in path and '/.' not in '/' + path:
+                    return prefix + path
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+
+        return convert
+
+    def _nested(self, name, field, request):
+        relation = self._model_field(field.source.split('.')[0])  # 'lessons.all' -> 'lessons'
+        if not (relation.one_to_many and relation.field.target_field.primary_key) \
+                or not isinstance(field.child, serializers.ModelSerializer):
+            raise Unsupported(name)
+        child = FastSerializer(type(field.child), request)
+        self.nested[name] = (child, relation.field.name, relation.field.attname)
+        return name, self.model._meta.pk.attname, None  # преобразование подставляет serialize
+
+    def values(self, queryset, extra=()):
+        """Строки для плана из queryset view (аннотации и фильтры сохраняются).
+
+        ``extra`` - столбцы, нужные помимо плана, например ключ keyset-пагинации.
+        """
+        missing = {name: expression for name, expression in self.annotations.items()
+                   if name not in queryset.query.annotations}
+        if missing:
+            queryset = queryset.annotate(**missing)
+        return queryset.prefetch_related(None).values(*dict.fromkeys([*self.columns, *extra]))
+
+    def serialize(self, rows):
+        rows = list(rows)
+        plan = [
+            (name, column, self._children(rows, column, *self.nested[name]) if name in self.nested else convert)
+            for name, column, convert in self.plan
+        ]
+        data = []
+        for row in rows:
+            item = {}
+            for name, column, convert in plan:
+                value = row[column]
+                item[name] = value if convert is None or value is None else convert(value)
+            data.append(item)
+        return data
+
+    @staticmethod
+    def _children(rows, column, child, fk_name, fk_attname):
+        parent_ids = [row[column] for row in rows]
+        groups = defaultdict(list)
+        if parent_ids:
+            queryset = child.model._default_manager.filter(**{f'{fk_name}__in': parent_ids})
+            child_rows = list(queryset.values(*dict.fromkeys([*child.columns, fk_attname])))
+            for row, data in zip(child_rows, child.serialize(child_rows)):
+                groups[row[fk_attname]].append(data)
+        return lambda parent_id: groups.get(parent_id, [])
+
+
+def _storage_url_prefix(storage, request):
+    """Абсолютный base_url хранилища, если его url(name) - просто base_url + путь, иначе None"""
+    if not isinstance(storage, FileSystemStorage) or storage.__class__.url is not FileSystemStorage.url:
+        return None
+    base_url = storage.base_url
+    if not base_url or not base_url.endswith('/') or '/.' in base_url:
+        return None
+    return request.build_absolute_uri(base_url) if request is not None else base_url
+
+
+_drf_encoder = JSONEncoder()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson с тем же выводом.
+
+    Даты, Decimal и ленивые строки кодируются JSONEncoder DRF; если orjson не может повторить вывод
+    (отступы, нестандартные настройки, ключи не-строки, большие числа), рендер уходит в JSONRenderer.
+    Числа с плавающей точкой orjson пишет иначе (1e16 вместо 1e+16), поэтому рендерер подключается
+    только к спискам без таких полей.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None \
+                or not (self.compact and self.ensure_ascii is False and self.strict):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(data, default=_drf_encoder.default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # JSONRenderer экранирует разделители строк, недопустимые в JavaScript
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class FastListMixin:
+    """Миксин для view: GET-список через FastSerializer и FastJSONRenderer. Включается ``fast_list = True``"""
+    fast_list = False
+
+    def use_fast_list(self):
+        return self.fast_list and self.request.method == 'GET' and getattr(self, 'action', 'list') == 'list'
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if not self.use_fast_list():
+            return renderers
+        return [FastJSONRenderer() if type(renderer) is JSONRenderer else renderer for renderer in renderers]
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_list():
+            return super().list(request, *args, **kwargs)
+        try:
+            serializer = FastSerializer(self.get_serializer_class(), request)
+        except Unsupported:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = serializer.values(queryset, ordering_fields(self.pagination_class))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(queryset))
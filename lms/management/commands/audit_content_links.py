@@ -0,0 +1,73 @@
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand, CommandError
+
+from config.lms.models import Course, Lesson
+from config.lms.validators import allowed_link_domains, audit_rows
+
+# Поля с ссылками, которые проверяет validate_no_external_links
+AUDITED_FIELDS = {
+    Course: ('description', 'video_link'),
+    Lesson: ('description', 'video_link'),
+}
+
+
+def chunks(model, fields, chunk_size):
+    """Строки (pk, {поле: текст}) модели пачками; из базы читается курсором, без всей таблицы в памяти"""
+    chunk = []
+    rows = model.objects.order_by('pk').values_list('pk', *fields).iterator(chunk_size=chunk_size)
+    for pk, *values in rows:
+        chunk.append((pk, dict(zip(fields, values))))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = 'Checks descriptions and video links of all courses and lessons for links outside the allowed domains'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1_000, help='Строк в одной пачке')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Процессов проверки (1 - в текущем процессе)')
+        parser.add_argument('--fail', action='store_true', help='Код ошибки, если найдены нарушения (для CI)')
+
+    def handle(self, *args, **options):
+        domains = allowed_link_domains()
+        workers = max(1, options['workers'] or 1)
+        violations = 0
+        for model, fields in AUDITED_FIELDS.items():
+            batches = chunks(model, fields, options['chunk_size'])
+            if workers == 1:
+                results = (audit_rows(batch, domains) for batch in batches)
+            else:
+                results = self.in_pool(batches, domains, workers)
+            for found in results:
+                for pk, field, links in found:
+                    violations += 1
+                    self.stdout.write(self.style.WARNING(
+                        f'{model._meta.model_name} {pk} {field}: {", ".join(links)}'
+                    ))
+
+        self.stdout.write(f'{violations} fields with external links (allowed: {", ".join(domains)})')
+        if violations and options['fail']:
+            raise CommandError(f'{violations} fields with external links')
+
+    @staticmethod
+    def in_pool(batches, domains, workers):
+        """Результаты проверки пачек в пуле процессов; в работе не больше 2 * workers пачек"""
+        # spawn: дочерние процессы не наследуют открытое соединение с базой
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            pending = set()
+            for batch in batches:
+                pending.add(executor.submit(audit_rows, batch, domains))
+                if len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            for future in pending:
+                yield future.result()
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from config.lms.query_audit import audit
+
+
+class Command(BaseCommand):
+    help = 'Runs EXPLAIN for the canonical queries of API endpoints and tasks and flags large sequential scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-rows', type=int, default=10_000,
+                            help='Полный проход по таблице меньшего размера не считается проблемой')
+        parser.add_argument('--fail', action='store_true', help='Код ошибки, если найдены полные проходы (для CI)')
+
+    def handle(self, *args, **options):
+        flagged = 0
+        for name, scans in audit(options['min_rows']):
+            if not scans:
+                self.stdout.write(f'{name:<22} ok')
+                continue
+            flagged += 1
+            details = ', '.join(f'{table} (~{rows} rows)' for table, rows in scans)
+            self.stdout.write(self.style.WARNING(f'{name:<22} sequential scan: {details}'))
+
+        if flagged and options['fail']:
+            raise CommandError(f'{flagged} queries read whole tables')
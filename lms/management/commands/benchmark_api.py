@@ -0,0 +1,67 @@
+import json
+import platform
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from benchmarks.api import run_all
+from benchmarks.factories import seed
+from benchmarks.runner import benchmark_database
+
+
+class Command(BaseCommand):
+    help = 'Runs every API endpoint against a seeded test database and checks query/latency budgets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help='Множитель объёма данных (1.0 = 10k пользователей, 1k курсов, 50k платежей)')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--only', nargs='*', help='Имена эндпоинтов, которые нужно прогнать')
+        parser.add_argument('--report', help='Путь к JSON-отчёту')
+        parser.add_argument('--keepdb', action='store_true', help='Не пересоздавать тестовую базу')
+        parser.add_argument('--no-cache', action='store_true', help='Отключить кэш ответов (меряется путь без кэша)')
+        parser.add_argument('--no-fail', action='store_true', help='Не завершаться ошибкой при превышении бюджета')
+
+    def handle(self, *args, **options):
+        # Кэш в памяти процесса: бенчмарк не ходит во внешние сервисы, Redis ему не нужен
+        backend = 'dummy.DummyCache' if options['no_cache'] else 'locmem.LocMemCache'
+        overrides = {'CACHES': {'default': {'BACKEND': f'django.core.cache.backends.{backend}'}}}
+
+        with benchmark_database(options['keepdb']), tempfile.TemporaryDirectory() as media_root, override_settings(
+            MEDIA_ROOT=media_root,
+            EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+            **overrides,
+        ):
+            self.stdout.write(f'Seeding dataset (scale={options["scale"]})...')
+            dataset = seed(scale=options['scale'])
+            results = run_all(dataset, iterations=options['iterations'], only=options['only'])
+
+        report = {
+            'meta': {
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'scale': options['scale'],
+                'iterations': options['iterations'],
+                'cache': not options['no_cache'],
+            },
+            'endpoints': results,
+        }
+        if options['report']:
+            with open(options['report'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True, ensure_ascii=False)
+                f.write('\n')
+
+        failed = []
+        for name, result in results.items():
+            ok = result['queries_ok'] and result['latency_ok'] and result['status_ok']
+            line = (f'{name:<20} {result["method"]:<6} status={result["status"]} '
+                    f'queries={result["queries"]}/{result["max_queries"]} '
+                    f'p95={result["p95_ms"]}ms/{result["p95_budget_ms"]}ms')
+            self.stdout.write(self.style.SUCCESS(line) if ok else self.style.ERROR(line))
+            if not ok:
+                failed.append(name)
+
+        if failed and not options['no_fail']:
+            raise CommandError(f'Budget exceeded or request failed: {", ".join(failed)}')
@@ -0,0 +1,25 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from benchmarks.links import measure
+
+
+class Command(BaseCommand):
+    help = 'Compares the previous external link validator with the precompiled link scanner'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--report', help='Путь к JSON-отчёту')
+
+    def handle(self, *args, **options):
+        results = measure(options['iterations'])
+        for result in results:
+            self.stdout.write(
+                f'{result["name"]:<20} {result["chars"]:>8} chars  legacy={result["legacy_us"]:>10}us  '
+                f'scanner={result["scanner_us"]:>9}us  x{result["speedup"]}'
+            )
+        if options['report']:
+            with open(options['report'], 'w') as f:
+                json.dump({'iterations': options['iterations'], 'results': results}, f, indent=2)
+                f.write('\n')
@@ -0,0 +1,55 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from benchmarks.notifications import chunked_fan_out, legacy_fan_out, measure, seed_course
+from benchmarks.runner import benchmark_database
+from benchmarks.smtp_server import LocalSMTPServer
+
+
+class Command(BaseCommand):
+    help = 'Compares per-recipient and chunked course update fan-out against a local SMTP stand-in'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=5_000)
+        parser.add_argument('--workers', type=int, default=4, help='Параллельные пачки (как воркеры Celery)')
+        parser.add_argument('--latency', type=float, default=0.0, help='Задержка SMTP на письмо, с')
+        parser.add_argument('--connect-latency', type=float, default=0.005, help='Задержка SMTP на соединение, с')
+        parser.add_argument('--skip-legacy', action='store_true', help='Не прогонять прежнюю реализацию')
+        parser.add_argument('--report', help='Путь к JSON-отчёту')
+
+    def handle(self, *args, **options):
+        subscribers = options['subscribers']
+        with LocalSMTPServer(latency=options['latency'], connect_latency=options['connect_latency']) as smtp_server, \
+                benchmark_database(), override_settings(
+                    EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                    EMAIL_HOST='127.0.0.1',
+                    EMAIL_PORT=smtp_server.port,
+                    EMAIL_USE_SSL=False,
+                    EMAIL_USE_TLS=False,
+                    EMAIL_HOST_USER='',
+                    EMAIL_HOST_PASSWORD='',
+                ):
+            course = seed_course(subscribers)
+            results = []
+            if not options['skip_legacy']:
+                results.append(measure('legacy', lambda: legacy_fan_out(course.id), smtp_server, subscribers))
+            results.append(measure('chunked', lambda: chunked_fan_out(course.id), smtp_server, subscribers))
+            if options['workers'] > 1:
+                results.append(measure(
+                    f'chunked x{options["workers"]}',
+                    lambda: chunked_fan_out(course.id, workers=options['workers']),
+                    smtp_server,
+                    subscribers,
+                ))
+
+        for result in results:
+            self.stdout.write(
+                f'{result["name"]:<12} {result["seconds"]:>8}s  {result["messages_per_second"]:>9} msg/s  '
+                f'messages={result["messages"]} connections={result["smtp_connections"]}'
+            )
+        if options['report']:
+            with open(options['report'], 'w') as f:
+                json.dump({'subscribers': subscribers, 'results': results}, f, indent=2, ensure_ascii=False)
+                f.write('\n')
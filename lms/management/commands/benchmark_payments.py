@@ -0,0 +1,39 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from benchmarks.payments import run_async, run_sync, seed_checkout
+from benchmarks.runner import benchmark_database
+from benchmarks.stripe_server import LocalStripeServer
+
+
+class Command(BaseCommand):
+    help = 'Compares sync and async checkout throughput against a local Stripe stand-in'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--workers', type=int, default=1, help='Потоки для синхронного эндпоинта')
+        parser.add_argument('--concurrency', type=int, default=100, help='Одновременные запросы к async-эндпоинту')
+        parser.add_argument('--stripe-latency', type=float, default=0.1, help='Задержка ответа Stripe, с')
+        parser.add_argument('--skip-sync', action='store_true', help='Не прогонять синхронный эндпоинт')
+        parser.add_argument('--report', help='Путь к JSON-отчёту')
+
+    def handle(self, *args, **options):
+        requests = options['requests']
+        with LocalStripeServer(latency=options['stripe_latency']) as stripe_server, stripe_server.settings(), \
+                benchmark_database():
+            course_id, authorization = seed_checkout()
+            results = []
+            if not options['skip_sync']:
+                results.append(run_sync(course_id, authorization, requests, options['workers']))
+            results.append(run_async(course_id, authorization, requests, options['concurrency']))
+
+        for result in results:
+            self.stdout.write(
+                f'{result["name"]:<12} {result["seconds"]:>8}s  {result["requests_per_second"]:>8} req/s  '
+                f'p50={result["p50_ms"]}ms p95={result["p95_ms"]}ms errors={result["errors"]}'
+            )
+        if options['report']:
+            with open(options['report'], 'w') as f:
+                json.dump({'stripe_latency': options['stripe_latency'], 'results': results}, f, indent=2)
+                f.write('\n')
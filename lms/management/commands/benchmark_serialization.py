@@ -0,0 +1,34 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from benchmarks.runner import benchmark_database
+from benchmarks.serialization import measure, seed_catalog
+
+
+class Command(BaseCommand):
+    help = 'Compares per-row cost of DRF serializers and the fast list path for courses and lessons'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=200, help='Курсов в базе (по 20 уроков)')
+        parser.add_argument('--rows', type=int, default=50, help='Строк в одном списке')
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--report', help='Путь к JSON-отчёту')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            user = seed_catalog(options['courses'])
+            results = measure(user, options['rows'], options['iterations'])
+
+        for result in results:
+            for mode in ('drf', 'fast'):
+                timings = result[mode]
+                self.stdout.write(
+                    f'{result["name"]:<8} {mode:<5} data={timings["data_us_per_row"]:>8}us  '
+                    f'render={timings["render_us_per_row"]:>7}us  total={timings["total_us_per_row"]:>8}us per row'
+                )
+            self.stdout.write(f'{result["name"]:<8} speedup x{result["speedup"]}, identical={result["identical"]}')
+        if options['report']:
+            with open(options['report'], 'w') as f:
+                json.dump({'rows': options['rows'], 'results': results}, f, indent=2)
+                f.write('\n')
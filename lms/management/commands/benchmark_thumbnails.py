@@ -0,0 +1,30 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from benchmarks.thumbnails import measure
+
+
+class Command(BaseCommand):
+    help = 'Compares the size of uploaded images with their WebP and JPEG thumbnail variants'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=3)
+        parser.add_argument('--report', help='Путь к JSON-отчёту')
+
+    def handle(self, *args, **options):
+        results = measure(options['iterations'])
+        for result in results:
+            self.stdout.write(
+                f'{result["name"]}: original={result["original_bytes"] / 1024:.0f}KB  '
+                f'render={result["render_seconds"]}s'
+            )
+            for variant in result['variants']:
+                self.stdout.write(
+                    f'  {variant["width"]:>5}w {variant["format"]:<5} {variant["bytes"] / 1024:>7.1f}KB  '
+                    f'-{variant["saved"]:.1%}'
+                )
+        if options['report']:
+            with open(options['report'], 'w') as f:
+                json.dump({'iterations': options['iterations'], 'results': results}, f, indent=2)
+                f.write('\n')
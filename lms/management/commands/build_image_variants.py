@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from config.lms.models import Course, Lesson
+from config.lms.tasks import generate_image_variants
+from config.lms.thumbnails import variants_field
+from config.users.models import CustomUser
+
+# Поля изображений, для которых строятся копии (см. сигналы lms и users)
+IMAGE_FIELDS = {
+    Course: 'preview',
+    Lesson: 'preview',
+    CustomUser: 'avatar',
+}
+
+
+class Command(BaseCommand):
+    help = 'Builds missing thumbnail variants of course and lesson previews and user avatars'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', action='store_true', help='Поставить задачи в Celery вместо построения здесь')
+        parser.add_argument('--chunk-size', type=int, default=1_000, help='Строк, читаемых из базы за раз')
+
+    def handle(self, *args, **options):
+        for model, field_name in IMAGE_FIELDS.items():
+            rows = model._default_manager.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True}) \
+                .order_by('pk').values_list('pk', field_name, variants_field(field_name)) \
+                .iterator(chunk_size=options['chunk_size'])
+            pending = [pk for pk, name, variants in rows if (variants or {}).get('source') != name]
+            for pk in pending:
+                if options['queue']:
+                    generate_image_variants.delay(model._meta.label, pk, field_name)
+                else:
+                    generate_image_variants(model._meta.label, pk, field_name)
+            self.stdout.write(f'{len(pending)} {model._meta.verbose_name_plural} without variants of {field_name}')
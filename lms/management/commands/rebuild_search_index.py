@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from config.lms.models import Course, Lesson
+from config.lms.search import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Refills the full-text search index of courses and lessons from their tables'
+
+    def handle(self, *args, **options):
+        for model in (Course, Lesson):
+            rebuild(model)
+            self.stdout.write(f'Rebuilt search index for {model._meta.verbose_name_plural}')
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from config.lms.counters import count_subquery, recount
+from config.lms.models import Course, Lesson, Subscription
+
+COUNTED_MODELS = (Lesson, Subscription)
+
+
+class Command(BaseCommand):
+    help = 'Recounts Course.lessons_count and Course.subscribers_count in primary-key batches and fixes drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Курсов в одной пачке')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать расхождения')
+
+    def handle(self, *args, **options):
+        fixed = {model.course_counter: 0 for model in COUNTED_MODELS}
+        last_pk = 0
+        while True:
+            batch = list(
+                Course.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1]
+            # Пачка в своей транзакции: блокировки строк курсов держатся недолго
+            with transaction.atomic():
+                for model in COUNTED_MODELS:
+                    field = model.course_counter
+                    drifted = list(
+                        Course.objects.filter(pk__in=batch)
+                        .annotate(actual=count_subquery(model))
+                        .filter(~Q(**{field: F('actual')}))
+                        .values_list('pk', flat=True)
+                    )
+                    if drifted and not options['dry_run']:
+                        recount(model, drifted)
+                    fixed[field] += len(drifted)
+
+        verb = 'Drifted' if options['dry_run'] else 'Fixed'
+        for field, count in fixed.items():
+            self.stdout.write(f'{verb} {field}: {count} courses')
@@ -0,0 +1,177 @@
+"""Метрики Prometheus: задержка API, задачи Celery, вызовы SMTP и Stripe.
+
+В продакшене gunicorn и воркеры Celery пишут метрики в multiprocess-режиме prometheus_client: каждая служба
+в свой подкаталог общего тома (PROMETHEUS_MULTIPROC_DIR=<том>/web, <том>/celery), а /metrics любого
+веб-воркера отдаёт сумму по всем подкаталогам. Подкаталог службы очищается при старте контейнера
+(docker-entrypoint.sh), файлы завершившихся процессов помечаются mark_process_dead.
+Без PROMETHEUS_MULTIPROC_DIR метрики живут в памяти процесса (разработка, тесты).
+"""
+import glob
+import os
+import socket
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from celery.signals import before_task_publish, task_postrun, task_prerun, worker_process_shutdown
+from django.http import HttpResponse
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Histogram, generate_latest, values
+from prometheus_client import multiprocess
+
+from .profiling import route_template
+
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+# Контейнеры одной службы пишут в один подкаталог, а PID в них пересекаются: файл метрик
+# процесса называется по имени хоста и PID ('_' в имени разделяет части в prometheus_client)
+_host = socket.gethostname().replace('_', '-')
+
+
+def process_identifier(pid):
+    """Имя файлов метрик процесса в PROMETHEUS_MULTIPROC_DIR"""
+    return f'{_host}-{pid}'
+
+
+if MULTIPROC_DIR:
+    values.ValueClass = values.MultiProcessValue(lambda: process_identifier(os.getpid()))
+
+
+def mark_process_dead(pid):
+    """Убирает live-gauge завершившегося процесса (gunicorn child_exit, остановка процесса Celery)"""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(process_identifier(pid), MULTIPROC_DIR)
+
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+TASK_BUCKETS = (.05, .1, .5, 1, 5, 10, 30, 60, 300, 900, 1800)
+
+HTTP_REQUEST_DURATION = Histogram(
+    'lms_http_request_duration_seconds', 'Время ответа API по маршруту и действию DRF',
+    ['method', 'route', 'action', 'status'], buckets=LATENCY_BUCKETS,
+)
+CELERY_TASK_DURATION = Histogram(
+    'lms_celery_task_duration_seconds', 'Время выполнения задачи Celery',
+    ['task', 'state'], buckets=TASK_BUCKETS,
+)
+CELERY_TASK_QUEUE_LAG = Histogram(
+    'lms_celery_task_queue_lag_seconds', 'Время от постановки задачи (или её ETA) до начала выполнения',
+    ['task'], buckets=TASK_BUCKETS,
+)
+EXTERNAL_CALL_DURATION = Histogram(
+    'lms_external_call_duration_seconds', 'Задержка вызовов внешних сервисов (SMTP, Stripe)',
+    ['service', 'operation', 'outcome'], buckets=LATENCY_BUCKETS,
+)
+
+
+def observe_external_call(service, operation, seconds, ok=True):
+    EXTERNAL_CALL_DURATION.labels(service, operation, 'ok' if ok else 'error').observe(seconds)
+
+
+@contextmanager
+def timed_external_call(service, operation):
+    """Замеряет вызов внешнего сервиса; исключение помечается outcome=error"""
+    started = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        observe_external_call(service, operation, time.perf_counter() - started, ok)
+
+
+def view_action(request):
+    """Действие ViewSet ('list', 'publish', 'subscribe', ...) или пустая строка для обычных view"""
+    actions = getattr(request.resolver_match.func, 'actions', None) or {}
+    return actions.get(request.method.lower(), '')
+
+
+class MetricsMiddleware:
+    """Гистограмма времени ответа по маршруту, действию и статусу.
+
+    Работает и в sync, и в async цепочке: под ASGI async-представления не уходят в поток через async_to_sync.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, response, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, time.perf_counter() - started)
+        return response
+
+    @staticmethod
+    def observe(request, response, elapsed):
+        match = request.resolver_match
+        if match is None:
+            # Нераспознанные URL сводятся в одну серию, иначе сканеры раздуют число меток
+            route, action = '<unmatched>', ''
+        else:
+            route, action = route_template(match), view_action(request)
+        HTTP_REQUEST_DURATION.labels(request.method, route, action, response.status_code).observe(elapsed)
+
+
+class ServicesCollector(multiprocess.MultiProcessCollector):
+    """Сумма метрик всех служб: файлы из подкаталогов служб общего тома"""
+
+    def collect(self):
+        files = glob.glob(os.path.join(self._path, '*', '*.db'))
+        return self.merge(files, accumulate=True)
+
+
+def metrics_view(request):
+    """Экспозиция для Prometheus; порт web наружу не публикуется, в nginx /metrics закрыт"""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        ServicesCollector(registry, os.path.dirname(MULTIPROC_DIR.rstrip('/')))
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+# Celery: время выполнения и задержка в очереди. Время публикации передаётся в заголовке сообщения,
+# воркер кладёт заголовки в task.request
+_task_started = {}
+
+
+@before_task_publish.connect
+def _stamp_published_at(headers=None, **kwargs):
+    if headers is not None:
+        headers.setdefault('published_at', time.time())
+
+
+@task_prerun.connect
+def _task_prerun(task_id=None, task=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+    published_at = getattr(task.request, 'published_at', None)
+    if published_at is None:
+        return  # задача выполнена синхронно (apply/eager), очереди не было
+    ready_at = published_at
+    if task.request.eta:
+        ready_at = max(ready_at, datetime.fromisoformat(task.request.eta).timestamp())
+    CELERY_TASK_QUEUE_LAG.labels(task.name).observe(max(0.0, time.time() - ready_at))
+
+
+@task_postrun.connect
+def _task_postrun(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        CELERY_TASK_DURATION.labels(task.name, state or 'UNKNOWN').observe(time.perf_counter() - started)
+
+
+@worker_process_shutdown.connect
+def _worker_process_shutdown(pid=None, **kwargs):
+    mark_process_dead(pid or os.getpid())
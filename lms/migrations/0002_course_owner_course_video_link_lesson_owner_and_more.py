@@ -0,0 +1,56 @@
+# Generated by Django 5.2 on 2026-10-18 05:27
+
+import django.db.models.deletion
+import lms.validators
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='owner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Владелец'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='video_link',
+            field=models.URLField(blank=True, null=True, validators=[lms.validators.validate_no_external_links], verbose_name='Ссылка на видео'),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='owner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Владелец'),
+        ),
+        migrations.AlterField(
+            model_name='course',
+            name='description',
+            field=models.TextField(blank=True, null=True, validators=[lms.validators.validate_no_external_links], verbose_name='description'),
+        ),
+        migrations.AlterField(
+            model_name='lesson',
+            name='description',
+            field=models.TextField(blank=True, null=True, validators=[lms.validators.validate_no_external_links], verbose_name='description'),
+        ),
+        migrations.CreateModel(
+            name='Subscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subscribed_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата подписки')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subscriptions', to='lms.course', verbose_name='Курс')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subscriptions', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Подписка',
+                'verbose_name_plural': 'Подписки',
+                'unique_together': {('user', 'course')},
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2 on 2026-10-18 05:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms', '0003_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='price'),
+        ),
+        migrations.CreateModel(
+            name='StripeProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.CharField(max_length=255, unique=True, verbose_name='ID продукта в Stripe')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stripe_product', to='lms.course', verbose_name='Курс')),
+            ],
+            options={
+                'verbose_name': 'Продукт Stripe',
+                'verbose_name_plural': 'Продукты Stripe',
+            },
+        ),
+        migrations.CreateModel(
+            name='StripePrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Сумма')),
+                ('currency', models.CharField(max_length=3, verbose_name='Валюта')),
+                ('price_id', models.CharField(max_length=255, unique=True, verbose_name='ID цены в Stripe')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stripe_prices', to='lms.course', verbose_name='Курс')),
+            ],
+            options={
+                'verbose_name': 'Цена Stripe',
+                'verbose_name_plural': 'Цены Stripe',
+                'unique_together': {('course', 'amount', 'currency')},
+            },
+        ),
+    ]
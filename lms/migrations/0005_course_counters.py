@@ -0,0 +1,38 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_rows(model):
+    counted = model.objects.filter(course=OuterRef('pk')).order_by() \
+        .values('course').annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counted), Value(0))
+
+
+def fill_counters(apps, schema_editor):
+    Course = apps.get_model('lms', 'Course')
+    Course.objects.update(
+        lessons_count=count_rows(apps.get_model('lms', 'Lesson')),
+        subscribers_count=count_rows(apps.get_model('lms', 'Subscription')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms', '0004_stripe_price_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='lessons_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='lessons count'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='subscribers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='subscribers count'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
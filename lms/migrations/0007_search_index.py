@@ -0,0 +1,113 @@
+# Generated by Django 5.2 on 2026-10-18 07:40
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+TABLES = ('lms_course', 'lms_lesson')
+
+POSTGRES_FORWARDS = """
+CREATE FUNCTION lms_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+"""
+POSTGRES_TABLE_FORWARDS = """
+CREATE TRIGGER {table}_search_vector BEFORE INSERT OR UPDATE OF title, description ON {table}
+    FOR EACH ROW EXECUTE FUNCTION lms_search_vector();
+UPDATE {table} SET search_vector =
+    setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce(description, '')), 'B');
+"""
+POSTGRES_TABLE_BACKWARDS = 'DROP TRIGGER IF EXISTS {table}_search_vector ON {table};'
+POSTGRES_BACKWARDS = 'DROP FUNCTION IF EXISTS lms_search_vector();'
+
+# В SQLite нет tsvector: копия title и description в таблице FTS5 с rowid = id строки
+SQLITE_TABLE_FORWARDS = (
+    "CREATE VIRTUAL TABLE {table}_fts USING fts5(title, description, tokenize='unicode61 remove_diacritics 2')",
+    """CREATE TRIGGER {table}_fts_insert AFTER INSERT ON {table} BEGIN
+        INSERT INTO {table}_fts(rowid, title, description) VALUES (new.id, new.title, coalesce(new.description, ''));
+    END""",
+    """CREATE TRIGGER {table}_fts_update AFTER UPDATE OF title, description ON {table} BEGIN
+        UPDATE {table}_fts SET title = new.title, description = coalesce(new.description, '') WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER {table}_fts_delete AFTER DELETE ON {table} BEGIN
+        DELETE FROM {table}_fts WHERE rowid = old.id;
+    END""",
+    "INSERT INTO {table}_fts(rowid, title, description) SELECT id, title, coalesce(description, '') FROM {table}",
+)
+SQLITE_TABLE_BACKWARDS = (
+    'DROP TRIGGER IF EXISTS {table}_fts_insert',
+    'DROP TRIGGER IF EXISTS {table}_fts_update',
+    'DROP TRIGGER IF EXISTS {table}_fts_delete',
+    'DROP TABLE IF EXISTS {table}_fts',
+)
+
+
+def create_search_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_FORWARDS)
+        for table in TABLES:
+            schema_editor.execute(POSTGRES_TABLE_FORWARDS.format(table=table))
+    elif vendor == 'sqlite':
+        for table in TABLES:
+            for statement in SQLITE_TABLE_FORWARDS:
+                schema_editor.execute(statement.format(table=table))
+
+
+def drop_search_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for table in TABLES:
+            schema_editor.execute(POSTGRES_TABLE_BACKWARDS.format(table=table))
+        schema_editor.execute(POSTGRES_BACKWARDS)
+    elif vendor == 'sqlite':
+        for table in TABLES:
+            for statement in SQLITE_TABLE_BACKWARDS:
+                schema_editor.execute(statement.format(table=table))
+
+
+class AddPostgresIndex(migrations.AddIndex):
+    """GIN-индекс есть только в Postgres; в состоянии моделей он есть всегда"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms', '0006_query_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_triggers, drop_search_triggers),
+        AddPostgresIndex(
+            model_name='course',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='course_search_idx'),
+        ),
+        AddPostgresIndex(
+            model_name='lesson',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='lesson_search_idx'),
+        ),
+    ]
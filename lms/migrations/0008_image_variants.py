@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-18 09:15
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+TABLES = ('lms_course', 'lms_lesson')
+
+
+def restore_search_triggers(apps, schema_editor):
+    # SQLite добавляет и удаляет столбец NOT NULL пересозданием таблицы - триггеры FTS5 из 0007 пропадают
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    search_index = import_module('lms.migrations.0007_search_index')
+    triggers = [
+        statement.replace('CREATE TRIGGER', 'CREATE TRIGGER IF NOT EXISTS', 1)
+        for statement in search_index.SQLITE_TABLE_FORWARDS if statement.startswith('CREATE TRIGGER')
+    ]
+    for table in TABLES:
+        for statement in triggers:
+            schema_editor.execute(statement.format(table=table))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms', '0007_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_search_triggers),
+        migrations.AddField(
+            model_name='course',
+            name='preview_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='preview_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,10 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
+from .counters import CounterQuerySet, CountedInCourse
 from .validators import validate_no_external_links
 from config.users.models import CustomUser
 
@@ -24,16 +28,29 @@ class Course(models.Model):
         blank=True,
         null=True
     )
+    price = models.DecimalField(_('price'), max_digits=10, decimal_places=2, default=0)
+    # Денормализованные счётчики, поддерживаются lms.counters
+    lessons_count = models.PositiveIntegerField(_('lessons count'), default=0, editable=False)
+    subscribers_count = models.PositiveIntegerField(_('subscribers count'), default=0, editable=False)
+    # Полнотекстовый индекс title и description, заполняется триггером базы (lms.search)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Уменьшенные копии preview для srcset, заполняется задачей generate_image_variants (lms.thumbnails)
+    preview_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     class Meta:
         verbose_name = _('course')
         verbose_name_plural = _('courses')
+        indexes = [
+            # Keyset-пагинация по (created_at, id)
+            models.Index(fields=['created_at', 'id'], name='course_created_id_idx'),
+            GinIndex(fields=['search_vector'], name='course_search_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
 
-class Lesson(models.Model):
+class Lesson(CountedInCourse, models.Model):
     course = models.ForeignKey(
         Course,
         on_delete=models.CASCADE,
@@ -51,27 +68,50 @@ class Lesson(models.Model):
         on_delete=models.SET_NULL,
         null=True,
         blank=True,
+        db_index=False,  # Покрыт индексом lesson_owner_created_idx
         verbose_name='Владелец'
     )
+    # Полнотекстовый индекс title и description, заполняется триггером базы (lms.search)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Уменьшенные копии preview для srcset, заполняется задачей generate_image_variants (lms.thumbnails)
+    preview_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    objects = CounterQuerySet.as_manager()
+    course_counter = 'lessons_count'
 
     class Meta:
         verbose_name = _('lesson')
         verbose_name_plural = _('lessons')
+        indexes = [
+            # Keyset-пагинация по (created_at, id)
+            models.Index(fields=['created_at', 'id'], name='lesson_created_id_idx'),
+            # Уроки владельца (LessonViewSet) в порядке keyset-пагинации
+            models.Index(fields=['owner', 'created_at', 'id'], name='lesson_owner_created_idx'),
+            GinIndex(fields=['search_vector'], name='lesson_search_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
-class Subscription(models.Model):
+    @classmethod
+    def course_updates(cls):
+        # Уроки входят в ответ курса: от updated_at считаются его ETag и Last-Modified
+        return {'updated_at': timezone.now()}
+
+
+class Subscription(CountedInCourse, models.Model):
     user = models.ForeignKey(
         CustomUser,
         on_delete=models.CASCADE,
         related_name='subscriptions',
+        db_index=False,  # Покрыт уникальным индексом (user, course)
         verbose_name='Пользователь'
     )
     course = models.ForeignKey(
         'Course',
         on_delete=models.CASCADE,
         related_name='subscriptions',
+        db_index=False,  # Покрыт индексом subscription_course_user_idx
         verbose_name='Курс'
     )
     subscribed_at = models.DateTimeField(
@@ -79,10 +119,58 @@ class Subscription(models.Model):
         verbose_name='Дата подписки'
     )
 
+    objects = CounterQuerySet.as_manager()
+    course_counter = 'subscribers_count'
+
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
         unique_together = ['user', 'course']  # Одна подписка на пользователя+курс
+        indexes = [
+            # Подписчики курса для рассылки: выборка user_id по курсу только из индекса
+            models.Index(fields=['course', 'user'], name='subscription_course_user_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user.email} подписан на {self.course.title}'
+
+
+class StripeProduct(models.Model):
+    """Продукт Stripe, созданный для курса. Создаётся один раз и переиспользуется."""
+    course = models.OneToOneField(
+        Course,
+        on_delete=models.CASCADE,
+        related_name='stripe_product',
+        verbose_name='Курс'
+    )
+    product_id = models.CharField('ID продукта в Stripe', max_length=255, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Продукт Stripe'
+        verbose_name_plural = 'Продукты Stripe'
+
+    def __str__(self):
+        return self.product_id
+
+
+class StripePrice(models.Model):
+    """Цена Stripe для пары (курс, сумма). При смене цены курса создаётся новая запись, старая остаётся."""
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name='stripe_prices',
+        verbose_name='Курс'
+    )
+    amount = models.DecimalField('Сумма', max_digits=10, decimal_places=2)
+    currency = models.CharField('Валюта', max_length=3)
+    price_id = models.CharField('ID цены в Stripe', max_length=255, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Цена Stripe'
+        verbose_name_plural = 'Цены Stripe'
+        unique_together = ['course', 'amount', 'currency']
+
+    def __str__(self):
+        return self.price_id
@@ -1,11 +1,257 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
 
-class CoursePaginator(PageNumberPagination):
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Keyset-пагинация по составному ключу без COUNT(*) и OFFSET.
+
+    Курсор хранит значения полей ``ordering`` последней (или первой) записи страницы,
+    следующая страница выбирается условием ``a >= x AND (a > x OR (a = x AND b > y))``:
+    первое слагаемое задаёт начало диапазона в составном индексе по тем же полям, поэтому
+    глубокие страницы не обходят индекс с начала. Число записей считается только по ``?count=true``.
+    Порядок задаёт только ``ordering``: сортировка из запроса (``?ordering=``) отклоняется с 400,
+    а не игнорируется молча.
+    """
+    ordering = ('created_at', 'id')
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    ordering_query_param = 'ordering'
+    invalid_cursor_message = 'Неверный курсор'
+    ordering_not_supported_message = 'Сортировка недоступна при пагинации курсором'
+
+    def page_queryset(self, queryset, request):
+        """Запрос страницы (с одной лишней записью - признаком следующей) без выполнения"""
+        if request.query_params.get(self.ordering_query_param):
+            raise ValidationError({self.ordering_query_param: [self.ordering_not_supported_message]})
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.position, self.reverse = self.decode_cursor(request, queryset.model)
+        ordering = self.reversed_ordering() if self.reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            queryset = queryset.filter(self.after(self.position, ordering))
+        return queryset[:self.page_size + 1]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.page_queryset(queryset, request)
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = queryset.count()
+
+        position = self.position
+        results = list(page_queryset)
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def reversed_ordering(self):
+        return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering)
+
+    @staticmethod
+    def after(position, ordering):
+        """Условие "строго после position" для составного ключа в порядке ordering"""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        # OR планировщик не превращает в границу диапазона индекса, а условие на первое поле - превращает
+        first = ordering[0]
+        start = Q(**{f'{first.lstrip("-")}__{"lte" if first.startswith("-") else "gte"}': position[0]})
+        return start & condition
+
+    def position_of(self, obj):
+        values = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            value = obj[name] if isinstance(obj, dict) else getattr(obj, name)  # dict - строка .values()
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return values
+
+    @staticmethod
+    def cursor_token(position, reverse=False):
+        payload = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def encode_cursor(self, position, reverse):
+        cursor = self.cursor_token(position, reverse)
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, model):
+        """Позиция и направление из курсора; значения приводятся к типам полей ``ordering`` модели"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            position, reverse = payload['p'], bool(payload['r'])
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError(position)
+            # Подделанный курсор не должен доходить до запроса: неверное значение поля - 404, а не 500
+            position = [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except (TypeError, ValueError, KeyError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.position_of(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.position_of(self.page[0]), reverse=True)
+
+    def get_paginated_response(self, data):
+        response = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count is not None:
+            response = {'count': self.count, **response}
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class SelectablePagination(BasePagination):
+    """Выбирает режим пагинации по запросу: ``?pagination=cursor`` (или наличие ``cursor``)
+    включает keyset-режим, иначе используется постраничная пагинация"""
+    page_number_class = PageNumberPagination
+    keyset_class = KeysetPagination
+    mode_query_param = 'pagination'
+
+    def get_paginator(self, request):
+        if not hasattr(self, '_paginator'):
+            keyset = (
+                request.query_params.get(self.mode_query_param) == 'cursor'
+                or self.keyset_class.cursor_query_param in request.query_params
+            )
+            self._paginator = self.keyset_class() if keyset else self.page_number_class()
+        return self._paginator
+
+    def ordered(self, queryset):
+        if not queryset.ordered:
+            # Постраничный режим листает в том же порядке, что и keyset-режим, а не как придётся базе
+            queryset = queryset.order_by(*self.keyset_class.ordering)
+        return queryset
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.get_paginator(request).paginate_queryset(self.ordered(queryset), request, view)
+
+    def page_queryset(self, queryset, request):
+        """Запрос страницы без выполнения (для EXPLAIN); в постраничном режиме - первая страница"""
+        queryset = self.ordered(queryset)
+        paginator = self.get_paginator(request)
+        if isinstance(paginator, KeysetPagination):
+            return paginator.page_queryset(queryset, request)
+        return queryset[:paginator.get_page_size(request)]
+
+    def get_paginated_response(self, data):
+        return self._paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_class().get_paginated_response_schema(schema)
+
+    @property
+    def display_page_controls(self):
+        return getattr(getattr(self, '_paginator', None), 'display_page_controls', False)
+
+    def to_html(self):
+        return self._paginator.to_html()
+
+
+class CoursePageNumberPaginator(PageNumberPagination):
     page_size = 5  # Количество курсов на странице по умолчанию
     page_size_query_param = 'page_size'  # Параметр для изменения количества элементов
     max_page_size = 50  # Максимальное количество элементов на странице
 
-class LessonPaginator(PageNumberPagination):
+
+class CourseKeysetPaginator(KeysetPagination):
+    ordering = ('created_at', 'id')
+    page_size = 5
+    max_page_size = 50
+
+
+class CoursePaginator(SelectablePagination):
+    page_number_class = CoursePageNumberPaginator
+    keyset_class = CourseKeysetPaginator
+
+
+class LessonPageNumberPaginator(PageNumberPagination):
     page_size = 10  # Количество уроков на странице по умолчанию
     page_size_query_param = 'page_size'
     max_page_size = 100
+
+
+class LessonKeysetPaginator(KeysetPagination):
+    ordering = ('created_at', 'id')
+    page_size = 10
+    max_page_size = 100
+
+
+class LessonPaginator(SelectablePagination):
+    page_number_class = LessonPageNumberPaginator
+    keyset_class = LessonKeysetPaginator
+
+
+class PaymentPageNumberPaginator(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class PaymentKeysetPaginator(KeysetPagination):
+    ordering = ('-payment_date', '-id')  # Как в Payment.Meta.ordering: сначала новые
+    page_size = 20
+    max_page_size = 200
+
+
+class PaymentPaginator(SelectablePagination):
+    page_number_class = PaymentPageNumberPaginator
+    keyset_class = PaymentKeysetPaginator
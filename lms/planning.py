@@ -0,0 +1,100 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def plan_queryset(queryset, serializer_class, request=None, load_only=None):
+    """Дополняет queryset аннотациями, prefetch и select_related под поля сериализатора.
+
+    Аннотации берутся из ``Meta.annotations`` сериализатора: имя поля -> функция,
+    которая принимает request и возвращает выражение (или None, если аннотация не нужна).
+    Вложенные сериализаторы со списком превращаются в Prefetch, одиночные - в select_related.
+    Если передан ``load_only`` (поля, нужные помимо сериализатора), из базы читаются только
+    столбцы выводимых полей - через ``.only()``.
+    """
+    serializer = serializer_class(context={'request': request})
+    annotations = getattr(serializer_class.Meta, 'annotations', {})
+
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+
+        if name in annotations:
+            expression = annotations[name](request)
+            if expression is not None:
+                queryset = queryset.annotate(**{name: expression})
+            continue
+
+        if isinstance(field, serializers.ListSerializer) and isinstance(field.child, serializers.ModelSerializer):
+            relation = field.source.split('.')[0]  # 'lessons.all' -> 'lessons'
+            child_class = type(field.child)
+            child_only = None
+            if load_only is not None:
+                # Без внешнего ключа prefetch не разложит уроки по курсам
+                child_only = [queryset.model._meta.get_field(relation).field.name]
+            related_queryset = plan_queryset(
+                child_class.Meta.model._default_manager.all(), child_class, request, child_only
+            )
+            queryset = queryset.prefetch_related(Prefetch(relation, queryset=related_queryset))
+        elif isinstance(field, serializers.ModelSerializer):
+            queryset = queryset.select_related(field.source)
+
+    if load_only is not None:
+        columns = _columns(serializer, annotations, request)
+        if columns is not None:
+            queryset = queryset.only(queryset.model._meta.pk.name, *columns, *load_only)
+    return queryset
+
+
+def _columns(serializer, annotations, request):
+    """Поля модели, которые читает сериализатор, или None, если их нельзя перечислить заранее"""
+    model = serializer.Meta.model
+    columns = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in annotations:
+            if annotations[name](request) is None:
+                return None  # метод без аннотации может читать любые атрибуты
+            continue
+        if isinstance(field, serializers.ListSerializer):
+            continue  # загружается отдельным prefetch по первичному ключу
+        if isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField)) \
+                or field.source == '*' or '.' in field.source:
+            return None
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None  # свойство модели
+        if not model_field.concrete:
+            return None
+        columns.append(model_field.name)
+    return columns
+
+
+def ordering_fields(pagination_class):
+    """Поля ключа keyset-пагинации view: их значения нужны для курсоров"""
+    keyset_class = getattr(pagination_class, 'keyset_class', pagination_class)
+    ordering = getattr(keyset_class, 'ordering', None) or ()
+    if isinstance(ordering, str):  # CursorPagination DRF
+        ordering = (ordering,)
+    return tuple(field.lstrip('-') for field in ordering)
+
+
+class QueryPlanMixin:
+    """Миксин для view: строит queryset по полям сериализатора, чтобы избежать N+1.
+
+    На чтение загружаются только столбцы полей, которые попадут в ответ (с учётом ``?fields=``).
+    """
+
+    def get_base_queryset(self):
+        """Queryset view без плана - для агрегатов и проверок"""
+        return super().get_queryset()
+
+    def get_queryset(self):
+        queryset = self.get_base_queryset()
+        load_only = None
+        if self.request.method in SAFE_METHODS:
+            load_only = ordering_fields(self.pagination_class)
+        return plan_queryset(queryset, self.get_serializer_class(), self.request, load_only)
@@ -0,0 +1,256 @@
+"""Профилирование запросов: SQL, повторяющиеся запросы, сериализация и общее время.
+
+Включается настройкой PROFILING_ENABLED. Выключенный ProfilingMiddleware убирает себя
+из цепочки при старте (MiddlewareNotUsed), поэтому ничего не стоит.
+Итоги каждого запроса уходят в заголовок Server-Timing и в скользящую сводку по маршрутам
+в кэше (Redis), откуда её читает ProfilingReportAPIView.
+"""
+import hashlib
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger(__name__)
+
+# Сводка хранится корзинами по PROFILING_BUCKET_SECONDS и охватывает последние PROFILING_WINDOW_SECONDS
+METRICS = ('count', 'total_us', 'sql_count', 'sql_us', 'duplicates', 'serializer_us')
+ROUTES_COUNT_KEY = 'lms:profiling:routes'
+
+_current_profile = ContextVar('current_profile', default=None)
+
+_IN_LIST = re.compile(r'\bIN \((?:%s, )*%s\)')
+_SPACES = re.compile(r'\s+')
+_REGEX_GROUP = re.compile(r'\(\?P<(\w+)>[^)]*\)')
+
+
+def route_template(match):
+    """Шаблон маршрута из ResolverMatch; регулярные выражения роутера DRF приводятся к виду path()"""
+    return '/' + _REGEX_GROUP.sub(r'<\1>', match.route).replace('^', '').replace('$', '')
+
+
+def route_name(request):
+    return f'{request.method} {route_template(request.resolver_match)}'
+
+
+def fingerprint(sql):
+    """Запрос без параметров: одинаковый отпечаток у запросов, отличающихся только значениями"""
+    return _IN_LIST.sub('IN (...)', _SPACES.sub(' ', sql).strip())
+
+
+class RequestProfile:
+    """Замеры одного запроса"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.queries = Counter()
+        self.serializer_depth = 0
+
+    @property
+    def sql_count(self):
+        return sum(self.queries.values())
+
+    @property
+    def duplicates(self):
+        """Сколько запросов лишние: повторы уже выполненного отпечатка (обычно N+1)"""
+        return sum(count - 1 for count in self.queries.values())
+
+    def __call__(self, execute, sql, params, many, context):
+        # Обёртка для connection.execute_wrapper
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.sql_time += elapsed
+            self.queries[fingerprint(sql)] += 1
+            if elapsed * 1000 >= settings.PROFILING_SLOW_QUERY_MS:
+                logger.warning(f'Slow query ({elapsed * 1000:.1f}ms): {sql}')
+
+    def capture(self):
+        """Контекст, в котором считаются запросы ко всем базам"""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self))
+        return stack
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def server_timing(self):
+        return ', '.join([
+            f'sql;dur={self.sql_time * 1000:.1f};desc="{self.sql_count} queries, {self.duplicates} duplicates"',
+            f'serializer;dur={self.serializer_time * 1000:.1f}',
+            f'total;dur={self.total * 1000:.1f}',
+        ])
+
+
+def _profiled_data(data):
+    def wrapper(serializer):
+        profile = _current_profile.get()
+        if profile is None:
+            return data.fget(serializer)
+        # Вложенный .data (например, из SerializerMethodField) уже входит во время внешнего
+        profile.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return data.fget(serializer)
+        finally:
+            profile.serializer_depth -= 1
+            if not profile.serializer_depth:
+                profile.serializer_time += time.perf_counter() - started
+
+    wrapper.profiled = True
+    return property(wrapper)
+
+
+def _patch_serializers():
+    if not getattr(BaseSerializer.data.fget, 'profiled', False):
+        BaseSerializer.data = _profiled_data(BaseSerializer.data)
+
+
+def _bucket(now):
+    return int(now) // settings.PROFILING_BUCKET_SECONDS
+
+
+def _route_key(route):
+    return f'lms:profiling:route:{hashlib.md5(route.encode()).hexdigest()}'
+
+
+def _register_route(route):
+    # Реестр маршрутов собран из атомарных add/incr: параллельные воркеры не теряют записи
+    if cache.add(_route_key(route), True, None):
+        try:
+            index = cache.incr(ROUTES_COUNT_KEY)
+        except ValueError:
+            cache.add(ROUTES_COUNT_KEY, 0, None)
+            index = cache.incr(ROUTES_COUNT_KEY)
+        cache.set(f'{ROUTES_COUNT_KEY}:{index}', route, None)
+
+
+def _incr(key, value, timeout):
+    try:
+        cache.incr(key, value)
+    except ValueError:
+        if not cache.add(key, value, timeout):
+            cache.incr(key, value)
+
+
+def record(route, profile, now=None):
+    """Добавляет замеры запроса в сводку маршрута за текущую корзину"""
+    _register_route(route)
+    prefix = f'{_route_key(route)}:{_bucket(now or time.time())}'
+    timeout = settings.PROFILING_WINDOW_SECONDS + settings.PROFILING_BUCKET_SECONDS
+    values = {
+        'count': 1,
+        'total_us': int(profile.total * 1e6),
+        'sql_count': profile.sql_count,
+        'sql_us': int(profile.sql_time * 1e6),
+        'duplicates': profile.duplicates,
+        'serializer_us': int(profile.serializer_time * 1e6),
+    }
+    for metric, value in values.items():
+        _incr(f'{prefix}:{metric}', value, timeout)
+
+
+def route_stats(now=None):
+    """Средние по каждому маршруту за окно PROFILING_WINDOW_SECONDS"""
+    count = cache.get(ROUTES_COUNT_KEY) or 0
+    routes = cache.get_many([f'{ROUTES_COUNT_KEY}:{index}' for index in range(1, count + 1)]).values()
+    last = _bucket(now or time.time())
+    buckets = range(last - settings.PROFILING_WINDOW_SECONDS // settings.PROFILING_BUCKET_SECONDS + 1, last + 1)
+
+    stats = []
+    for route in routes:
+        prefix = _route_key(route)
+        values = cache.get_many([f'{prefix}:{bucket}:{metric}' for bucket in buckets for metric in METRICS])
+        totals = {metric: sum(values.get(f'{prefix}:{bucket}:{metric}', 0) for bucket in buckets) for metric in METRICS}
+        requests = totals['count']
+        if not requests:
+            continue
+        stats.append({
+            'route': route,
+            'requests': requests,
+            'avg_ms': round(totals['total_us'] / requests / 1000, 2),
+            'avg_sql_queries': round(totals['sql_count'] / requests, 2),
+            'avg_sql_ms': round(totals['sql_us'] / requests / 1000, 2),
+            'avg_duplicates': round(totals['duplicates'] / requests, 2),
+            'avg_serializer_ms': round(totals['serializer_us'] / requests / 1000, 2),
+        })
+    return stats
+
+
+def top_routes(limit=10, now=None):
+    stats = route_stats(now)
+    return {
+        'slowest': sorted(stats, key=lambda item: item['avg_ms'], reverse=True)[:limit],
+        'most_duplicated': sorted(
+            (item for item in stats if item['avg_duplicates']),
+            key=lambda item: item['avg_duplicates'], reverse=True,
+        )[:limit],
+    }
+
+
+class ProfilingMiddleware:
+    """Считает SQL, повторы, время сериализации и общее время каждого запроса.
+
+    Работает и в sync, и в async цепочке: async-представления измеряются в своём режиме, без async_to_sync.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        _patch_serializers()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        try:
+            with profile.capture():
+                response = self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+        profile.finish()
+
+        response['Server-Timing'] = profile.server_timing()
+        if request.resolver_match is not None:
+            record(route_name(request), profile)
+        return response
+
+    async def __acall__(self, request):
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        # Соединения с базой привязаны к потоку: обёртки ставятся в том потоке, где async ORM выполняет запросы
+        capture = await sync_to_async(profile.capture)()
+        await sync_to_async(capture.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(capture.close)()
+            _current_profile.reset(token)
+        profile.finish()
+
+        response['Server-Timing'] = profile.server_timing()
+        if request.resolver_match is not None:
+            # Сводка пишется в Redis синхронным клиентом - не в цикле событий
+            await sync_to_async(record)(route_name(request), profile)
+        return response
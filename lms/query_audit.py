@@ -0,0 +1,127 @@
+"""EXPLAIN запросов эндпоинтов и задач: какие таблицы читаются полным проходом.
+
+Запросы эндпоинтов строят сами представления: get_queryset() и filter_queryset() на поддельном
+GET-запросе, затем страница пагинатора. Регрессия в представлении сразу видна в отчёте.
+Postgres: план в JSON, последовательное сканирование - узел ``Seq Scan``, строки - оценка размера
+таблицы из статистики (pg_class.reltuples).
+SQLite: строки ``SCAN <таблица>`` - без индекса или по всему индексу (если в запросе нет LIMIT),
+число строк - фактический размер таблицы.
+"""
+import json
+import re
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.request import Request
+
+from config.users.models import Payment
+from config.users.views import PaymentViewSet
+from .models import Course, Lesson, Subscription
+from .paginators import KeysetPagination
+from .views import CourseViewSet, LessonListCreateAPIView, LessonViewSet
+
+SQLITE_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)(?: AS \w+)?( USING (?:COVERING )?INDEX \w+)?')
+
+
+def _sample(model):
+    # На пустой базе - несуществующий id: план строится так же
+    return model._default_manager.order_by('pk').values_list('pk', flat=True).first() or 0
+
+
+def view_queryset(view_class, user, query=None, action='list', **kwargs):
+    """Запрос, который представление выполняет для GET с параметрами query: страница списка или объект"""
+    request = Request(RequestFactory().get('/', query or {}))
+    request.user = user
+    view = view_class(request=request, args=(), kwargs=kwargs, format_kwarg=None, action=action)
+    queryset = view.filter_queryset(view.get_queryset())
+    if action == 'list':
+        return view.paginator.page_queryset(queryset, request) if view.paginator else queryset
+    return queryset.filter(**{view.lookup_field: kwargs[view.lookup_url_kwarg or view.lookup_field]})
+
+
+def canonical_queries():
+    """(имя, queryset) - запросы, которые выполняют эндпоинты и периодические задачи"""
+    User = get_user_model()
+    user_id = _sample(User)
+    # Несохранённые пользователи: у обычного - только свои строки, администратор видит все
+    user, admin = User(pk=user_id), User(pk=user_id, is_staff=True)
+    course_id = _sample(Course)
+    now = timezone.now()
+    cursor = {'pagination': 'cursor', 'cursor': KeysetPagination.cursor_token([now.isoformat(), 0])}
+    # Фильтр по курсу проверяет, что курс существует: на пустой базе этот запрос не строится
+    payment_course = [('payment-list-course', view_queryset(PaymentViewSet, admin, {'course': course_id}))] \
+        if course_id else []
+    return [
+        ('course-list', view_queryset(CourseViewSet, user)),
+        ('course-list-cursor', view_queryset(CourseViewSet, user, cursor)),
+        ('course-detail', view_queryset(CourseViewSet, user, action='retrieve', pk=course_id)),
+        ('course-lessons', Lesson.objects.filter(course_id__in=[course_id])),
+        ('lesson-list', view_queryset(LessonListCreateAPIView, user)),
+        ('lesson-list-cursor', view_queryset(LessonListCreateAPIView, user, cursor)),
+        ('lesson-list-owner', view_queryset(LessonViewSet, user)),
+        ('user-subscriptions', Subscription.objects.filter(user_id=user_id, course_id__in=[course_id])),
+        ('course-subscribers', Subscription.objects.filter(course_id=course_id).order_by('user_id')
+         .values_list('user_id', flat=True)),
+        ('payment-list', view_queryset(PaymentViewSet, admin)),
+        ('payment-list-cursor', view_queryset(PaymentViewSet, admin, cursor)),
+        ('payment-list-user', view_queryset(PaymentViewSet, user)),
+        *payment_course,
+        ('payment-list-method', view_queryset(PaymentViewSet, admin, {'payment_method': 'card'})),
+        ('pending-payments', Payment.objects.filter(
+            status='pending',
+            payment_date__lt=now - timedelta(minutes=15),
+            payment_date__gte=now - timedelta(hours=24),
+        ).values_list('stripe_session_id', flat=True)[:100]),
+        ('inactive-users', get_user_model().objects.filter(
+            is_active=True, last_login__lt=now - timedelta(days=180)
+        ).values_list('pk', flat=True)),
+    ]
+
+
+def sequential_scans(queryset):
+    """[(таблица, строк)] полных проходов по таблицам в плане запроса"""
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        plan = json.loads(queryset.explain(format='json'))
+        return [(table, _table_rows(connection, table)) for table in _postgres_scans(plan[0]['Plan'])]
+    if connection.vendor == 'sqlite':
+        tables = set(connection.introspection.table_names())
+        scans = []
+        for line in queryset.explain().splitlines():
+            match = SQLITE_SCAN.search(line)
+            if not match or match.group(1) not in tables:
+                continue
+            if match.group(2) and queryset.query.is_sliced:
+                continue  # обход индекса в нужном порядке останавливается на LIMIT
+            scans.append((match.group(1), _table_rows(connection, match.group(1))))
+        return scans
+    raise NotImplementedError(f'EXPLAIN для {connection.vendor} не поддерживается')
+
+
+def _postgres_scans(node):
+    if node['Node Type'] == 'Seq Scan':
+        yield node['Relation Name']
+    for child in node.get('Plans', ()):
+        yield from _postgres_scans(child)
+
+
+def _table_rows(connection, table):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Оценка без полного прохода; -1, если таблицу ещё не анализировали
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+        else:
+            cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+        return cursor.fetchone()[0]
+
+
+def audit(min_rows):
+    """[(имя запроса, [(таблица, строк)])] с полными проходами не меньше min_rows строк"""
+    report = []
+    for name, queryset in canonical_queries():
+        scans = [(table, rows) for table, rows in sequential_scans(queryset) if rows >= min_rows]
+        report.append((name, scans))
+    return report
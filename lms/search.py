@@ -0,0 +1,142 @@
+"""Полнотекстовый поиск по курсам и урокам: ранжирование, поиск по началу слова и подсветка.
+
+Postgres: столбец ``search_vector`` (tsvector с GIN-индексом) заполняет триггер при вставке и при
+изменении title или description - в том числе через bulk_create и update(). SQLite (локальная
+разработка и тесты): таблицы FTS5 ``<таблица>_fts``, их ведут триггеры SQLite. Триггеры создаёт
+миграция 0007_search_index, пересборка индекса - команда ``rebuild_search_index``.
+"""
+import html
+import re
+
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'russian'
+MAX_TERMS = 8
+SNIPPET_WORDS = 16
+TERM = re.compile(r'\w+')
+
+# Границы подсвеченных слов в ответе базы; в html они заменяются на <mark> после экранирования текста
+START_SEL, STOP_SEL = '\x02', '\x03'
+
+
+def search_terms(query):
+    """Слова запроса без синтаксиса tsquery и FTS5"""
+    return TERM.findall(query.lower())[:MAX_TERMS]
+
+
+def highlight(text):
+    """Экранированный текст с найденными словами в <mark>"""
+    return html.escape(text or '').replace(START_SEL, '<mark>').replace(STOP_SEL, '</mark>')
+
+
+def fts_table(model):
+    return f'{model._meta.db_table}_fts'
+
+
+def fts_match(terms):
+    # Каждое слово - по началу (prefix), все слова обязательны
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def postgres_query(terms):
+    return SearchQuery(' & '.join(f'{term}:*' for term in terms), search_type='raw', config=SEARCH_CONFIG)
+
+
+def matching(queryset, query):
+    """queryset, отфильтрованный по индексу; пустой, если в запросе нет слов"""
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none()
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        return queryset.filter(search_vector=postgres_query(terms))
+    if connection.vendor == 'sqlite':
+        table = connection.ops.quote_name(fts_table(queryset.model))
+        return queryset.filter(pk__in=RawSQL(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [fts_match(terms)]))
+    raise NotImplementedError(f'Полнотекстовый поиск для {connection.vendor} не поддерживается')
+
+
+def search(queryset, query, limit):
+    """До limit объектов queryset по убыванию релевантности.
+
+    У объектов есть ``rank`` (чем больше, тем лучше), ``title_highlight`` и ``snippet`` -
+    заголовок и фрагмент описания с найденными словами в <mark>.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        results = _postgres_search(queryset, terms, limit)
+    elif connection.vendor == 'sqlite':
+        results = _sqlite_search(queryset, terms, limit, connection)
+    else:
+        raise NotImplementedError(f'Полнотекстовый поиск для {connection.vendor} не поддерживается')
+    for obj in results:
+        obj.title_highlight = highlight(obj.title_highlight)
+        obj.snippet = highlight(obj.snippet)
+    return results
+
+
+def _postgres_search(queryset, terms, limit):
+    query = postgres_query(terms)
+    return list(
+        queryset.filter(search_vector=query)
+        .annotate(
+            rank=SearchRank(F('search_vector'), query),
+            title_highlight=SearchHeadline('title', query, config=SEARCH_CONFIG, start_sel=START_SEL,
+                                           stop_sel=STOP_SEL, highlight_all=True),
+            snippet=SearchHeadline('description', query, config=SEARCH_CONFIG, start_sel=START_SEL,
+                                   stop_sel=STOP_SEL, max_words=SNIPPET_WORDS, min_words=SNIPPET_WORDS // 2),
+        )
+        .order_by('-rank', 'pk')[:limit]
+    )
+
+
+def _sqlite_search(queryset, terms, limit, connection):
+    table = connection.ops.quote_name(fts_table(queryset.model))
+    ids_sql, ids_params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        # bm25: меньше - лучше; совпадение в заголовке весит в 10 раз больше, чем в описании.
+        # +rowid: без унарного плюса FTS5 получает IN как ограничение rowid и повторяет MATCH
+        # для каждой строки queryset - на тысяче уроков в сотни раз медленнее
+        cursor.execute(
+            f'SELECT rowid, -bm25({table}, 10.0, 1.0), highlight({table}, 0, %s, %s), '
+            f'snippet({table}, 1, %s, %s, %s, %s) '
+            f'FROM {table} WHERE {table} MATCH %s AND +rowid IN ({ids_sql}) '
+            f'ORDER BY bm25({table}, 10.0, 1.0), rowid LIMIT %s',
+            [START_SEL, STOP_SEL, START_SEL, STOP_SEL, '…', SNIPPET_WORDS, fts_match(terms), *ids_params, limit],
+        )
+        rows = cursor.fetchall()
+    objects = queryset.in_bulk([row[0] for row in rows])
+    results = []
+    for pk, rank, title_highlight, snippet in rows:
+        obj = objects[pk]
+        obj.rank, obj.title_highlight, obj.snippet = rank, title_highlight, snippet
+        results.append(obj)
+    return results
+
+
+def rebuild(model):
+    """Заново заполняет индекс модели из её таблицы (после правок в обход триггеров)"""
+    connection = connections[model.objects.db]
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                f"UPDATE {table} SET search_vector = "
+                f"setweight(to_tsvector(%s, coalesce(title, '')), 'A') || "
+                f"setweight(to_tsvector(%s, coalesce(description, '')), 'B')",
+                [SEARCH_CONFIG, SEARCH_CONFIG],
+            )
+        elif connection.vendor == 'sqlite':
+            fts = connection.ops.quote_name(fts_table(model))
+            cursor.execute(f'DELETE FROM {fts}')
+            cursor.execute(
+                f"INSERT INTO {fts}(rowid, title, description) SELECT id, title, coalesce(description, '') FROM {table}"
+            )
+        else:
+            raise NotImplementedError(f'Полнотекстовый поиск для {connection.vendor} не поддерживается')
@@ -1,16 +1,47 @@
+from django.db.models import Exists, OuterRef
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.serializers import ModelSerializer
 
 from .models import Course, Lesson, Subscription
+from .search import search_terms
+from .thumbnails import srcset, variants_field
 from .validators import validate_no_external_links
 
+
+class ImageVariantsField(serializers.Field):
+    """Уменьшенные копии изображения для srcset: ``{'webp': 'адрес 320w, ...', 'jpeg': '...'}``.
+
+    Читает только JSON-поле ``<image_field>_variants``; пока копии не построены - ``{}``.
+    """
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs['source'] = variants_field(image_field)
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        storage = self.parent.Meta.model._meta.get_field(self.image_field).storage
+        request = self.context.get('request')
+
+        def url(name):
+            # Как FileField DRF: абсолютный адрес, если есть запрос
+            return request.build_absolute_uri(storage.url(name)) if request is not None else storage.url(name)
+
+        return srcset(value, url)
+
+
 class LessonSerializer(serializers.ModelSerializer):
     owner = serializers.HiddenField(
         default=serializers.CurrentUserDefault()
     )
+    preview_srcset = ImageVariantsField('preview')
+
     class Meta:
         model = Lesson
-        fields = ['id', 'course', 'title', 'description', 'preview', 'video_link', 'created_at', 'updated_at']
+        fields = ['id', 'course', 'title', 'description', 'preview', 'preview_srcset', 'video_link', 'created_at',
+                  'updated_at', 'owner']
         extra_kwargs = {
             'video_link': {
                 'validators': [validate_no_external_links]
@@ -18,23 +49,75 @@ class LessonSerializer(serializers.ModelSerializer):
         }
 
 
-class CourseSerializer(serializers.ModelSerializer):
-    lessons_count = serializers.SerializerMethodField()
+def query_list(request, param):
+    """Значения параметра вида ``?fields=id,title`` (можно повторять параметр) или None"""
+    values = request.query_params.getlist(param) if request is not None else []
+    names = {name.strip() for value in values for name in value.split(',')} - {''}
+    return names or None
+
+
+class SparseFieldsMixin:
+    """Поля ответа по запросу клиента.
+
+    ``?fields=id,title`` оставляет в ответе только перечисленные поля (только для чтения: на запись
+    сериализатор принимает все поля). Поля из ``Meta.expandable`` выводятся, только если названы
+    в ``?expand=`` или в ``?fields=``. Неизвестные имена пропускаются.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None:
+            return fields
+        only = query_list(request, 'fields') if request.method in SAFE_METHODS else None
+        expand = query_list(request, 'expand') or set()
+        expandable = getattr(self.Meta, 'expandable', ())
+
+        for name in list(fields):
+            if fields[name].write_only:
+                continue
+            if name in expandable:
+                keep = name in expand or (only is not None and name in only)
+            else:
+                keep = only is None or name in only
+            if not keep:
+                del fields[name]
+        return fields
+
+
+def is_subscribed_annotation(request):
+    if request and request.user.is_authenticated:
+        return Exists(
+            Subscription.objects.filter(
+                user=request.user,
+                course=OuterRef('pk')
+            )
+        )
+    return None
+
+
+class CourseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     lessons = LessonSerializer(many=True, read_only=True, source='lessons.all')
     is_subscribed = serializers.SerializerMethodField()
     owner = serializers.HiddenField(
         default=serializers.CurrentUserDefault()
     )
+    preview_srcset = ImageVariantsField('preview')
 
     class Meta:
         model = Course
-        fields = ['id', 'title', 'preview', 'description', 'created_at', 'updated_at',  'lessons_count', 'lessons']
-
-
-    def get_lessons_count(self, obj):
-        return obj.lessons.count()
+        fields = ['id', 'title', 'preview', 'preview_srcset', 'description', 'created_at', 'updated_at',
+                  'lessons_count', 'lessons', 'is_subscribed', 'owner']
+        # Аннотации, которые QueryPlanMixin добавляет в queryset
+        annotations = {
+            'is_subscribed': is_subscribed_annotation,
+        }
+        # Вложенные списки, которые выводятся только по ?expand=
+        expandable = ('lessons',)
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.subscriptions.filter(user=request.user).exists()
@@ -46,3 +129,41 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         fields = ['id', 'course', 'subscribed_at']
         read_only_fields = ['subscribed_at']
 
+
+class BulkSubscriptionSerializer(serializers.Serializer):
+    course_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100,
+    )
+
+    def validate_course_ids(self, value):
+        return list(dict.fromkeys(value))  # без повторов, в порядке запроса
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=200)
+    type = serializers.ChoiceField(choices=['course', 'lesson'], required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
+    def validate_q(self, value):
+        if not search_terms(value):
+            raise serializers.ValidationError('В запросе нет слов для поиска')
+        return value
+
+
+class CourseSearchResultSerializer(serializers.ModelSerializer):
+    """Найденный курс: заголовок и фрагмент описания с найденными словами в <mark>"""
+    rank = serializers.FloatField()
+    title_highlight = serializers.CharField()
+    snippet = serializers.CharField()
+
+    class Meta:
+        model = Course
+        fields = ['id', 'title', 'rank', 'title_highlight', 'snippet']
+
+
+class LessonSearchResultSerializer(CourseSearchResultSerializer):
+    class Meta:
+        model = Lesson
+        fields = ['id', 'course', 'title', 'rank', 'title_highlight', 'snippet']
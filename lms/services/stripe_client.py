@@ -0,0 +1,332 @@
+"""Клиент Stripe API: пул keep-alive соединений, таймауты на вызов, повторы с джиттером и предохранитель"""
+import asyncio
+import logging
+import random
+import ssl
+import threading
+import time
+import uuid
+import weakref
+from collections import defaultdict, deque
+from contextvars import ContextVar
+
+import aiohttp
+import requests
+import stripe
+from requests.adapters import HTTPAdapter
+
+from config.lms.metrics import observe_external_call
+
+logger = logging.getLogger(__name__)
+
+# (подключение, чтение) в секундах; подключение чуть больше 3 с - кратно окну повтора TCP SYN
+DEFAULT_TIMEOUT = (3.05, 10)
+
+
+class StripeUnavailable(Exception):
+    """Предохранитель разомкнут: Stripe недавно не отвечал, вызов не выполнялся"""
+
+
+class CircuitBreaker:
+    """Размыкается после failure_threshold сбоев подряд и пропускает пробный вызов через reset_timeout секунд"""
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        with self.lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+
+
+class LatencyMetrics:
+    """Задержка вызовов по операциям: счётчики и последние window замеров для перцентилей"""
+
+    def __init__(self, window=1000):
+        self.lock = threading.Lock()
+        self.window = window
+        self.counts = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.samples = defaultdict(lambda: deque(maxlen=self.window))
+
+    def record(self, operation, seconds, ok=True):
+        observe_external_call('stripe', operation, seconds, ok)
+        with self.lock:
+            self.counts[operation] += 1
+            if not ok:
+                self.errors[operation] += 1
+            self.samples[operation].append(seconds * 1000)
+
+    def snapshot(self):
+        with self.lock:
+            result = {}
+            for operation, samples in self.samples.items():
+                ordered = sorted(samples)
+                result[operation] = {
+                    'count': self.counts[operation],
+                    'errors': self.errors[operation],
+                    'p50_ms': round(ordered[len(ordered) // 2], 2),
+                    'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+                    'max_ms': round(ordered[-1], 2),
+                }
+            return result
+
+
+# Таймаут текущего вызова; ContextVar виден и в потоке, и в задаче asyncio, которые делают вызов
+_call_timeout = ContextVar('stripe_call_timeout', default=None)
+
+
+class _TimeoutSession(requests.Session):
+    """Сессия requests для stripe.RequestsClient(session=...): таймаут вызова заменяет таймаут клиента"""
+
+    def request(self, method, url, **kwargs):
+        kwargs['timeout'] = _call_timeout.get() or kwargs.get('timeout')
+        return super().request(method, url, **kwargs)
+
+
+class _AIOHTTPClient(stripe.AIOHTTPClient):
+    """Асинхронный клиент SDK с таймаутом на вызов и ограниченным пулом соединений.
+
+    aiohttp, а не httpx: пул httpx при сотне одновременных запросов теряет пропускную
+    способность в несколько раз (см. benchmark_payments).
+    У AIOHTTPClient нет публичных параметров для сессии и таймаута на вызов, поэтому переопределены
+    его атрибуты _timeout и _session. Версия stripe закреплена в requirements.txt, а
+    StripeSDKInternalsTests упадут, если SDK перестанет их использовать.
+    """
+
+    def __init__(self, timeout, pool_size):
+        super().__init__(timeout=timeout)
+        self._pool_size = pool_size
+
+    @property
+    def _timeout(self):
+        timeout = _call_timeout.get() or self._default_timeout
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            return aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+        return aiohttp.ClientTimeout(total=timeout)
+
+    @_timeout.setter
+    def _timeout(self, value):
+        self._default_timeout = value
+
+    @property
+    def _session(self):
+        if self._cached_session is None:
+            ssl_context = ssl.create_default_context(cafile=stripe.ca_bundle_path)
+            connector = aiohttp.TCPConnector(ssl=ssl_context, limit=self._pool_size)
+            self._cached_session = aiohttp.ClientSession(connector=connector)
+        return self._cached_session
+
+
+class StripeClient:
+    """Обёртка над SDK Stripe для вызовов из web-процессов.
+
+    Одна requests.Session держит keep-alive соединения, каждый вызов ограничен таймаутом,
+    POST-запросы идут с ключом идемпотентности и повторяются с экспоненциальной задержкой
+    и полным джиттером. Предохранитель не даёт воркерам ждать Stripe, пока он недоступен.
+    Методы с суффиксом _async делают то же через aiohttp и не блокируют event loop;
+    предохранитель и метрики у них общие с синхронными.
+    """
+
+    def __init__(self, api_key, api_base=None, timeout=DEFAULT_TIMEOUT, max_retries=2, backoff=0.25,
+                 max_backoff=2.0, pool_size=10, async_pool_size=100, breaker=None, metrics=None):
+        session = _TimeoutSession()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        self.api_key = api_key
+        self.base_addresses = {'api': api_base} if api_base else {}
+        self.timeout = timeout
+        self.async_pool_size = async_pool_size
+        self.client = self._make_client(stripe.RequestsClient(timeout=timeout, session=session))
+        # Сессия aiohttp привязана к event loop, поэтому асинхронный клиент свой у каждого loop
+        self._async_clients = weakref.WeakKeyDictionary()
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.metrics = metrics or LatencyMetrics()
+
+    def _make_client(self, http_client):
+        return stripe.StripeClient(
+            self.api_key,
+            base_addresses=self.base_addresses,
+            http_client=http_client,
+            max_network_retries=0,  # Повторы делает _call, чтобы их видел предохранитель
+        )
+
+    @property
+    def async_client(self):
+        loop = asyncio.get_running_loop()
+        if loop not in self._async_clients:
+            http_client = _AIOHTTPClient(timeout=self.timeout, pool_size=self.async_pool_size)
+            self._async_clients[loop] = (self._make_client(http_client), http_client)
+        return self._async_clients[loop][0]
+
+    async def aclose(self):
+        """Закрывает сессию aiohttp текущего event loop (нужно, если loop живёт меньше процесса)"""
+        entry = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if entry is not None and entry[1]._cached_session is not None:
+            await entry[1].close_async()
+
+    def create_product(self, idempotency_key=None, timeout=None, **params):
+        return self._call('product.create', lambda options: self.client.products.create(params, options),
+                          idempotency_key or str(uuid.uuid4()), timeout)
+
+    def create_price(self, idempotency_key=None, timeout=None, **params):
+        return self._call('price.create', lambda options: self.client.prices.create(params, options),
+                          idempotency_key or str(uuid.uuid4()), timeout)
+
+    def create_checkout_session(self, idempotency_key=None, timeout=None, **params):
+        return self._call('checkout_session.create',
+                          lambda options: self.client.checkout.sessions.create(params, options),
+                          idempotency_key or str(uuid.uuid4()), timeout)
+
+    def retrieve_checkout_session(self, session_id, timeout=None):
+        return self._call('checkout_session.retrieve',
+                          lambda options: self.client.checkout.sessions.retrieve(session_id, {}, options),
+                          None, timeout)
+
+    async def create_product_async(self, idempotency_key=None, timeout=None, **params):
+        return await self._call_async(
+            'product.create', lambda options: self.async_client.products.create_async(params, options),
+            idempotency_key or str(uuid.uuid4()), timeout,
+        )
+
+    async def create_price_async(self, idempotency_key=None, timeout=None, **params):
+        return await self._call_async(
+            'price.create', lambda options: self.async_client.prices.create_async(params, options),
+            idempotency_key or str(uuid.uuid4()), timeout,
+        )
+
+    async def create_checkout_session_async(self, idempotency_key=None, timeout=None, **params):
+        return await self._call_async(
+            'checkout_session.create',
+            lambda options: self.async_client.checkout.sessions.create_async(params, options),
+            idempotency_key or str(uuid.uuid4()), timeout,
+        )
+
+    async def retrieve_checkout_session_async(self, session_id, timeout=None):
+        return await self._call_async(
+            'checkout_session.retrieve',
+            lambda options: self.async_client.checkout.sessions.retrieve_async(session_id, {}, options),
+            None, timeout,
+        )
+
+    def _call(self, operation, request, idempotency_key, timeout):
+        options = self._start(operation, idempotency_key)
+        attempt = 0
+        try:
+            while True:
+                started = time.perf_counter()
+                token = _call_timeout.set(timeout)
+                try:
+                    result = request(options)
+                except stripe.StripeError as e:
+                    time.sleep(self._failed(operation, e, attempt, started))
+                    attempt += 1
+                    continue
+                finally:
+                    _call_timeout.reset(token)
+                return self._succeeded(operation, result, started)
+        except stripe.StripeError:
+            raise  # учтена в _failed
+        except BaseException:
+            self._abandoned()
+            raise
+
+    async def _call_async(self, operation, request, idempotency_key, timeout):
+        options = self._start(operation, idempotency_key)
+        attempt = 0
+        try:
+            while True:
+                started = time.perf_counter()
+                token = _call_timeout.set(timeout)
+                try:
+                    result = await request(options)
+                except stripe.StripeError as e:
+                    await asyncio.sleep(self._failed(operation, e, attempt, started))
+                    attempt += 1
+                    continue
+                finally:
+                    _call_timeout.reset(token)
+                return self._succeeded(operation, result, started)
+        except stripe.StripeError:
+            raise  # учтена в _failed
+        except BaseException:
+            self._abandoned()  # в том числе CancelledError, когда клиент ASGI отключился
+            raise
+
+    def _start(self, operation, idempotency_key):
+        if not self.breaker.allow():
+            raise StripeUnavailable(f'Stripe недоступен, вызов {operation} пропущен')
+        # Ключ один на все попытки: повтор после таймаута не создаст второй объект
+        return {'idempotency_key': idempotency_key} if idempotency_key else {}
+
+    def _abandoned(self):
+        """Вызов прерван не ошибкой Stripe (отмена, сетевая ошибка без обёртки SDK, ошибка в коде).
+
+        Считается сбоем: иначе пробный вызов полуоткрытого предохранителя остался бы занят навсегда.
+        """
+        self.breaker.record_failure()
+
+    def _failed(self, operation, error, attempt, started):
+        """Учитывает ошибку и возвращает паузу перед повтором или пробрасывает ошибку дальше"""
+        self.metrics.record(operation, time.perf_counter() - started, ok=False)
+        if not self._retryable(error):
+            self.breaker.record_success()  # Stripe ответил: ошибка в запросе, а не сбой сервиса
+            raise error
+        if attempt >= self.max_retries:
+            self.breaker.record_failure()
+            raise error
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        logger.warning(f'Stripe {operation} failed ({error.__class__.__name__}), retry in {delay:.2f}s')
+        return delay
+
+    def _succeeded(self, operation, result, started):
+        elapsed = time.perf_counter() - started
+        self.metrics.record(operation, elapsed)
+        self.breaker.record_success()
+        logger.debug(f'Stripe {operation} took {elapsed * 1000:.1f}ms')
+        return result
+
+    @staticmethod
+    def _retryable(error):
+        """Сеть, таймаут, 429 и 5xx; прочие 4xx означают ошибку в самом запросе"""
+        if isinstance(error, (stripe.APIConnectionError, stripe.RateLimitError)):
+            return True
+        return isinstance(error, stripe.APIError) and (error.http_status is None or error.http_status >= 500)
@@ -1,42 +1,244 @@
+import json
+import threading
+from collections import OrderedDict
+from decimal import Decimal
+from functools import lru_cache
+
 import stripe
 from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from config.lms.models import StripePrice, StripeProduct
+from config.lms.services.stripe_client import StripeClient
+
+STRIPE_CURRENCY = 'rub'
+
+# Соответствия курс -> продукт и (курс, сумма) -> цена неизменяемы, поэтому ищутся сначала в памяти
+# процесса (последние LOCAL_IDS_MAXSIZE), затем в общем кэше (STRIPE_IDS_CACHE_TIMEOUT), затем в таблицах
+# StripeProduct / StripePrice. Ключи кэшей включают режим ключа API: ID тестового режима не годятся в боевом
+LOCAL_IDS_MAXSIZE = 10_000
+STRIPE_IDS_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+
+class LocalIds(OrderedDict):
+    """LRU-словарь ключ кэша -> ID Stripe в памяти процесса"""
+
+    def __init__(self, maxsize):
+        super().__init__()
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self:
+                return default
+            self.move_to_end(key)
+            return self[key]
+
+    def remember(self, key, value):
+        with self.lock:
+            self[key] = value
+            self.move_to_end(key)
+            while len(self) > self.maxsize:
+                self.popitem(last=False)
+
+
+_local_ids = LocalIds(LOCAL_IDS_MAXSIZE)
+
+
+@lru_cache(maxsize=None)
+def get_stripe_client():
+    """Один клиент на процесс: его пул соединений и предохранитель общие для всех запросов"""
+    return StripeClient(
+        settings.STRIPE_SECRET_KEY,
+        api_base=settings.STRIPE_API_BASE,
+        timeout=(settings.STRIPE_CONNECT_TIMEOUT, settings.STRIPE_READ_TIMEOUT),
+        max_retries=settings.STRIPE_MAX_RETRIES,
+    )
+
+
+@receiver(setting_changed)
+def reset_stripe_client(setting, **kwargs):
+    if setting.startswith('STRIPE_'):
+        get_stripe_client.cache_clear()
+
+
+def _key_mode():
+    """'live' или 'test' по секретному ключу (sk_live_... / sk_test_..., то же для rk_)"""
+    return 'live' if '_live_' in (settings.STRIPE_SECRET_KEY or '') else 'test'
+
+
+def _id_key(*parts):
+    return ':'.join(['stripe', _key_mode(), *map(str, parts)])
+
+
+def _cached_id(key, load):
+    stripe_id = _local_ids.get(key)
+    if stripe_id is None:
+        stripe_id = cache.get(key)
+        if stripe_id is None:
+            stripe_id = load()
+            cache.set(key, stripe_id, STRIPE_IDS_CACHE_TIMEOUT)
+        _local_ids.remember(key, stripe_id)
+    return stripe_id
+
+
+def _unit_amount(amount):
+    return int((Decimal(amount) * 100).to_integral_value())  # Конвертация в копейки
+
+
+def _product_params(course):
+    return {
+        'name': course.title,
+        'description': course.description[:500] if course.description else None,
+        'metadata': {
+            'course_id': course.id,
+        },
+        'idempotency_key': f'course-{course.id}-product',
+    }
+
+
+def _price_params(product_id, amount):
+    return {
+        'product': product_id,
+        'unit_amount': _unit_amount(amount),
+        'currency': STRIPE_CURRENCY,
+        'idempotency_key': f'{product_id}-price-{_unit_amount(amount)}-{STRIPE_CURRENCY}',
+    }
+
+
+def _session_params(price_id, success_url, cancel_url):
+    return {
+        'payment_method_types': ['card'],
+        'line_items': [{
+            'price': price_id,
+            'quantity': 1,
+        }],
+        'mode': 'payment',
+        'success_url': success_url,
+        'cancel_url': cancel_url,
+    }
+
+
+def _price_key(course, amount):
+    return _id_key('price', course.id, amount, STRIPE_CURRENCY)
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
 
 def create_stripe_product(course):
     """Создание продукта в Stripe"""
-    product = stripe.Product.create(
-        name=course.title,
-        description=course.description[:500] if course.description else None,
-        metadata={
-            'course_id': course.id,
-        }
-    )
-    return product
+    return get_stripe_client().create_product(**_product_params(course))
+
 
 def create_stripe_price(product_id, amount):
     """Создание цены в Stripe"""
-    price = stripe.Price.create(
-        product=product_id,
-        unit_amount=int(amount * 100),  # Конвертация в копейки
-        currency="rub",
-    )
-    return price
+    return get_stripe_client().create_price(**_price_params(product_id, amount))
+
+
+def get_stripe_product_id(course):
+    """ID продукта Stripe для курса; продукт создаётся только при первом обращении"""
+    def load():
+        mapping = StripeProduct.objects.filter(course=course).first()
+        if mapping is None:
+            product = create_stripe_product(course)
+            mapping, _ = StripeProduct.objects.get_or_create(course=course, defaults={'product_id': product.id})
+        return mapping.product_id
+
+    return _cached_id(_id_key('product', course.id), load)
+
+
+def get_stripe_price_id(course, amount):
+    """ID цены Stripe для курса и суммы.
+
+    Для новой суммы создаётся новая цена, прежние цены остаются в Stripe и в таблице
+    (на них могут ссылаться незавершённые сессии оплаты).
+    """
+    amount = Decimal(amount).quantize(Decimal('0.01'))
+
+    def load():
+        mapping = StripePrice.objects.filter(course=course, amount=amount, currency=STRIPE_CURRENCY).first()
+        if mapping is None:
+            price = create_stripe_price(get_stripe_product_id(course), amount)
+            mapping, _ = StripePrice.objects.get_or_create(
+                course=course,
+                amount=amount,
+                currency=STRIPE_CURRENCY,
+                defaults={'price_id': price.id},
+            )
+        return mapping.price_id
+
+    return _cached_id(_price_key(course, amount), load)
+
 
 def create_stripe_session(price_id, success_url, cancel_url):
     """Создание сессии оплаты в Stripe"""
-    session = stripe.checkout.Session.create(
-        payment_method_types=['card'],
-        line_items=[{
-            'price': price_id,
-            'quantity': 1,
-        }],
-        mode='payment',
-        success_url=success_url,
-        cancel_url=cancel_url,
-    )
-    return session
+    return get_stripe_client().create_checkout_session(**_session_params(price_id, success_url, cancel_url))
+
 
 def get_stripe_session(session_id):
     """Получение информации о сессии оплаты"""
-    return stripe.checkout.Session.retrieve(session_id)
\ No newline at end of file
+    return get_stripe_client().retrieve_checkout_session(session_id)
+
+
+# Асинхронные версии для ASGI-представлений: те же кэши и таблицы, но без блокирующего I/O
+
+async def _acached_id(key, load):
+    stripe_id = _local_ids.get(key)
+    if stripe_id is None:
+        stripe_id = await cache.aget(key)
+        if stripe_id is None:
+            stripe_id = await load()
+            await cache.aset(key, stripe_id, STRIPE_IDS_CACHE_TIMEOUT)
+        _local_ids.remember(key, stripe_id)
+    return stripe_id
+
+
+async def aget_stripe_product_id(course):
+    async def load():
+        mapping = await StripeProduct.objects.filter(course=course).afirst()
+        if mapping is None:
+            product = await get_stripe_client().create_product_async(**_product_params(course))
+            mapping, _ = await StripeProduct.objects.aget_or_create(course=course, defaults={'product_id': product.id})
+        return mapping.product_id
+
+    return await _acached_id(_id_key('product', course.id), load)
+
+
+async def aget_stripe_price_id(course, amount):
+    amount = Decimal(amount).quantize(Decimal('0.01'))
+
+    async def load():
+        mapping = await StripePrice.objects.filter(course=course, amount=amount, currency=STRIPE_CURRENCY).afirst()
+        if mapping is None:
+            product_id = await aget_stripe_product_id(course)
+            price = await get_stripe_client().create_price_async(**_price_params(product_id, amount))
+            mapping, _ = await StripePrice.objects.aget_or_create(
+                course=course,
+                amount=amount,
+                currency=STRIPE_CURRENCY,
+                defaults={'price_id': price.id},
+            )
+        return mapping.price_id
+
+    return await _acached_id(_price_key(course, amount), load)
+
+
+async def acreate_stripe_session(price_id, success_url, cancel_url):
+    client = get_stripe_client()
+    return await client.create_checkout_session_async(**_session_params(price_id, success_url, cancel_url))
+
+
+async def aget_stripe_session(session_id):
+    return await get_stripe_client().retrieve_checkout_session_async(session_id)
+
+
+def construct_webhook_event(payload, signature):
+    """Проверка подписи вебхука. Возвращает событие как словарь или None, если подпись неверна"""
+    if not settings.STRIPE_WEBHOOK_SECRET:
+        return None
+    try:
+        stripe.Webhook.construct_event(payload, signature, settings.STRIPE_WEBHOOK_SECRET)
+    except (ValueError, stripe.SignatureVerificationError):
+        return None
+    return json.loads(payload)
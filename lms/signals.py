@@ -0,0 +1,72 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import invalidate_list, invalidate_object, touch
+from .models import Course, Lesson, Subscription
+from .tasks import schedule_image_variants
+from .thumbnails import reset_stale_variants
+
+
+@receiver([post_save, post_delete], sender=Course)
+def invalidate_course_cache(sender, instance, **kwargs):
+    invalidate_object('course', instance.pk)
+    invalidate_list('course')
+
+
+@receiver(post_delete, sender=Course)
+def touch_course_list(sender, instance, **kwargs):
+    # Удаление не видно по max(updated_at) - отметка для Last-Modified списка
+    touch('course:list')
+
+
+@receiver([post_save, post_delete], sender=Lesson)
+def invalidate_lesson_cache(sender, instance, **kwargs):
+    invalidate_object('lesson', instance.pk)
+    invalidate_list('lesson')
+    # Уроки вложены в ответ курса (lessons, lessons_count). При переносе урока меняется и прежний курс:
+    # его id помнит CountedInCourse, пока update_course_counters (подключён ниже) не сохранил новый
+    invalidate_object('course', instance.course_id)
+    previous = getattr(instance, '_loaded_course_id', None)
+    if previous is not None and previous != instance.course_id:
+        invalidate_object('course', previous)
+    invalidate_list('course')
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_save, sender=Subscription)
+def update_course_counters(sender, instance, created, **kwargs):
+    # Для урока тем же UPDATE обновляется updated_at курса (Lesson.course_updates)
+    instance.counter_saved(created)
+
+
+@receiver(post_delete, sender=Lesson)
+@receiver(post_delete, sender=Subscription)
+def update_course_counters_on_delete(sender, instance, origin=None, **kwargs):
+    instance.counter_deleted(origin)
+
+
+@receiver(post_delete, sender=Lesson)
+def touch_lesson_list(sender, instance, **kwargs):
+    touch('lesson:list')
+
+
+@receiver([post_save, post_delete], sender=Subscription)
+def invalidate_subscription_cache(sender, instance, **kwargs):
+    # is_subscribed в кэш не попадает, список курсов не трогаем
+    invalidate_object('course', instance.course_id)
+    touch(f'subscriptions:{instance.user_id}')
+
+
+@receiver(pre_save, sender=Course)
+@receiver(pre_save, sender=Lesson)
+def reset_preview_variants(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        reset_stale_variants(instance, 'preview', update_fields)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Lesson)
+def build_preview_variants(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Копии строит воркер Celery после коммита, запрос загрузки их не ждёт
+    if not raw:
+        schedule_image_variants(instance, 'preview', update_fields)
@@ -1,51 +1,238 @@
-from celery import shared_task
-from django.core.mail import send_mail
+import time
+import uuid
+from contextlib import contextmanager
+
+from celery import group, shared_task
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
 from django.template.loader import render_to_string
 from django.conf import settings
-from .models import Subscription
+from PIL import Image, UnidentifiedImageError
+from . import thumbnails
+from .metrics import timed_external_call
+from .models import Course, Subscription
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Сколько писем отправляется через одно SMTP-соединение
+NOTIFICATION_CHUNK_SIZE = 500
 
+# Серия правок курса превращается в одну рассылку: она уходит, когда курс не менялся
+# NOTIFICATION_DEBOUNCE_SECONDS, но не позже NOTIFICATION_MAX_DELAY_SECONDS после первой правки
+NOTIFICATION_DEBOUNCE_SECONDS = 2 * 60
+NOTIFICATION_MAX_DELAY_SECONDS = 15 * 60
+# Блокировка набора изменений курса; истекает сама, если держатель упал
+NOTIFICATION_LOCK_TIMEOUT = 10
 
-@shared_task(bind=True, max_retries=3)
-def send_course_update_notification(self, course_id):
+# Изменения, которые не соответствуют полям модели Course
+CHANGE_LABELS = {
+    'lessons': 'уроки',
+    'published': 'публикация',
+}
+
+
+def _notification_keys(course_id):
+    prefix = f'lms:course:{course_id}:notify'
+    return f'{prefix}:changes', f'{prefix}:first', f'{prefix}:last', f'{prefix}:scheduled'
+
+
+@contextmanager
+def _notification_lock(course_id):
+    """Сериализует чтение и запись набора изменений курса между процессами (cache.add атомарен)"""
+    key, token = f'lms:course:{course_id}:notify:lock', uuid.uuid4().hex
+    while not cache.add(key, token, NOTIFICATION_LOCK_TIMEOUT):
+        time.sleep(0.01)
     try:
-        course_subscriptions = Subscription.objects.filter(
-            course_id=course_id
-        ).select_related('user', 'course')
+        yield
+    finally:
+        # Не снимаем чужую блокировку, если наша успела истечь
+        if cache.get(key) == token:
+            cache.delete(key)
+
+
+def schedule_course_update_notification(course_id, changes):
+    """Добавляет изменения в набор ожидающих и ставит отложенную рассылку, если её ещё нет"""
+    changes_key, first_key, last_key, scheduled_key = _notification_keys(course_id)
+    timeout = NOTIFICATION_MAX_DELAY_SECONDS + NOTIFICATION_DEBOUNCE_SECONDS
+    now = time.time()
+
+    with _notification_lock(course_id):
+        pending = cache.get(changes_key, [])
+        cache.set(changes_key, sorted(set(pending) | set(changes)), timeout)
+        cache.add(first_key, now, timeout)
+        cache.set(last_key, now, timeout)
+        # Флаг ставится последним: если рассылка уже сняла изменения, будет запланирована новая
+        scheduled = cache.add(scheduled_key, now, timeout)
+    if scheduled:
+        flush_course_update_notification.apply_async(args=(course_id,), countdown=NOTIFICATION_DEBOUNCE_SECONDS)
+
 
-        if not course_subscriptions.exists():
+@shared_task
+def flush_course_update_notification(course_id):
+    """Отправляет накопленные изменения курса одной рассылкой или откладывает её, если правки продолжаются"""
+    changes_key, first_key, last_key, scheduled_key = _notification_keys(course_id)
+    now = time.time()
+    first_edit = cache.get(first_key, now)
+    quiet_for = now - cache.get(last_key, 0)
+    waited = now - first_edit
+
+    if quiet_for < NOTIFICATION_DEBOUNCE_SECONDS and waited < NOTIFICATION_MAX_DELAY_SECONDS:
+        countdown = min(NOTIFICATION_DEBOUNCE_SECONDS - quiet_for, NOTIFICATION_MAX_DELAY_SECONDS - waited)
+        flush_course_update_notification.apply_async(args=(course_id,), countdown=countdown)
+        return f"Postponed update of course {course_id} for {countdown:.0f}s"
+
+    # Изменения снимаются вместе с first/last под блокировкой, флаг снимается только после них:
+    # правка, пришедшая позже, попадёт в новый набор и запланирует новую рассылку
+    with _notification_lock(course_id):
+        changes = cache.get(changes_key)
+        cache.delete_many([changes_key, first_key, last_key])
+        cache.delete(scheduled_key)
+    if changes is None:
+        return
+
+    send_course_update_notification.delay(course_id, changes)
+    logger.info(f"Coalesced update of course {course_id}: {', '.join(changes)}")
+    return f"Flushed changes: {', '.join(changes)}"
+
+
+@shared_task(bind=True, max_retries=3)
+def send_course_update_notification(self, course_id, changes=None):
+    """Делит подписчиков курса на пачки и рассылает их параллельно группой задач"""
+    try:
+        user_ids = list(
+            Subscription.objects.filter(course_id=course_id)
+            .order_by('user_id')
+            .values_list('user_id', flat=True)
+        )
+        if not user_ids:
             logger.info(f"No subscribers for course {course_id}")
             return
 
-        for subscription in course_subscriptions:
-            try:
-                subject = f"Обновление курса: {subscription.course.title}"
-                message = render_to_string('emails/course_update.html', {
-                    'course': subscription.course,
-                    'user': subscription.user
-                })
-
-                send_mail(
-                    subject=subject,
-                    message='',  # Текстовая версия (пустая, так как используем html_message)
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[subscription.user.email],
-                    html_message=message,
-                    fail_silently=False
-                )
-                logger.info(f"Sent update to {subscription.user.email}")
-
-            except Exception as e:
-                logger.error(f"Error sending to {subscription.user.email}: {e}")
-                continue
-
-        return f"Sent updates to {course_subscriptions.count()} subscribers"
+        chunks = [
+            user_ids[start:start + NOTIFICATION_CHUNK_SIZE]
+            for start in range(0, len(user_ids), NOTIFICATION_CHUNK_SIZE)
+        ]
+        group(send_course_update_chunk.s(course_id, chunk, changes) for chunk in chunks).apply_async()
+
+        logger.info(f"Queued update of course {course_id} for {len(user_ids)} subscribers in {len(chunks)} chunks")
+        return f"Queued updates to {len(user_ids)} subscribers"
 
     except Exception as e:
         logger.error(f"Error processing course update: {e}")
         self.retry(countdown=60, exc=e)
 
 
+def _change_label(change):
+    if change in CHANGE_LABELS:
+        return CHANGE_LABELS[change]
+    try:
+        return str(Course._meta.get_field(change).verbose_name)
+    except FieldDoesNotExist:
+        return change
+
+
+@shared_task(bind=True, max_retries=3)
+def send_course_update_chunk(self, course_id, user_ids, changes=None):
+    """Отправляет одну пачку писем через одно SMTP-соединение.
+
+    При ошибке повторяется только эта пачка, уже разосланные пачки не трогаются.
+    """
+    try:
+        course = Course.objects.only('id', 'title').get(pk=course_id)
+    except Course.DoesNotExist:
+        logger.info(f"Course {course_id} was deleted, skipping {len(user_ids)} notifications")
+        return
+
+    emails = list(
+        get_user_model().objects.filter(pk__in=user_ids, is_active=True).values_list('email', flat=True)
+    )
+    subject = f"Обновление курса: {course.title}"
+    html_message = render_to_string('emails/course_update.html', {
+        'course': course,
+        'changes': [_change_label(change) for change in changes or []],
+    })
+
+    messages = []
+    for email in emails:
+        message = EmailMultiAlternatives(
+            subject=subject,
+            body='',  # Текстовая версия (пустая, так как используем html)
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[email],
+        )
+        message.attach_alternative(html_message, 'text/html')
+        messages.append(message)
+
+    try:
+        with timed_external_call('smtp', 'send_messages'):
+            sent = get_connection(fail_silently=False).send_messages(messages)
+    except Exception as e:
+        logger.error(f"Error sending chunk of course {course_id} ({len(messages)} emails): {e}")
+        raise self.retry(countdown=60, exc=e)
+
+    logger.info(f"Sent update of course {course_id} to {sent} subscribers")
+    return sent
+
+
+def schedule_image_variants(instance, field_name, update_fields=None):
+    """Для post_save: после коммита ставит построение копий, если карта копий не соответствует файлу поля"""
+    field = thumbnails.variants_field(field_name)
+    if {field_name, field} & instance.get_deferred_fields():
+        return
+    if update_fields is not None and field_name not in update_fields:
+        return  # например, last_login при входе
+    stale = instance.__dict__.pop(f'_stale_{field}', None)
+    if not thumbnails.is_stale(instance, field_name) and stale is None:
+        return
+    label, pk = instance._meta.label, instance.pk
+    transaction.on_commit(lambda: generate_image_variants.delay(label, pk, field_name, stale))
+
+
+@shared_task(bind=True, max_retries=3)
+def generate_image_variants(self, model_label, pk, field_name, stale=None):
+    """Строит копии изображения объекта (lms.thumbnails) и сохраняет их карту в ``<поле>_variants``.
+
+    ``stale`` - карта копий заменённого файла, они удаляются. Повторный вызов для того же файла ничего не делает.
+    """
+    model = apps.get_model(model_label)
+    field = thumbnails.variants_field(field_name)
+    instance = model._default_manager.filter(pk=pk).first()
+    if instance is None:
+        return
+    image = getattr(instance, field_name)
+    previous = getattr(instance, field) or {}
+    for variants in (stale, previous if thumbnails.is_stale(instance, field_name) else None):
+        if variants:
+            thumbnails.delete(image.storage, variants)
+    if not thumbnails.is_stale(instance, field_name):
+        return
+
+    variants = {}
+    if image.name:
+        try:
+            widths = thumbnails.generate(image)
+        except (FileNotFoundError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+            # Повтор не поможет: карта без копий, чтобы задача не ставилась при каждом сохранении
+            logger.warning(f"Cannot build variants of {model_label} {pk} {field_name} ({image.name}): {e}")
+            widths = []
+        except Exception as e:
+            logger.error(f"Error building variants of {model_label} {pk} {field_name}: {e}")
+            raise self.retry(countdown=60, exc=e)
+        variants = {'source': image.name, 'widths': widths}
+
+    # Пока строились копии, файл могли заменить - копии старого файла не нужны, новый обработает своя задача
+    current = list(model._default_manager.filter(pk=pk).values_list(field_name, flat=True))
+    if not current or (current[0] or '') != (image.name or ''):
+        thumbnails.delete(image.storage, variants)
+        return
+    setattr(instance, field, variants)
+    # Через save, а не update(): сигналы сбрасывают кэш ответов, updated_at меняет ETag
+    update_fields = [field] + [f.name for f in model._meta.concrete_fields if getattr(f, 'auto_now', False)]
+    instance.save(update_fields=update_fields)
+    logger.info(f"Built {len(variants.get('widths', []))} widths of {model_label} {pk} {field_name}")
+    return variants
@@ -0,0 +1,77 @@
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from config.lms.models import Course, Lesson, Subscription
+from config.users.models import CustomUser
+
+
+class CourseCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email='cache@example.com', password='cachepass')
+        self.other_user = CustomUser.objects.create_user(email='other-cache@example.com', password='cachepass')
+        self.course = Course.objects.create(title='Кэшируемый курс', owner=self.user)
+        self.lesson = Lesson.objects.create(
+            title='Урок',
+            course=self.course,
+            owner=self.user,
+            video_link='https://youtube.com/embed/cache'
+        )
+        Subscription.objects.create(user=self.user, course=self.course)
+        self.course_url = reverse('course-detail', kwargs={'pk': self.course.pk})
+        self.lesson_url = reverse('lesson-detail', kwargs={'pk': self.lesson.pk})
+
+    def get_as(self, user, url):
+        self.client.force_authenticate(user=user)
+        return self.client.get(url)
+
+    def test_cached_course_detail_keeps_is_subscribed_per_user(self):
+        self.assertTrue(self.get_as(self.user, self.course_url).data['is_subscribed'])
+        with self.assertNumQueries(2):  # updated_at для ETag и проверка подписки
+            response = self.get_as(self.other_user, self.course_url)
+        self.assertFalse(response.data['is_subscribed'])
+        self.assertTrue(self.get_as(self.user, self.course_url).data['is_subscribed'])
+
+    def test_cached_course_list_keeps_is_subscribed_per_user(self):
+        url = reverse('course-list')
+        self.get_as(self.user, url)
+        with self.assertNumQueries(2):  # агрегат для ETag и проверка подписки
+            response = self.get_as(self.other_user, url)
+        self.assertFalse(response.data['results'][0]['is_subscribed'])
+        self.assertTrue(self.get_as(self.user, url).data['results'][0]['is_subscribed'])
+
+    def test_lesson_change_invalidates_course(self):
+        self.assertEqual(self.get_as(self.user, self.course_url).data['lessons_count'], 1)
+        Lesson.objects.create(
+            title='Новый урок',
+            course=self.course,
+            owner=self.user,
+            video_link='https://youtube.com/embed/new'
+        )
+        response = self.get_as(self.user, self.course_url)
+        self.assertEqual(response.data['lessons_count'], 2)
+
+    def test_lesson_move_invalidates_both_courses(self):
+        other_course = Course.objects.create(title='Другой курс', owner=self.user)
+        other_url = reverse('course-detail', kwargs={'pk': other_course.pk}) + '?expand=lessons'
+        course_url = self.course_url + '?expand=lessons'
+        self.assertEqual(len(self.get_as(self.user, course_url).data['lessons']), 1)
+        self.assertEqual(self.get_as(self.user, other_url).data['lessons'], [])
+
+        lesson = Lesson.objects.get(pk=self.lesson.pk)
+        lesson.course = other_course
+        lesson.save()
+
+        response = self.get_as(self.user, course_url)
+        self.assertEqual((response.data['lessons'], response.data['lessons_count']), ([], 0))
+        response = self.get_as(self.user, other_url)
+        self.assertEqual([lesson['id'] for lesson in response.data['lessons']], [self.lesson.pk])
+        self.assertEqual(response.data['lessons_count'], 1)
+
+    def test_lesson_update_invalidates_lesson_detail(self):
+        self.get_as(self.user, self.lesson_url)
+        response = self.client.patch(self.lesson_url, {'title': 'Новое название'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(self.lesson_url).data['title'], 'Новое название')
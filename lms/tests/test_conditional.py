@@ -0,0 +1,77 @@
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from config.lms.models import Course, Lesson, Subscription
+from config.users.models import CustomUser
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email='etag@example.com', password='etagpass')
+        self.course = Course.objects.create(title='Курс', owner=self.user)
+        self.lesson = Lesson.objects.create(
+            title='Урок',
+            course=self.course,
+            owner=self.user,
+            video_link='https://youtube.com/embed/etag'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.course_url = reverse('course-detail', kwargs={'pk': self.course.pk})
+        self.courses_url = reverse('course-list')
+        self.lesson_url = reverse('lesson-detail', kwargs={'pk': self.lesson.pk})
+        self.lessons_url = reverse('lesson-list')
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_not_modified_without_serialization(self):
+        for url in (self.course_url, self.courses_url, self.lesson_url, self.lessons_url):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn('Last-Modified', response)
+            with self.assertNumQueries(1):  # только агрегат для валидаторов
+                not_modified = self.revalidate(url, response)
+            self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(not_modified['ETag'], response['ETag'])
+
+    def test_if_modified_since(self):
+        response = self.client.get(self.course_url)
+        not_modified = self.client.get(self.course_url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_variants_have_different_etags(self):
+        response = self.client.get(self.courses_url)
+        self.assertEqual(self.revalidate(self.courses_url + '?expand=lessons', response).status_code, 200)
+        self.assertEqual(self.revalidate(self.courses_url + '?fields=id', response).status_code, 200)
+
+    def test_lesson_change_updates_course_validators(self):
+        detail = self.client.get(self.course_url)
+        listing = self.client.get(self.courses_url)
+        self.client.patch(self.lesson_url, {'title': 'Новое название'})
+        self.assertEqual(self.revalidate(self.course_url, detail).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.revalidate(self.courses_url, listing).status_code, status.HTTP_200_OK)
+
+    def test_deletion_updates_list_validators(self):
+        other = Lesson.objects.create(
+            title='Второй урок',
+            course=self.course,
+            owner=self.user,
+            video_link='https://youtube.com/embed/other'
+        )
+        response = self.client.get(self.lessons_url)
+        other.delete()
+        self.assertEqual(self.revalidate(self.lessons_url, response).status_code, status.HTTP_200_OK)
+
+    def test_subscription_updates_course_validators(self):
+        response = self.client.get(self.courses_url)
+        Subscription.objects.create(user=self.user, course=self.course)
+        response = self.revalidate(self.courses_url, response)
+        self.assertTrue(response.data['results'][0]['is_subscribed'])
+
+    def test_missing_object(self):
+        response = self.client.get(reverse('course-detail', kwargs={'pk': 0}), HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn('ETag', response)
@@ -0,0 +1,65 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from config.lms.models import Course, Lesson, Subscription
+from config.users.models import CustomUser
+
+
+class CourseCounterTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='counter@example.com', password='counterpass')
+        self.course = Course.objects.create(title='Курс', owner=self.user)
+        self.other_course = Course.objects.create(title='Другой курс', owner=self.user)
+
+    def lesson(self, course, title='Урок'):
+        return Lesson(title=title, course=course, owner=self.user, video_link='https://youtube.com/embed/counter')
+
+    def counts(self, course):
+        course.refresh_from_db()
+        return course.lessons_count, course.subscribers_count
+
+    def test_single_create_move_and_delete(self):
+        lesson = self.lesson(self.course)
+        lesson.save()
+        Subscription.objects.create(user=self.user, course=self.course)
+        self.assertEqual(self.counts(self.course), (1, 1))
+
+        lesson = Lesson.objects.get(pk=lesson.pk)
+        lesson.course = self.other_course
+        lesson.save()
+        self.assertEqual(self.counts(self.course), (0, 1))
+        self.assertEqual(self.counts(self.other_course), (1, 0))
+
+        lesson.delete()
+        self.user.delete()  # подписка удаляется каскадом
+        self.assertEqual(self.counts(self.other_course), (0, 0))
+        self.assertEqual(self.counts(self.course), (0, 0))
+
+    def test_bulk_create_and_delete(self):
+        with self.assertNumQueries(2):  # INSERT + один UPDATE счётчиков
+            Lesson.objects.bulk_create([self.lesson(course) for course in (self.course, self.other_course) * 2])
+        self.assertEqual(self.counts(self.course), (2, 0))
+        self.assertEqual(self.counts(self.other_course), (2, 0))
+
+        Lesson.objects.filter(title='Урок').delete()
+        self.assertEqual(self.counts(self.course), (0, 0))
+        self.assertEqual(self.counts(self.other_course), (0, 0))
+
+    def test_bulk_create_ignore_conflicts_recounts(self):
+        Subscription.objects.create(user=self.user, course=self.course)
+        Subscription.objects.bulk_create(
+            [Subscription(user=self.user, course=self.course), Subscription(user=self.user, course=self.other_course)],
+            ignore_conflicts=True,
+        )
+        self.assertEqual(self.counts(self.course), (0, 1))
+        self.assertEqual(self.counts(self.other_course), (0, 1))
+
+    def test_reconcile_fixes_drift(self):
+        self.lesson(self.course).save()
+        Course.objects.filter(pk=self.course.pk).update(lessons_count=7, subscribers_count=2)
+        out = StringIO()
+        call_command('reconcile_course_counters', '--batch-size', '1', stdout=out)
+        self.assertIn('Fixed lessons_count: 1 courses', out.getvalue())
+        self.assertEqual(self.counts(self.course), (1, 0))
@@ -0,0 +1,99 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import serializers
+from rest_framework.test import APITestCase
+
+from config.lms.fastpath import FastSerializer, Unsupported
+from config.lms.models import Course, Lesson, Subscription
+from config.lms.views import CourseViewSet, LessonListCreateAPIView
+from config.users.models import CustomUser
+
+
+# Имена, для которых storage.url не сводится к склейке с MEDIA_URL, идут обычным путём
+LESSON_PREVIEWS = ['lessons/previews/урок 1.png', 'lessons//previews/b.png', 'lessons/../c.png']
+
+
+class FastListTests(APITestCase):
+    """Быстрый путь отдаёт те же байты, что и обычная сериализация DRF"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='fast@example.com', password='fastpass')
+        for i in range(4):
+            course = Course.objects.create(
+                title=f'Курс «{i}»',
+                description=None if i % 2 else 'Описание\u2028с разделителем строк',
+                preview='courses/previews/cover.png' if i % 2 else '',
+                preview_variants={'source': 'courses/previews/cover.png', 'widths': [320, 640]} if i % 2 else {},
+                owner=self.user,
+            )
+            for j in range(i):
+                Lesson.objects.create(
+                    title=f'Урок {j} "в кавычках"',
+                    course=course,
+                    preview=LESSON_PREVIEWS[j],
+                    video_link=f'https://youtube.com/embed/{i}{j}',
+                    owner=self.user,
+                )
+            if i % 2:
+                Subscription.objects.create(user=self.user, course=course)
+        self.client.force_authenticate(user=self.user)
+
+    def get(self, view, url, fast, **extra):
+        cache.clear()
+        with mock.patch.object(view, 'fast_list', fast):
+            response = self.client.get(url, **extra)
+        self.assertEqual(response.status_code, 200)
+        return response.content
+
+    def assertSameOutput(self, view, url, **extra):
+        self.assertEqual(self.get(view, url, True, **extra), self.get(view, url, False, **extra))
+
+    def test_course_list(self):
+        self.assertSameOutput(CourseViewSet, reverse('course-list'))
+        self.assertSameOutput(CourseViewSet, reverse('course-list') + '?page=2&page_size=3')
+        self.assertSameOutput(CourseViewSet, reverse('course-list') + '?expand=lessons')
+
+    def test_course_list_sparse_fields(self):
+        self.assertSameOutput(CourseViewSet, reverse('course-list') + '?fields=title,lessons_count')
+        self.assertSameOutput(CourseViewSet, reverse('course-list') + '?fields=title&pagination=cursor&page_size=2')
+        self.assertSameOutput(CourseViewSet, reverse('course-list') + '?fields=id,lessons')
+
+    def test_course_list_cursor(self):
+        first_page = self.get(CourseViewSet, reverse('course-list') + '?pagination=cursor&page_size=2', True)
+        self.assertSameOutput(CourseViewSet, reverse('course-list') + '?pagination=cursor&page_size=2')
+
+        next_url = self.client.get(reverse('course-list') + '?pagination=cursor&page_size=2').data['next']
+        self.assertIn(b'"next":"http', first_page)
+        self.assertSameOutput(CourseViewSet, next_url)
+
+    def test_lesson_list(self):
+        self.assertSameOutput(LessonListCreateAPIView, reverse('lesson-list'))
+        self.assertSameOutput(LessonListCreateAPIView, reverse('lesson-list') + '?pagination=cursor')
+
+    def test_indented_output(self):
+        self.assertSameOutput(CourseViewSet, reverse('course-list'), HTTP_ACCEPT='application/json; indent=2')
+
+    def test_course_list_queries(self):
+        cache.clear()
+        with self.assertNumQueries(3):  # валидаторы ETag, count, страница курсов
+            self.client.get(reverse('course-list'))
+        with self.assertNumQueries(4):  # валидаторы ETag, count, страница курсов, уроки страницы
+            self.client.get(reverse('course-list') + '?expand=lessons')
+
+
+class FastSerializerTests(APITestCase):
+    def test_method_field_without_annotation_unsupported(self):
+        class TitleSerializer(serializers.ModelSerializer):
+            upper_title = serializers.SerializerMethodField()
+
+            class Meta:
+                model = Course
+                fields = ['id', 'upper_title']
+
+            def get_upper_title(self, obj):
+                return obj.title.upper()
+
+        with self.assertRaises(Unsupported):
+            FastSerializer(TitleSerializer, request=None)
@@ -0,0 +1,116 @@
+import asyncio
+import os
+import tempfile
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, values
+from rest_framework.test import APITestCase
+
+from config.lms.metrics import MetricsMiddleware, ServicesCollector, _task_postrun, _task_prerun
+from config.lms.models import Course, Subscription
+from config.lms.services.stripe_client import LatencyMetrics
+from config.lms.tasks import send_course_update_chunk
+from config.users.models import CustomUser
+from config.users.tasks import deactivate_inactive_users
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class MetricsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email='metrics@example.com', password='metricspass')
+        self.course = Course.objects.create(title='Курс', owner=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def test_request_latency_by_route_and_action(self):
+        labels = {'method': 'POST', 'route': '/api/subscribe/', 'action': 'subscribe', 'status': '201'}
+        before = sample('lms_http_request_duration_seconds_count', **labels)
+
+        self.client.post(reverse('subscribe'), {'course_id': self.course.id})
+
+        self.assertEqual(sample('lms_http_request_duration_seconds_count', **labels), before + 1)
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('course-list'))
+
+        response = self.client.get(reverse('metrics'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            b'lms_http_request_duration_seconds_count{action="list",method="GET",route="/api/courses/",status="200"}',
+            response.content,
+        )
+
+    def test_task_runtime_and_queue_lag(self):
+        task_name = deactivate_inactive_users.name
+        runs = sample('lms_celery_task_duration_seconds_count', task=task_name, state='SUCCESS')
+        deactivate_inactive_users.apply()
+        self.assertEqual(sample('lms_celery_task_duration_seconds_count', task=task_name, state='SUCCESS'), runs + 1)
+
+        lag = sample('lms_celery_task_queue_lag_seconds_sum', task=task_name)
+        deactivate_inactive_users.push_request(published_at=time.time() - 5, eta=None)
+        try:
+            _task_prerun(task_id='lagged', task=deactivate_inactive_users)
+            _task_postrun(task_id='lagged', task=deactivate_inactive_users, state='SUCCESS')
+        finally:
+            deactivate_inactive_users.pop_request()
+        self.assertGreaterEqual(sample('lms_celery_task_queue_lag_seconds_sum', task=task_name) - lag, 5)
+
+    def test_external_calls(self):
+        Subscription.objects.create(user=self.user, course=self.course)
+        smtp = sample('lms_external_call_duration_seconds_count', service='smtp', operation='send_messages', outcome='ok')
+        send_course_update_chunk.apply(args=(self.course.id, [self.user.id], ['title']))
+        self.assertEqual(
+            sample('lms_external_call_duration_seconds_count', service='smtp', operation='send_messages', outcome='ok'),
+            smtp + 1,
+        )
+
+        errors = sample('lms_external_call_duration_seconds_count', service='stripe', operation='price.create',
+                        outcome='error')
+        LatencyMetrics().record('price.create', 0.2, ok=False)
+        self.assertEqual(
+            sample('lms_external_call_duration_seconds_count', service='stripe', operation='price.create',
+                   outcome='error'),
+            errors + 1,
+        )
+
+    def test_async_middleware(self):
+        async def get_response(request):
+            return HttpResponse(status=204)
+
+        middleware = MetricsMiddleware(get_response)
+        labels = {'method': 'GET', 'route': '<unmatched>', 'action': '', 'status': '204'}
+        before = sample('lms_http_request_duration_seconds_count', **labels)
+
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = asyncio.run(middleware(RequestFactory().get('/nowhere/')))
+
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(sample('lms_http_request_duration_seconds_count', **labels), before + 1)
+
+    def test_services_collector_sums_subdirectories(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        value_class = values.ValueClass
+        self.addCleanup(setattr, values, 'ValueClass', value_class)
+        for service, pid in (('web', 1), ('celery', 2)):
+            os.mkdir(os.path.join(root.name, service))
+            os.environ['PROMETHEUS_MULTIPROC_DIR'] = os.path.join(root.name, service)
+            try:
+                values.ValueClass = values.MultiProcessValue(lambda: pid)
+                Counter('lms_test_total', 'Тест', registry=None).inc()
+            finally:
+                del os.environ['PROMETHEUS_MULTIPROC_DIR']
+
+        registry = CollectorRegistry()
+        ServicesCollector(registry, root.name)
+
+        self.assertEqual(registry.get_sample_value('lms_test_total'), 2)
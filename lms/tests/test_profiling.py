@@ -0,0 +1,99 @@
+from asgiref.sync import iscoroutinefunction
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from config.lms.models import Course, Lesson
+from config.lms.profiling import ProfilingMiddleware, RequestProfile, fingerprint, record, top_routes
+from config.users.models import CustomUser, Payment
+
+
+@override_settings(PROFILING_ENABLED=True)
+class ProfilingMiddlewareTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = CustomUser.objects.create_user(email='admin@example.com', password='adminpass', is_staff=True)
+        self.user = CustomUser.objects.create_user(email='user@example.com', password='userpass')
+        self.client.force_authenticate(user=self.user)
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('course-list'))
+
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'sql;dur=[\d.]+;desc="\d+ queries, 0 duplicates"')
+        self.assertRegex(timing, r'serializer;dur=[\d.]+')
+        self.assertRegex(timing, r'total;dur=[\d.]+')
+
+    def test_report_lists_routes(self):
+        for _ in range(3):
+            self.client.get(reverse('course-list'))
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse('profiling-report'), {'limit': 5})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        routes = {item['route']: item for item in response.data['slowest']}
+        self.assertEqual(routes['GET /api/courses/']['requests'], 3)
+
+    def test_report_admin_only(self):
+        response = self.client.get(reverse('profiling-report'))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    async def test_async_view_profiled_in_async_mode(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(ProfilingMiddleware(get_response)))
+        payment = await Payment.objects.acreate(user=self.user, amount=100, payment_method='card')
+
+        response = await self.async_client.get(
+            reverse('payment-status-async', kwargs={'pk': payment.pk}),
+            headers={'Authorization': f'Bearer {AccessToken.for_user(self.user)}'},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertRegex(response['Server-Timing'], r'sql;dur=[\d.]+;desc="2 queries, 0 duplicates"')
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled_middleware_not_used(self):
+        response = self.client.get(reverse('course-list'))
+
+        self.assertNotIn('Server-Timing', response)
+
+
+@override_settings(PROFILING_WINDOW_SECONDS=600, PROFILING_BUCKET_SECONDS=60)
+class RequestProfileTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_duplicates_counted_by_fingerprint(self):
+        owner = CustomUser.objects.create(email='owner@example.com')
+        courses = [Course.objects.create(title=f'Курс {i}', owner=owner) for i in range(3)]
+        profile = RequestProfile()
+
+        with profile.capture():
+            for course in Course.objects.filter(pk__in=[course.pk for course in courses]):
+                list(Lesson.objects.filter(course=course))
+
+        self.assertEqual(profile.sql_count, 4)
+        self.assertEqual(profile.duplicates, 2)
+
+    def test_fingerprint_collapses_in_lists(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s)'),
+            fingerprint('SELECT  *  FROM t WHERE id IN (%s)'),
+        )
+
+    def test_old_buckets_leave_window(self):
+        profile = RequestProfile()
+        profile.finish()
+        record('GET /old/', profile, now=1000)
+        record('GET /new/', profile, now=1600)
+
+        routes = [item['route'] for item in top_routes(now=1610)['slowest']]
+        self.assertEqual(routes, ['GET /new/'])
@@ -0,0 +1,46 @@
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from config.lms.models import Course, Lesson, Subscription
+from config.lms.paginators import KeysetPagination
+from config.lms.query_audit import audit, sequential_scans
+from config.lms.views import LessonListCreateAPIView
+from config.users.models import CustomUser
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Разбор плана проверяется на SQLite')
+class QueryAuditTests(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(email='audit@example.com', password='auditpass')
+        course = Course.objects.create(title='Курс', owner=user)
+        Lesson.objects.create(title='Урок', course=course, owner=user, video_link='https://youtube.com/embed/audit')
+        Subscription.objects.create(user=user, course=course)
+
+    def test_unindexed_filter_is_flagged(self):
+        self.assertEqual(sequential_scans(Course.objects.filter(title='Курс')), [('lms_course', 1)])
+        self.assertEqual(sequential_scans(Course.objects.order_by('created_at', 'id')[:5]), [])
+
+    def test_canonical_queries_use_indexes(self):
+        out = StringIO()
+        call_command('audit_query_plans', '--min-rows', '0', '--fail', stdout=out)
+        self.assertIn('course-subscribers', out.getvalue())
+        self.assertNotIn('sequential scan', out.getvalue())
+
+    def test_view_regression_is_flagged(self):
+        # Аудит берёт запрос у самого представления: сортировка без индекса сразу видна
+        with mock.patch.object(LessonListCreateAPIView, 'get_queryset', lambda view: Lesson.objects.order_by('title')):
+            report = dict(audit(min_rows=0))
+
+        self.assertEqual(report['lesson-list'], [('lms_lesson', 1)])
+        self.assertEqual(report['course-list'], [])
+
+    def test_keyset_cursor_starts_index_range(self):
+        # Глубокая страница начинается с позиции курсора в индексе, а не с начала индекса
+        ordering = ('created_at', 'id')
+        queryset = Course.objects.filter(KeysetPagination.after([timezone.now(), 0], ordering)).order_by(*ordering)
+        self.assertIn('SEARCH lms_course USING INDEX course_created_id_idx (created_at>?)', queryset[:6].explain())
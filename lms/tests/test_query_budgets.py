@@ -0,0 +1,29 @@
+import tempfile
+
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from benchmarks.api import ENDPOINTS, run_all
+from benchmarks.factories import seed
+
+
+class QueryBudgetTests(APITestCase):
+    """Каждый маршрут API укладывается в свой бюджет SQL-запросов"""
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.dataset = seed(scale=0.002)
+
+    def test_every_endpoint_within_query_budget(self):
+        results = run_all(self.dataset, iterations=2)
+        self.assertEqual(set(results), {endpoint.name for endpoint in ENDPOINTS})
+        for name, result in results.items():
+            with self.subTest(endpoint=name):
+                self.assertTrue(result['status_ok'], result['status'])
+                self.assertLessEqual(result['queries'], result['max_queries'])
@@ -0,0 +1,112 @@
+from io import StringIO
+
+from django.contrib.admin.sites import site
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from config.lms.models import Course, Lesson
+from config.lms.search import fts_table, matching, search
+from config.users.models import CustomUser
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        self.python = Course.objects.create(title='Программирование на Python', description='Основы языка и <script>')
+        self.django = Course.objects.create(title='Веб-разработка', description='Django и программирование сайтов')
+        Course.objects.create(title='Рисование', description='Акварель')
+
+    def titles(self, results):
+        return [obj.title for obj in results]
+
+    def test_prefix_match_ranked_by_title(self):
+        results = search(Course.objects.all(), 'програм', limit=10)
+
+        self.assertEqual(self.titles(results), ['Программирование на Python', 'Веб-разработка'])
+        self.assertGreater(results[0].rank, results[1].rank)
+        self.assertEqual(results[0].title_highlight, '<mark>Программирование</mark> на Python')
+        self.assertIn('<mark>программирование</mark>', results[1].snippet)
+
+    def test_all_words_required_and_highlight_escaped(self):
+        results = search(Course.objects.all(), 'python осн', limit=10)
+
+        self.assertEqual(self.titles(results), ['Программирование на Python'])
+        self.assertEqual(results[0].snippet, '<mark>Основы</mark> языка и &lt;script&gt;')
+
+    def test_index_follows_saves_and_deletes(self):
+        self.python.title = 'Машинное обучение'
+        self.python.save()
+        self.django.delete()
+        Course.objects.bulk_create([Course(title='Машинное зрение')])
+
+        self.assertEqual(self.titles(search(Course.objects.all(), 'програм', limit=10)), [])
+        self.assertEqual(
+            sorted(matching(Course.objects.all(), 'машин').values_list('title', flat=True)),
+            ['Машинное зрение', 'Машинное обучение'],
+        )
+
+    def test_search_within_queryset(self):
+        results = search(Course.objects.exclude(pk=self.python.pk), 'програм', limit=10)
+
+        self.assertEqual(self.titles(results), ['Веб-разработка'])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(search(Course.objects.all(), '" OR * :', limit=10), [])
+        self.assertEqual(self.titles(search(Course.objects.all(), 'python:* & (осн', limit=10)),
+                         ['Программирование на Python'])
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('UPDATE lms_course SET search_vector = NULL')
+            else:
+                cursor.execute(f'DELETE FROM {fts_table(Course)}')
+        self.assertFalse(matching(Course.objects.all(), 'акварель').exists())
+
+        call_command('rebuild_search_index', stdout=StringIO())
+
+        self.assertTrue(matching(Course.objects.all(), 'акварель').exists())
+
+    def test_admin_search_uses_index(self):
+        request = RequestFactory().get('/')
+        queryset, may_have_duplicates = site._registry[Course].get_search_results(
+            request, Course.objects.all(), 'django'
+        )
+
+        self.assertFalse(may_have_duplicates)
+        self.assertEqual(list(queryset), [self.django])
+
+
+class SearchAPITests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='search@example.com', password='searchpass')
+        self.course = Course.objects.create(title='Алгоритмы', description='Сортировка и поиск')
+        self.lesson = Lesson.objects.create(
+            course=self.course, title='Быстрая сортировка', description='Разбиение массива',
+            video_link='https://youtube.com/embed/sort', owner=self.user
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_courses_and_lessons(self):
+        # На тип один запрос в Postgres, в SQLite два: поиск по FTS5 и загрузка найденных строк
+        with self.assertNumQueries(2 if connection.vendor == 'postgresql' else 4):
+            response = self.client.get(reverse('search'), {'q': 'сорт'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in response.data['courses']], [self.course.pk])
+        self.assertEqual(response.data['lessons'][0]['course'], self.course.pk)
+        self.assertEqual(response.data['lessons'][0]['title_highlight'], 'Быстрая <mark>сортировка</mark>')
+
+    def test_type_and_limit(self):
+        response = self.client.get(reverse('search'), {'q': 'сорт', 'type': 'lesson', 'limit': 1})
+
+        self.assertEqual(list(response.data), ['lessons'])
+        self.assertEqual(len(response.data['lessons']), 1)
+
+    def test_query_without_words_rejected(self):
+        response = self.client.get(reverse('search'), {'q': '!!'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,171 @@
+import asyncio
+import time
+
+import stripe
+from django.test import SimpleTestCase
+
+from benchmarks.stripe_server import LocalStripeServer
+from config.lms.services.stripe_client import CircuitBreaker, StripeClient, StripeUnavailable
+
+
+class StripeClientTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stripe = cls.enterClassContext(LocalStripeServer())
+
+    def setUp(self):
+        self.stripe.reset()
+        self.stripe.latency = 0
+
+    def make_client(self, **kwargs):
+        kwargs.setdefault('backoff', 0)
+        return StripeClient('sk_test_local', api_base=self.stripe.url, **kwargs)
+
+    def test_connection_reused_between_calls(self):
+        client = self.make_client()
+        for _ in range(5):
+            client.create_product(name='Курс')
+
+        self.assertEqual(self.stripe.calls['Product.create'], 5)
+        self.assertEqual(self.stripe.connections, 1)
+
+    def test_retry_reuses_idempotency_key(self):
+        client = self.make_client(max_retries=2)
+        self.stripe.fail_next(2)
+
+        product = client.create_product(name='Курс')
+
+        self.assertEqual(self.stripe.calls['Product.create'], 3)
+        self.assertEqual(list(self.stripe.objects), [product.id])
+        self.assertEqual(len(self.stripe.idempotent), 1)
+        self.assertEqual(client.metrics.snapshot()['product.create']['errors'], 2)
+
+    def test_client_errors_not_retried(self):
+        client = self.make_client(max_retries=2)
+        self.stripe.fail_next(1, status=400)
+
+        with self.assertRaises(stripe.InvalidRequestError):
+            client.create_product(name='Курс')
+        self.assertEqual(self.stripe.calls['Product.create'], 1)
+
+    def test_call_bounded_by_timeout(self):
+        client = self.make_client(max_retries=0)
+        self.stripe.latency = 0.5
+
+        started = time.perf_counter()
+        with self.assertRaises(stripe.APIConnectionError):
+            client.retrieve_checkout_session('cs_missing', timeout=(1, 0.1))
+        self.assertLess(time.perf_counter() - started, 0.4)
+
+    def test_breaker_opens_after_failures(self):
+        client = self.make_client(max_retries=0, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+        self.stripe.fail_next(2, status=503)
+        for _ in range(2):
+            with self.assertRaises(stripe.APIError):
+                client.create_product(name='Курс')
+
+        with self.assertRaises(StripeUnavailable):
+            client.create_product(name='Курс')
+        self.assertEqual(self.stripe.calls['Product.create'], 2)
+
+    async def test_async_calls_run_concurrently(self):
+        client = self.make_client()
+        self.stripe.latency = 0.2
+
+        started = time.perf_counter()
+        sessions = await asyncio.gather(*(
+            client.create_checkout_session_async(mode='payment', success_url='https://a', cancel_url='https://b')
+            for _ in range(10)
+        ))
+
+        self.assertLess(time.perf_counter() - started, 1)  # последовательно было бы 2 с
+        self.assertEqual(len({session.id for session in sessions}), 10)
+        self.assertEqual(client.metrics.snapshot()['checkout_session.create']['count'], 10)
+        await client.aclose()
+
+
+class StripeSDKInternalsTests(SimpleTestCase):
+    """Асинхронный клиент опирается на атрибуты AIOHTTPClient: обновление stripe без них ломает эти тесты"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stripe = cls.enterClassContext(LocalStripeServer())
+
+    def setUp(self):
+        self.stripe.reset()
+        self.stripe.latency = 0
+
+    async def test_async_call_bounded_by_timeout(self):
+        client = StripeClient('sk_test_local', api_base=self.stripe.url, max_retries=0)
+        self.stripe.latency = 0.5
+
+        started = time.perf_counter()
+        with self.assertRaises(stripe.APIConnectionError):
+            await client.retrieve_checkout_session_async('cs_missing', timeout=(1, 0.1))
+        self.assertLess(time.perf_counter() - started, 0.4)
+        await client.aclose()
+
+    async def test_async_pool_size_applied(self):
+        client = StripeClient('sk_test_local', api_base=self.stripe.url, async_pool_size=7)
+
+        await client.create_product_async(name='Курс')
+
+        _, http_client = client._async_clients[asyncio.get_running_loop()]
+        self.assertEqual(http_client._cached_session.connector.limit, 7)
+        await client.aclose()
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_half_open_allows_single_trial(self):
+        now = [0]
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+        now[0] = 10
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow())
+
+    async def test_cancelled_trial_releases_breaker(self):
+        now = [0]
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+        client = StripeClient('sk_test_local', breaker=breaker)
+        breaker.record_failure()
+        now[0] = 10
+        started = asyncio.Event()
+
+        async def hang(options):
+            started.set()
+            await asyncio.sleep(60)
+
+        trial = asyncio.create_task(client._call_async('product.create', hang, None, None))
+        await started.wait()
+        self.assertFalse(breaker.allow())
+        trial.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await trial
+
+        self.assertFalse(breaker.trial_in_flight)
+        now[0] = 20
+        self.assertTrue(breaker.allow())
+
+    def test_unexpected_error_releases_trial(self):
+        now = [0]
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+        client = StripeClient('sk_test_local', breaker=breaker)
+        breaker.record_failure()
+        now[0] = 10
+
+        def broken(options):
+            raise ConnectionResetError
+
+        with self.assertRaises(ConnectionResetError):
+            client._call('product.create', broken, None, None)
+
+        now[0] = 20
+        self.assertTrue(breaker.allow())
@@ -0,0 +1,99 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from benchmarks.stripe_server import LocalStripeServer
+from config.lms.models import Course, StripePrice, StripeProduct
+from config.lms.services import stripe_service
+from config.users.models import CustomUser, Payment
+
+
+class StripePriceCacheTests(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stripe = cls.enterClassContext(LocalStripeServer())
+        cls.enterClassContext(cls.stripe.settings())
+
+    def setUp(self):
+        cache.clear()
+        stripe_service._local_ids.clear()
+        self.stripe.reset()
+        self.user = CustomUser.objects.create(email='buyer@example.com')
+        self.course = Course.objects.create(title='Курс', price=Decimal('1500.00'))
+        self.client.force_authenticate(user=self.user)
+
+    def checkout(self):
+        response = self.client.post(reverse('payment-create'), {'course_id': self.course.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Payment.objects.get(pk=response.data['payment_id'])
+
+    def test_first_checkout_creates_product_and_price(self):
+        payment = self.checkout()
+
+        self.assertEqual(self.stripe.calls['Product.create'], 1)
+        self.assertEqual(self.stripe.calls['Price.create'], 1)
+        self.assertEqual(self.stripe.calls['checkout.Session.create'], 1)
+        price = StripePrice.objects.get(course=self.course)
+        self.assertEqual(price.amount, Decimal('1500.00'))
+        self.assertEqual(self.stripe.objects[price.price_id]['unit_amount'], 150000)
+        self.assertEqual(payment.stripe_price_id, price.price_id)
+        self.assertTrue(payment.payment_url)
+
+    def test_next_checkout_needs_only_session(self):
+        self.checkout()
+        self.stripe.reset()
+
+        self.checkout()
+
+        self.assertEqual(self.stripe.calls, {'checkout.Session.create': 1})
+
+    def test_mapping_tables_used_when_caches_are_cold(self):
+        self.checkout()
+        cache.clear()
+        stripe_service._local_ids.clear()
+        self.stripe.reset()
+
+        self.checkout()
+
+        self.assertEqual(self.stripe.total_calls, 1)
+
+    def test_price_change_creates_new_price_and_keeps_old(self):
+        first = self.checkout()
+        self.course.price = Decimal('990.00')
+        self.course.save()
+
+        second = self.checkout()
+
+        self.assertEqual(self.stripe.calls['Product.create'], 1)
+        self.assertEqual(self.stripe.calls['Price.create'], 2)
+        self.assertNotEqual(first.stripe_price_id, second.stripe_price_id)
+        self.assertEqual(StripeProduct.objects.filter(course=self.course).count(), 1)
+        self.assertEqual(
+            set(StripePrice.objects.filter(course=self.course).values_list('price_id', flat=True)),
+            {first.stripe_price_id, second.stripe_price_id}
+        )
+
+
+class LocalIdsTests(SimpleTestCase):
+    def test_least_recently_used_evicted(self):
+        local_ids = stripe_service.LocalIds(maxsize=2)
+        local_ids.remember('a', 'prod_a')
+        local_ids.remember('b', 'prod_b')
+        local_ids.get('a')
+        local_ids.remember('c', 'prod_c')
+
+        self.assertEqual(list(local_ids), ['a', 'c'])
+        self.assertIsNone(local_ids.get('b'))
+
+    def test_keys_separated_by_api_key_mode(self):
+        with override_settings(STRIPE_SECRET_KEY='sk_test_123'):
+            test_key = stripe_service._id_key('product', 1)
+        with override_settings(STRIPE_SECRET_KEY='sk_live_123'):
+            live_key = stripe_service._id_key('product', 1)
+
+        self.assertEqual((test_key, live_key), ('stripe:test:product:1', 'stripe:live:product:1'))
@@ -0,0 +1,137 @@
+import threading
+import time
+from unittest import mock
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase
+
+from config.lms import tasks
+from config.lms.models import Course, Subscription
+from config.users.models import CustomUser
+
+
+class CourseUpdateNotificationTests(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(title='Курс')
+        self.users = [
+            CustomUser.objects.create(email=f'subscriber{i}@example.com', is_active=i != 0)
+            for i in range(5)
+        ]
+        for user in self.users:
+            Subscription.objects.create(user=user, course=self.course)
+
+    def test_subscribers_split_into_chunks(self):
+        with mock.patch.object(tasks, 'NOTIFICATION_CHUNK_SIZE', 2), mock.patch.object(tasks, 'group') as group:
+            tasks.send_course_update_notification.apply(args=(self.course.id,))
+
+        signatures = list(group.call_args.args[0])
+        self.assertEqual(
+            [signature.args for signature in signatures],
+            [
+                (self.course.id, [self.users[0].id, self.users[1].id], None),
+                (self.course.id, [self.users[2].id, self.users[3].id], None),
+                (self.course.id, [self.users[4].id], None),
+            ]
+        )
+        group.return_value.apply_async.assert_called_once()
+
+    def test_chunk_sends_over_one_connection(self):
+        user_ids = [user.id for user in self.users]
+        with mock.patch.object(tasks, 'get_connection', wraps=tasks.get_connection) as get_connection:
+            result = tasks.send_course_update_chunk.apply(args=(self.course.id, user_ids))
+
+        self.assertEqual(get_connection.call_count, 1)
+        self.assertEqual(result.get(), 4)  # неактивный пользователь пропущен
+        self.assertEqual(len(mail.outbox), 4)
+        self.assertIn('Курс', mail.outbox[0].alternatives[0][0])
+
+    def test_failed_chunk_is_retried_alone(self):
+        with mock.patch.object(tasks, 'get_connection') as get_connection, \
+                mock.patch.object(tasks.send_course_update_chunk, 'retry', side_effect=RuntimeError) as retry:
+            get_connection.return_value.send_messages.side_effect = OSError('smtp down')
+            tasks.send_course_update_chunk.apply(args=(self.course.id, [self.users[1].id]))
+
+        retry.assert_called_once()
+        self.assertIsInstance(retry.call_args.kwargs['exc'], OSError)
+
+
+class CourseUpdateDebounceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course_id = 42
+        self.now = 1_000_000.0
+        clock = mock.patch.object(tasks.time, 'time', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_burst_of_edits_schedules_one_flush(self):
+        with mock.patch.object(tasks.flush_course_update_notification, 'apply_async') as apply_async:
+            for field in ['title', 'description', 'title'] * 3 + ['published']:
+                tasks.schedule_course_update_notification(self.course_id, [field])
+                self.now += 5
+
+        apply_async.assert_called_once_with(
+            args=(self.course_id,), countdown=tasks.NOTIFICATION_DEBOUNCE_SECONDS
+        )
+
+    def test_flush_sends_merged_changes_once(self):
+        with mock.patch.object(tasks.flush_course_update_notification, 'apply_async'):
+            tasks.schedule_course_update_notification(self.course_id, ['title'])
+            tasks.schedule_course_update_notification(self.course_id, ['description', 'title'])
+
+        self.now += tasks.NOTIFICATION_DEBOUNCE_SECONDS
+        with mock.patch.object(tasks.send_course_update_notification, 'delay') as delay:
+            tasks.flush_course_update_notification(self.course_id)
+            tasks.flush_course_update_notification(self.course_id)
+
+        delay.assert_called_once_with(self.course_id, ['description', 'title'])
+
+    def test_flush_postponed_while_edits_continue(self):
+        with mock.patch.object(tasks.flush_course_update_notification, 'apply_async') as apply_async:
+            tasks.schedule_course_update_notification(self.course_id, ['title'])
+            self.now += tasks.NOTIFICATION_DEBOUNCE_SECONDS - 30
+            tasks.schedule_course_update_notification(self.course_id, ['description'])
+            self.now += 40
+            with mock.patch.object(tasks.send_course_update_notification, 'delay') as delay:
+                tasks.flush_course_update_notification(self.course_id)
+
+        delay.assert_not_called()
+        self.assertEqual(apply_async.call_args.kwargs['countdown'], tasks.NOTIFICATION_DEBOUNCE_SECONDS - 40)
+
+    def test_flush_not_postponed_past_max_delay(self):
+        with mock.patch.object(tasks.flush_course_update_notification, 'apply_async'):
+            tasks.schedule_course_update_notification(self.course_id, ['title'])
+            self.now += tasks.NOTIFICATION_MAX_DELAY_SECONDS
+            tasks.schedule_course_update_notification(self.course_id, ['description'])
+
+        with mock.patch.object(tasks.send_course_update_notification, 'delay') as delay:
+            tasks.flush_course_update_notification(self.course_id)
+        delay.assert_called_once_with(self.course_id, ['description', 'title'])
+
+    def test_concurrent_edits_keep_all_changes(self):
+        fields = [f'field{index}' for index in range(8)]
+        cache_get = LocMemCache.get
+
+        def slow_get(*args, **kwargs):
+            # Расширяет окно между чтением и записью набора изменений
+            value = cache_get(*args, **kwargs)
+            time.sleep(0.005)
+            return value
+
+        with mock.patch.object(tasks.flush_course_update_notification, 'apply_async'), \
+                mock.patch.object(LocMemCache, 'get', slow_get):
+            threads = [
+                threading.Thread(target=tasks.schedule_course_update_notification, args=(self.course_id, [field]))
+                for field in fields
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.now += tasks.NOTIFICATION_DEBOUNCE_SECONDS
+        with mock.patch.object(tasks.send_course_update_notification, 'delay') as delay:
+            tasks.flush_course_update_notification(self.course_id)
+        delay.assert_called_once_with(self.course_id, fields)
@@ -0,0 +1,155 @@
+import io
+import tempfile
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from config.lms import tasks
+from config.lms.models import Course
+from config.lms.thumbnails import render, srcset, target_widths, variant_name
+from config.users.models import CustomUser
+
+
+def make_image(name='cover.png', size=(2000, 1000), mode='RGB'):
+    buffer = io.BytesIO()
+    Image.new(mode, size, color=(30, 120, 200) + ((128,) if mode == 'RGBA' else ())).save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class RenderTests(SimpleTestCase):
+    def test_widths_and_formats(self):
+        rendered = render(make_image(mode='RGBA'))
+
+        self.assertEqual([(width, image_format) for width, image_format, _ in rendered], [
+            (320, 'webp'), (320, 'jpeg'), (640, 'webp'), (640, 'jpeg'), (1280, 'webp'), (1280, 'jpeg'),
+        ])
+        for width, image_format, content in rendered:
+            with Image.open(io.BytesIO(content)) as image:
+                self.assertEqual(image.size, (width, width // 2))
+                self.assertEqual(image.format, image_format.upper())
+                self.assertEqual(image.mode, 'RGBA' if image_format == 'webp' else 'RGB')
+
+    def test_small_image_not_upscaled(self):
+        self.assertEqual(target_widths(500), [320, 500])
+        self.assertEqual(target_widths(200), [200])
+        self.assertEqual({width for width, _, _ in render(make_image(size=(200, 100)))}, {200})
+
+    def test_srcset(self):
+        self.assertEqual(variant_name('courses/previews/a.b.png', 320, 'jpeg'), 'courses/previews/a.b.w320.jpg')
+        self.assertEqual(srcset({}, str), {})
+        self.assertEqual(srcset({'source': 'a.png', 'widths': [320, 640]}, lambda name: f'/media/{name}'), {
+            'webp': '/media/a.w320.webp 320w, /media/a.w640.webp 640w',
+            'jpeg': '/media/a.w320.jpg 320w, /media/a.w640.jpg 640w',
+        })
+
+
+class ImageVariantsTaskTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def save(self, obj, **fields):
+        with mock.patch.object(tasks.generate_image_variants, 'delay',
+                               side_effect=tasks.generate_image_variants) as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            for name, value in fields.items():
+                setattr(obj, name, value)
+            obj.save()
+        obj.refresh_from_db()
+        return delay
+
+    def test_variants_built_after_upload(self):
+        course = Course(title='Курс')
+        self.save(course, preview=make_image())
+
+        self.assertEqual(course.preview_variants, {'source': course.preview.name, 'widths': [320, 640, 1280]})
+        for width in (320, 640, 1280):
+            self.assertTrue(default_storage.exists(variant_name(course.preview.name, width, 'webp')))
+            self.assertTrue(default_storage.exists(variant_name(course.preview.name, width, 'jpeg')))
+
+        delay = self.save(course, title='Новое название')
+        delay.assert_not_called()
+
+    def test_replaced_image_variants_removed(self):
+        course = Course(title='Курс')
+        self.save(course, preview=make_image())
+        old_name = course.preview.name
+
+        self.save(course, preview=make_image('new.png', size=(400, 300)))
+
+        self.assertEqual(course.preview_variants, {'source': course.preview.name, 'widths': [320, 400]})
+        self.assertFalse(default_storage.exists(variant_name(old_name, 320, 'webp')))
+        self.assertTrue(default_storage.exists(variant_name(course.preview.name, 400, 'jpeg')))
+
+    def test_broken_file_not_retried(self):
+        course = Course(title='Курс')
+        self.save(course, preview=SimpleUploadedFile('broken.png', b'not an image'))
+
+        self.assertEqual(course.preview_variants, {'source': course.preview.name, 'widths': []})
+
+    def test_avatar_login_does_not_schedule(self):
+        user = CustomUser.objects.create(email='avatar@example.com')
+        self.save(user, avatar=make_image('me.png', size=(300, 300)))
+        self.assertEqual(user.avatar_variants['widths'], [300])
+
+        with mock.patch.object(tasks.generate_image_variants, 'delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            CustomUser.objects.filter(pk=user.pk).update(avatar_variants={})
+            user.refresh_from_db()
+            user.save(update_fields=['last_login'])
+        delay.assert_not_called()
+
+    def test_build_command(self):
+        Course.objects.bulk_create([Course(title='Без копий', preview=default_storage.save('c.png', make_image()))])
+
+        call_command('build_image_variants', stdout=io.StringIO())
+
+        self.assertEqual(Course.objects.get().preview_variants['widths'], [320, 640, 1280])
+
+
+class ImageVariantsAPITests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(email='srcset@example.com', password='srcsetpass')
+        self.course = Course.objects.create(
+            title='Курс', preview='courses/previews/cover.png', owner=self.user,
+            preview_variants={'source': 'courses/previews/cover.png', 'widths': [320, 640]},
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_course_srcset(self):
+        response = self.client.get(reverse('course-detail', kwargs={'pk': self.course.pk}))
+
+        # Адреса копий строятся так же, как адрес оригинала
+        base = response.data['preview'].removesuffix('cover.png')
+        self.assertEqual(response.data['preview_srcset'], {
+            'webp': f'{base}cover.w320.webp 320w, {base}cover.w640.webp 640w',
+            'jpeg': f'{base}cover.w320.jpg 320w, {base}cover.w640.jpg 640w',
+        })
+
+    def test_user_srcset(self):
+        CustomUser.objects.filter(pk=self.user.pk).update(
+            avatar='users/avatars/me.png', avatar_variants={'source': 'users/avatars/me.png', 'widths': [200]}
+        )
+        self.user.refresh_from_db()
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(reverse('current-user'))
+
+        self.assertTrue(response.data['avatar_srcset']['webp'].endswith('users/avatars/me.w200.webp 200w'))
+
+    def test_stale_variants_hidden(self):
+        self.course.preview = 'courses/previews/other.png'
+        self.course.save()
+
+        response = self.client.get(reverse('course-detail', kwargs={'pk': self.course.pk}))
+
+        self.assertEqual(response.data['preview_srcset'], {})
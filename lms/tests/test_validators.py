@@ -0,0 +1,61 @@
+from io import StringIO
+
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from config.lms.models import Course, Lesson
+from config.lms.validators import external_links, validate_no_external_links
+
+
+class ExternalLinksTests(SimpleTestCase):
+    def test_allowed_domains_and_subdomains(self):
+        text = 'Смотрите https://youtu.be/abc, https://www.youtube.com/watch?v=1 и HTTP://m.YouTube.com./x'
+
+        self.assertEqual(external_links(text), [])
+        validate_no_external_links(text)
+
+    def test_external_links_reported(self):
+        text = ('https://evilyoutube.com/a http://youtube.com.evil.com '
+                'https://youtube.com@evil.com/ https://evil.com/?u=https://youtube.com ftp://files.example')
+
+        self.assertEqual(external_links(text), [
+            'https://evilyoutube.com',
+            'http://youtube.com.evil.com',
+            'https://youtube.com@evil.com',
+            'https://evil.com',
+        ])
+        with self.assertRaises(ValidationError):
+            validate_no_external_links(text)
+
+    def test_port_and_text_without_links(self):
+        self.assertEqual(external_links('https://youtube.com:443/x'), [])
+        self.assertEqual(external_links('https://evil.com:8080'), ['https://evil.com:8080'])
+        self.assertEqual(external_links('просто текст и https:// без адреса'), [])
+        validate_no_external_links(None)
+
+    @override_settings(ALLOWED_LINK_DOMAINS=['example.org'])
+    def test_allowlist_from_settings(self):
+        validate_no_external_links('https://docs.example.org/page')
+        with self.assertRaises(ValidationError):
+            validate_no_external_links('https://youtube.com/watch')
+
+
+class AuditContentLinksTests(TestCase):
+    def setUp(self):
+        # Строки в обход валидации, как данные, сохранённые до исправления валидатора
+        self.course = Course.objects.create(title='Курс', description='См. https://evil.com/page')
+        Lesson.objects.create(course=self.course, title='Урок', video_link='https://youtu.be/ok')
+        self.lesson = Lesson.objects.create(course=self.course, title='Урок 2', video_link='http://vimeo.com/1')
+
+    def test_reports_violations(self):
+        out = StringIO()
+        call_command('audit_content_links', '--workers', '1', '--chunk-size', '1', stdout=out)
+
+        self.assertIn(f'course {self.course.pk} description: https://evil.com', out.getvalue())
+        self.assertIn(f'lesson {self.lesson.pk} video_link: http://vimeo.com', out.getvalue())
+        self.assertIn('2 fields with external links', out.getvalue())
+
+    def test_process_pool_and_fail(self):
+        with self.assertRaisesMessage(CommandError, '2 fields with external links'):
+            call_command('audit_content_links', '--workers', '2', '--fail', stdout=StringIO())
@@ -1,11 +1,22 @@
+import base64
+import json
+import warnings
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.paginator import UnorderedObjectListWarning
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from config.users.models import CustomUser
 from config.lms.models import Course, Lesson, Subscription
+from config.lms.views import SubscriptionViewSet
 
 class LessonCRUDTests(APITestCase):
     def setUp(self):
+        cache.clear()
         # Создаем тестовых пользователей
         self.admin = CustomUser.objects.create_superuser(
             email='admin@example.com',
@@ -187,4 +198,230 @@ class LessonCRUDTests(APITestCase):
             'video_link': 'https://youtube.com/embed/valid'
         }
         response = self.client.post(self.lessons_url, data)
-        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CourseQueryPlanTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            email='planner@example.com',
+            password='plannerpass'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('course-list')
+
+    def create_courses(self, count):
+        for i in range(count):
+            course = Course.objects.create(title=f'Курс {i}', owner=self.user)
+            for j in range(3):
+                Lesson.objects.create(
+                    title=f'Урок {j}',
+                    course=course,
+                    owner=self.user,
+                    video_link='https://youtube.com/embed/test'
+                )
+            if i % 2:
+                Subscription.objects.create(user=self.user, course=course)
+
+    def test_course_list_query_count_does_not_depend_on_page_size(self):
+        self.create_courses(2)
+        with self.assertNumQueries(4):  # ETag + count + courses + prefetch lessons
+            self.client.get(self.url + '?page_size=2&expand=lessons')
+
+        self.create_courses(20)
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url + '?page_size=20&expand=lessons')
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_lessons_are_not_loaded_without_expand(self):
+        self.create_courses(2)
+        with self.assertNumQueries(3):  # ETag + count + courses
+            response = self.client.get(self.url)
+        self.assertNotIn('lessons', response.data['results'][0])
+
+    def test_course_list_uses_annotations(self):
+        self.create_courses(2)
+        response = self.client.get(self.url + '?expand=lessons')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        by_title = {course['title']: course for course in response.data['results']}
+        self.assertEqual(by_title['Курс 0']['lessons_count'], 3)
+        self.assertEqual(len(by_title['Курс 0']['lessons']), 3)
+        self.assertFalse(by_title['Курс 0']['is_subscribed'])
+        self.assertTrue(by_title['Курс 1']['is_subscribed'])
+
+    def test_sparse_fields_limit_response_and_columns(self):
+        self.create_courses(2)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url + '?fields=id,title,lessons_count')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title', 'lessons_count'})
+        selected = queries.captured_queries[-1]['sql'].split(' FROM ')[0]
+        self.assertIn('"title"', selected)
+        self.assertNotIn('"description"', selected)
+        self.assertNotIn('lms_subscription', selected)
+
+    def test_cursor_pagination_with_sparse_fields(self):
+        self.create_courses(3)
+        response = self.client.get(self.url + '?pagination=cursor&page_size=2&fields=title')
+        self.assertEqual(response.data['results'], [{'title': 'Курс 0'}, {'title': 'Курс 1'}])
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.data['results'], [{'title': 'Курс 2'}])
+
+    def test_detail_variants_are_cached_separately(self):
+        self.create_courses(1)
+        url = reverse('course-detail', kwargs={'pk': Course.objects.get().pk})
+        self.assertNotIn('lessons', self.client.get(url).data)
+        self.assertEqual(len(self.client.get(url + '?expand=lessons').data['lessons']), 3)
+        self.assertEqual(set(self.client.get(url + '?fields=id,is_subscribed').data), {'id', 'is_subscribed'})
+        self.assertNotIn('lessons', self.client.get(url).data)
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            email='keyset@example.com',
+            password='keysetpass'
+        )
+        self.client.force_authenticate(user=self.user)
+        course = Course.objects.create(title='Курс', owner=self.user)
+        self.lessons = [
+            Lesson.objects.create(
+                title=f'Урок {i}',
+                course=course,
+                owner=self.user,
+                video_link='https://youtube.com/embed/test'
+            )
+            for i in range(7)
+        ]
+        self.url = reverse('lesson-list')
+
+    def test_cursor_pages_cover_all_lessons_without_count(self):
+        with self.assertNumQueries(2):  # валидаторы ETag и страница, пагинация без COUNT(*)
+            response = self.client.get(self.url + '?pagination=cursor&page_size=3')
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+
+        seen = [lesson['id'] for lesson in response.data['results']]
+        next_url = response.data['next']
+        while next_url:
+            response = self.client.get(next_url)
+            seen.extend(lesson['id'] for lesson in response.data['results'])
+            next_url = response.data['next']
+        self.assertEqual(seen, [lesson.id for lesson in self.lessons])
+
+    def test_cursor_previous_link_returns_previous_page(self):
+        first = self.client.get(self.url + '?pagination=cursor&page_size=3')
+        second = self.client.get(first.data['next'])
+        previous = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [lesson['id'] for lesson in previous.data['results']],
+            [lesson['id'] for lesson in first.data['results']]
+        )
+
+    def test_cursor_count_on_request(self):
+        response = self.client.get(self.url + '?pagination=cursor&count=true')
+        self.assertEqual(response.data['count'], 7)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url + '?cursor=broken')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_forged_cursor(self):
+        for position in (['notadate', 1], [{'a': 1}, 1], ['2024-01-01T00:00:00', 'x'], [None, 1], 'p'):
+            cursor = base64.urlsafe_b64encode(json.dumps({'p': position, 'r': 0}).encode()).decode()
+            with self.subTest(position=position):
+                response = self.client.get(self.url + f'?cursor={cursor}')
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_mode_uses_keyset_ordering(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', UnorderedObjectListWarning)
+            response = self.client.get(self.url + '?page_size=3&page=2')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([lesson['id'] for lesson in response.data['results']],
+                         [lesson.id for lesson in self.lessons[3:6]])
+
+
+class CourseUpdateNotificationViewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email='author@example.com', password='authorpass')
+        self.course = Course.objects.create(title='Курс', description='Описание', owner=self.user)
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('course-detail', kwargs={'pk': self.course.pk})
+
+    @mock.patch('config.lms.views.schedule_course_update_notification')
+    def test_significant_change_schedules_notification(self, schedule):
+        response = self.client.patch(self.url, {'title': 'Новое название', 'description': 'Описание'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        schedule.assert_called_once_with(self.course.pk, ['title'])
+
+    @mock.patch('config.lms.views.schedule_course_update_notification')
+    def test_unchanged_values_do_not_schedule_notification(self, schedule):
+        self.client.patch(self.url, {'title': 'Курс'})
+        schedule.assert_not_called()
+
+
+class BulkSubscriptionTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email='bulk@example.com', password='bulkpass')
+        self.courses = [Course.objects.create(title=f'Курс {i}', owner=self.user) for i in range(30)]
+        self.course_ids = [course.id for course in self.courses]
+        self.client.force_authenticate(user=self.user)
+
+    def statuses(self, response):
+        return {item['course_id']: item['status'] for item in response.data['results']}
+
+    def test_bulk_subscribe(self):
+        Subscription.objects.create(user=self.user, course=self.courses[0])
+        missing_id = max(self.course_ids) + 1
+        response = self.client.post(
+            reverse('subscribe-bulk'), {'course_ids': self.course_ids[:3] + [missing_id]}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.statuses(response), {
+            self.course_ids[0]: 'already_subscribed',
+            self.course_ids[1]: 'subscribed',
+            self.course_ids[2]: 'subscribed',
+            missing_id: 'course_not_found',
+        })
+        self.assertEqual(Subscription.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(Course.objects.get(pk=self.course_ids[1]).subscribers_count, 1)
+
+    def test_bulk_query_count_does_not_depend_on_size(self):
+        for size in (2, 30):
+            Subscription.objects.all().delete()
+            # Плюс SAVEPOINT и RELEASE: в тесте transaction.atomic вложен в транзакцию TestCase
+            with self.assertNumQueries(7):  # блокировка пользователя, курсы, подписки, INSERT, пересчёт счётчиков
+                self.client.post(reverse('subscribe-bulk'), {'course_ids': self.course_ids[:size]}, format='json')
+            with self.assertNumQueries(7):  # подписки, счётчики по курсам, выборка для signals, DELETE, UPDATE
+                self.client.post(reverse('unsubscribe-bulk'), {'course_ids': self.course_ids[:size]}, format='json')
+
+    def test_subscribe_locks_user_before_reading(self):
+        # Чтение подписок до INSERT верно, только пока параллельный запрос не вставляет те же строки
+        calls = []
+        lock = mock.patch.object(SubscriptionViewSet, 'lock_subscriptions', lambda view: calls.append('lock'))
+        read = SubscriptionViewSet.subscribed_course_ids
+        with lock, mock.patch.object(
+            SubscriptionViewSet, 'subscribed_course_ids',
+            lambda view, course_ids: calls.append('read') or read(view, course_ids),
+        ):
+            self.client.post(reverse('subscribe-bulk'), {'course_ids': self.course_ids[:2]}, format='json')
+            self.client.post(reverse('subscribe'), {'course_id': self.course_ids[2]})
+        self.assertEqual(calls, ['lock', 'read', 'lock'])
+
+    def test_bulk_unsubscribe(self):
+        Subscription.objects.create(user=self.user, course=self.courses[0])
+        response = self.client.post(reverse('unsubscribe-bulk'), {'course_ids': self.course_ids[:2]}, format='json')
+        self.assertEqual(self.statuses(response), {
+            self.course_ids[0]: 'unsubscribed',
+            self.course_ids[1]: 'not_subscribed',
+        })
+        self.assertFalse(Subscription.objects.filter(user=self.user).exists())
+        self.assertEqual(Course.objects.get(pk=self.course_ids[0]).subscribers_count, 0)
+
+    def test_bulk_requires_course_ids(self):
+        response = self.client.post(reverse('subscribe-bulk'), {'course_ids': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
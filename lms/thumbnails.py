@@ -0,0 +1,123 @@
+"""Уменьшенные копии загруженных изображений (превью курсов и уроков, аватары) для srcset.
+
+Копии нескольких ширин в WebP и JPEG лежат в хранилище рядом с оригиналом:
+``courses/previews/cover.png`` -> ``courses/previews/cover.w320.webp``, ``cover.w320.jpg`` и т.д.
+Какие копии готовы, хранит JSON-поле ``<поле>_variants`` модели: ``{'source': имя оригинала, 'widths': [...]}``.
+Копии строит задача ``lms.tasks.generate_image_variants`` после сохранения нового файла.
+"""
+from io import BytesIO
+import posixpath
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+# Ширины копий; оригинал не увеличивается: копии шире оригинала заменяет одна копия его ширины
+THUMBNAIL_WIDTHS = (320, 640, 1280)
+
+# Формат -> (расширение файла, формат Pillow, параметры сохранения)
+THUMBNAIL_FORMATS = {
+    'webp': ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def variants_field(field_name):
+    """Имя JSON-поля с картой копий для поля изображения"""
+    return f'{field_name}_variants'
+
+
+def variant_name(name, width, image_format):
+    root = posixpath.splitext(name)[0]
+    return f'{root}.w{width}.{THUMBNAIL_FORMATS[image_format][0]}'
+
+
+def target_widths(width):
+    return sorted({min(target, width) for target in THUMBNAIL_WIDTHS})
+
+
+def _flatten(image):
+    """RGB-копия для JPEG: прозрачные области на белом фоне"""
+    if image.mode == 'P':
+        image = image.convert('RGBA')
+    if image.mode in ('RGBA', 'LA'):
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render(file):
+    """[(ширина, формат, байты)] копий изображения из открытого файла"""
+    with Image.open(file) as source:
+        # JPEG декодируется сразу в уменьшенном масштабе, но не меньше самой большой копии по обеим сторонам
+        source.draft('RGB', (THUMBNAIL_WIDTHS[-1], THUMBNAIL_WIDTHS[-1]))
+        image = ImageOps.exif_transpose(source)
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    rendered = []
+    for width in target_widths(image.width):
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else \
+            image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        for image_format, (_, pillow_format, options) in THUMBNAIL_FORMATS.items():
+            output = resized if image_format == 'webp' else _flatten(resized)
+            buffer = BytesIO()
+            output.save(buffer, pillow_format, **options)
+            rendered.append((width, image_format, buffer.getvalue()))
+    return rendered
+
+
+def generate(fieldfile):
+    """Сохраняет копии файла поля рядом с оригиналом и возвращает их ширины"""
+    storage = fieldfile.storage
+    with storage.open(fieldfile.name, 'rb') as file:
+        rendered = render(file)
+    for width, image_format, content in rendered:
+        name = variant_name(fieldfile.name, width, image_format)
+        # Повторная генерация перезаписывает копию, а не создаёт файл с суффиксом
+        if storage.exists(name):
+            storage.delete(name)
+        storage.save(name, ContentFile(content))
+    return sorted({width for width, _, _ in rendered})
+
+
+def delete(storage, variants):
+    """Удаляет файлы копий по карте из ``<поле>_variants``"""
+    for width in variants.get('widths') or ():
+        for image_format in THUMBNAIL_FORMATS:
+            storage.delete(variant_name(variants['source'], width, image_format))
+
+
+def srcset(variants, url):
+    """{'webp': 'адрес 320w, адрес 640w', 'jpeg': ...} по карте копий; пусто, пока копии не готовы"""
+    widths = variants.get('widths') if variants else None
+    if not widths:
+        return {}
+    return {
+        image_format: ', '.join(f'{url(variant_name(variants["source"], width, image_format))} {width}w'
+                                for width in widths)
+        for image_format in THUMBNAIL_FORMATS
+    }
+
+
+def is_stale(instance, field_name):
+    """Карта копий построена не для текущего файла поля (файл заменён, удалён или копий ещё нет)"""
+    name = getattr(instance, field_name).name or ''
+    variants = getattr(instance, variants_field(field_name)) or {}
+    return variants.get('source', '') != name
+
+
+def reset_stale_variants(instance, field_name, update_fields=None):
+    """Для pre_save: сбрасывает карту копий прежнего файла, чтобы ответы не ссылались на чужие копии.
+
+    Прежняя карта запоминается на объекте - её файлы удалит задача после сохранения.
+    """
+    field = variants_field(field_name)
+    if {field_name, field} & instance.get_deferred_fields():
+        return
+    if update_fields is not None and field_name not in update_fields:
+        return
+    if is_stale(instance, field_name) and getattr(instance, field):
+        setattr(instance, f'_stale_{field}', getattr(instance, field))
+        setattr(instance, field, {})
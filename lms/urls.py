@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CourseViewSet, LessonListCreateAPIView, LessonRetrieveUpdateDestroyAPIView, SubscriptionViewSet
+from .views import CourseViewSet, LessonListCreateAPIView, LessonRetrieveUpdateDestroyAPIView, SubscriptionViewSet, \
+    ProfilingReportAPIView, SearchAPIView
 
 router = DefaultRouter()
 router.register(r'courses', CourseViewSet)
@@ -11,5 +12,9 @@ urlpatterns = [
     path('lessons/<int:pk>/', LessonRetrieveUpdateDestroyAPIView.as_view(), name='lesson-detail'),
     path('subscribe/', SubscriptionViewSet.as_view({'post': 'subscribe'}), name='subscribe'),
     path('unsubscribe/', SubscriptionViewSet.as_view({'post': 'unsubscribe'}), name='unsubscribe'),
+    path('subscribe/bulk/', SubscriptionViewSet.as_view({'post': 'bulk_subscribe'}), name='subscribe-bulk'),
+    path('unsubscribe/bulk/', SubscriptionViewSet.as_view({'post': 'bulk_unsubscribe'}), name='unsubscribe-bulk'),
+    path('search/', SearchAPIView.as_view(), name='search'),
+    path('profiling/', ProfilingReportAPIView.as_view(), name='profiling-report'),
 
 ]
@@ -1,16 +1,76 @@
-from django.core.exceptions import ValidationError
-from urllib.parse import urlparse
+from functools import lru_cache
 import re
 
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+# Домены, ссылки на которые разрешены в описаниях; поддомены разрешены вместе с доменом.
+# Переопределяется настройкой ALLOWED_LINK_DOMAINS
+DEFAULT_ALLOWED_LINK_DOMAINS = ('youtube.com', 'youtu.be')
+
+# Authority ссылки (до пути, запроса или фрагмента) после "://". Шаблон начинается с литерала - re ищет
+# его быстрым поиском подстроки, а без вложенных повторений весь проход линеен от длины текста.
+# Схема (http или https в любом регистре) проверяется по символам перед совпадением
+LINK = re.compile(r'://([^\s/?#\\<>"\'`]+)')
+SCHEMES = ('https', 'http')
+
+
+def allowed_link_domains():
+    return tuple(getattr(settings, 'ALLOWED_LINK_DOMAINS', DEFAULT_ALLOWED_LINK_DOMAINS))
+
+
+@lru_cache(maxsize=16)
+def _allowlist(domains):
+    """(домены, суффиксы поддоменов) для сравнения без разбора списка на каждой ссылке"""
+    domains = tuple(domain.lower().strip('.') for domain in domains)
+    return frozenset(domains), tuple(f'.{domain}' for domain in domains)
+
+
+def link_host(authority):
+    """Хост из authority: без user:password@, порта и завершающей точки"""
+    host = authority.rpartition('@')[2]
+    if host.startswith('['):  # IPv6
+        host = host[:host.find(']') + 1]
+    else:
+        host = host.partition(':')[0]
+    return host.lower().rstrip('.')
+
+
+def external_links(text, domains=DEFAULT_ALLOWED_LINK_DOMAINS):
+    """Ссылки текста на хосты вне domains и их поддоменов, в порядке появления"""
+    if not text:
+        return []
+    exact, suffixes = _allowlist(tuple(domains))
+    found = []
+    for match in LINK.finditer(text):
+        start = match.start()
+        before = text[max(0, start - 5):start].lower()
+        scheme = next((scheme for scheme in SCHEMES if before.endswith(scheme)), None)
+        if scheme is None:
+            continue
+        host = link_host(match.group(1))
+        if host not in exact and not host.endswith(suffixes):
+            found.append(text[start - len(scheme):match.end()])
+    return found
+
 
 def validate_no_external_links(text):
     """Проверяет текст на отсутствие сторонних ссылок"""
-    if text:
-        urls = re.findall(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', text)
-        for url in urls:
-            parsed = urlparse(url)
-            domain = parsed.netloc.lower()
-            if not domain.endswith('youtube.com') or domain.endswith('youtu.be'):
-                raise ValidationError(
-                    'В описании запрещены ссылки на сторонние ресурсы кроме YouTube'
-                )
\ No newline at end of file
+    if external_links(text, allowed_link_domains()):
+        raise ValidationError(
+            'В описании запрещены ссылки на сторонние ресурсы кроме YouTube'
+        )
+
+
+def audit_rows(rows, domains):
+    """[(pk, поле, ссылки)] для строк вида (pk, {поле: текст}).
+
+    Не обращается к настройкам и базе - выполняется в дочерних процессах audit_content_links.
+    """
+    violations = []
+    for pk, fields in rows:
+        for field, text in fields.items():
+            links = external_links(text, domains)
+            if links:
+                violations.append((pk, field, links))
+    return violations
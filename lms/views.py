@@ -1,4 +1,3 @@
-from django.db.models import Exists, OuterRef
 from django.shortcuts import get_object_or_404, redirect
 from django.views import View
 from rest_framework import viewsets, status
@@ -6,21 +5,36 @@ from .models import Course, Lesson
 from .serializers import CourseSerializer, LessonSerializer
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from config.users.models import CustomUser
 from config.users.permissions import IsModerator, IsOwner, IsOwnerOrModerator
+from config.users.roles import is_moderator
 from .models import Subscription
-from .serializers import SubscriptionSerializer
+from .serializers import BulkSubscriptionSerializer, SubscriptionSerializer, SearchQuerySerializer, \
+    CourseSearchResultSerializer, LessonSearchResultSerializer
+from .search import search
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.db import transaction
 from .paginators import CoursePaginator, LessonPaginator
+from .planning import QueryPlanMixin
+from .cache import CachedResponseMixin, get_changed_at, invalidate_object, touch
+from .conditional import ConditionalGetMixin
+from .fastpath import FastListMixin
 from django.urls import reverse
-from .tasks import send_course_update_notification
+from .tasks import schedule_course_update_notification
+from .profiling import top_routes
 
 
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(ConditionalGetMixin, CachedResponseMixin, FastListMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     pagination_class = CoursePaginator
+    cache_namespace = 'course'
+    conditional_namespace = 'course'
+    user_fields = ('is_subscribed',)
+    fast_list = True
 
     def get_permissions(self):
         if self.action == 'create':
@@ -38,38 +52,48 @@ class CourseViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
-    def get_queryset(self):
-        queryset = super().get_queryset()
-        if self.request.user.is_authenticated:
-            queryset = queryset.annotate(
-                is_subscribed=Exists(
-                    Subscription.objects.filter(
-                        user=self.request.user,
-                        course=OuterRef('pk')
-                    )
-                )
-            )
-        return queryset
+    def returns_subscription(self):
+        return 'is_subscribed' in self.get_serializer().fields  # поле можно исключить через ?fields=
+
+    def get_changed_at(self):
+        if not self.returns_subscription():
+            return []
+        return [get_changed_at(f'subscriptions:{self.request.user.pk}')]
+
+    def personalize(self, items):
+        if not self.returns_subscription():
+            return
+        course_ids = [item['id'] for item in items]
+        subscribed = set(
+            Subscription.objects.filter(
+                user=self.request.user,
+                course_id__in=course_ids
+            ).values_list('course_id', flat=True)
+        )
+        for item in items:
+            item['is_subscribed'] = item['id'] in subscribed
 
     def perform_update(self, serializer):
+        # Изменения считаем до save: после него instance уже содержит новые значения
+        changes = self.get_course_changes(serializer)
         instance = serializer.save()
 
-        # Отправляем уведомления подписчикам асинхронно
-        if self.is_course_updated(instance, serializer):
-            send_course_update_notification.delay(instance.id)
+        # Серия правок копится и уходит подписчикам одной отложенной рассылкой
+        if changes:
+            schedule_course_update_notification(instance.id, changes)
 
         return instance
 
-    def is_course_updated(self, instance, serializer):
-        """Проверяем, были ли обновлены значимые поля"""
+    def get_course_changes(self, serializer):
+        """Значимые поля, которые меняет этот запрос"""
         old_data = serializer.instance.__dict__
         new_data = serializer.validated_data
 
         significant_fields = ['title', 'description', 'lessons']
-        return any(
-            field in new_data and new_data[field] != old_data.get(field)
-            for field in significant_fields
-        )
+        return [
+            field for field in significant_fields
+            if field in new_data and new_data[field] != old_data.get(field)
+        ]
 
     @action(detail=True, methods=['post'])
     def publish(self, request, pk=None):
@@ -79,7 +103,7 @@ class CourseViewSet(viewsets.ModelViewSet):
         course.save()
 
         # Отправляем уведомления при публикации
-        send_course_update_notification.delay(course.id)
+        schedule_course_update_notification(course.id, ['published'])
 
         return Response({'status': 'курс опубликован'})
 
@@ -107,19 +131,25 @@ class LessonViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         queryset = super().get_queryset()
-        if not (self.request.user.is_staff or self.request.user.groups.filter(name='moderators').exists()):
+        if not (self.request.user.is_staff or is_moderator(self.request)):
             queryset = queryset.filter(owner=self.request.user)
         return queryset
 
 
-class LessonListCreateAPIView(generics.ListCreateAPIView):
+class LessonListCreateAPIView(ConditionalGetMixin, CachedResponseMixin, FastListMixin, generics.ListCreateAPIView):
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
+    pagination_class = LessonPaginator
+    cache_namespace = 'lesson'
+    conditional_namespace = 'lesson'
+    fast_list = True
 
 
-class LessonRetrieveUpdateDestroyAPIView(generics.RetrieveUpdateDestroyAPIView):
+class LessonRetrieveUpdateDestroyAPIView(ConditionalGetMixin, CachedResponseMixin,
+                                         generics.RetrieveUpdateDestroyAPIView):
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
+    cache_namespace = 'lesson'
 
 
 class SubscriptionViewSet(viewsets.ModelViewSet):
@@ -133,10 +163,12 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
         if not course_id:
             return Response({'error': 'course_id обязателен'}, status=status.HTTP_400_BAD_REQUEST)
 
-        subscription, created = Subscription.objects.get_or_create(
-            user=request.user,
-            course_id=course_id
-        )
+        with transaction.atomic():
+            self.lock_subscriptions()
+            subscription, created = Subscription.objects.get_or_create(
+                user=request.user,
+                course_id=course_id
+            )
 
         if created:
             return Response({'status': 'подписка создана'}, status=status.HTTP_201_CREATED)
@@ -157,4 +189,102 @@ class SubscriptionViewSet(viewsets.ModelViewSet):
             return Response({'status': 'подписка удалена'}, status=status.HTTP_200_OK)
         return Response({'status': 'подписка не найдена'}, status=status.HTTP_404_NOT_FOUND)
 
+    def get_bulk_course_ids(self, request):
+        serializer = BulkSubscriptionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['course_ids']
+
+    def lock_subscriptions(self):
+        """Блокирует строку пользователя: подписки одного пользователя создаются по очереди"""
+        list(CustomUser.objects.select_for_update().filter(pk=self.request.user.pk).values_list('pk', flat=True))
+
+    def subscribed_course_ids(self, course_ids):
+        return set(
+            Subscription.objects.filter(user=self.request.user, course_id__in=course_ids)
+            .values_list('course_id', flat=True)
+        )
 
+    @action(detail=False, methods=['post'])
+    def bulk_subscribe(self, request):
+        """Подписка на несколько курсов за постоянное число запросов"""
+        course_ids = self.get_bulk_course_ids(request)
+        with transaction.atomic():
+            # Без блокировки параллельный запрос вставит строку между чтением и INSERT: ignore_conflicts
+            # её молча пропустит, а в ответе она окажется новой подпиской
+            self.lock_subscriptions()
+            existing = set(Course.objects.filter(pk__in=course_ids).values_list('pk', flat=True))
+            subscribed = self.subscribed_course_ids(course_ids)
+            created = [course_id for course_id in course_ids if course_id in existing - subscribed]
+            if created:
+                Subscription.objects.bulk_create(
+                    [Subscription(user=request.user, course_id=course_id) for course_id in created],
+                    ignore_conflicts=True,
+                )
+
+        # bulk_create не шлёт post_save: кэш сбрасываем так же, как signals
+        for course_id in created:
+            invalidate_object('course', course_id)
+        if created:
+            touch(f'subscriptions:{request.user.pk}')
+
+        results = []
+        for course_id in course_ids:
+            if course_id not in existing:
+                result = 'course_not_found'
+            elif course_id in subscribed:
+                result = 'already_subscribed'
+            else:
+                result = 'subscribed'
+            results.append({'course_id': course_id, 'status': result})
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'])
+    def bulk_unsubscribe(self, request):
+        """Отписка от нескольких курсов одним DELETE ... IN"""
+        course_ids = self.get_bulk_course_ids(request)
+        with transaction.atomic():
+            subscribed = self.subscribed_course_ids(course_ids)
+            if subscribed:
+                Subscription.objects.filter(user=request.user, course_id__in=subscribed).delete()
+
+        results = [
+            {'course_id': course_id, 'status': 'unsubscribed' if course_id in subscribed else 'not_subscribed'}
+            for course_id in course_ids
+        ]
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+
+class SearchAPIView(APIView):
+    """Полнотекстовый поиск по курсам и урокам: ?q=слова[&type=course|lesson][&limit=10].
+
+    Слова ищутся по началу, результаты упорядочены по релевантности (совпадение в заголовке важнее).
+    """
+    permission_classes = [IsAuthenticated]
+    sources = {
+        'course': (Course.objects.all(), CourseSearchResultSerializer),
+        'lesson': (Lesson.objects.all(), LessonSearchResultSerializer),
+    }
+
+    def get(self, request):
+        query = SearchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        kinds = [params['type']] if 'type' in params else list(self.sources)
+        results = {}
+        for kind in kinds:
+            queryset, serializer_class = self.sources[kind]
+            found = search(queryset.all(), params['q'], params['limit'])
+            results[f'{kind}s'] = serializer_class(found, many=True).data
+        return Response(results)
+
+
+class ProfilingReportAPIView(APIView):
+    """Самые медленные маршруты и маршруты с наибольшим числом повторяющихся SQL-запросов"""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        try:
+            limit = max(1, int(request.query_params.get('limit', 10)))
+        except ValueError:
+            return Response({'error': 'limit должен быть числом'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(top_routes(limit))
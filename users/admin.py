@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, Payment
+from .models import CustomUser, Payment, StripeEvent
+from .tasks import process_stripe_event
 from django.contrib.auth.models import Group
 
 
@@ -27,10 +28,24 @@ admin.site.register(CustomUser, CustomUserAdmin)
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
-    list_display = ('user', 'payment_date', 'paid_course', 'paid_lesson', 'amount', 'payment_method')
-    list_filter = ('payment_method', 'payment_date')
+    list_display = ('user', 'payment_date', 'paid_course', 'paid_lesson', 'amount', 'payment_method', 'status')
+    list_filter = ('payment_method', 'status', 'payment_date')
     search_fields = ('user__email', 'paid_course__title', 'paid_lesson__title')
 
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ('event_id', 'type', 'received_at', 'processed_at')
+    list_filter = ('type', 'processed_at')
+    search_fields = ('event_id',)
+    readonly_fields = ('event_id', 'type', 'payload', 'received_at', 'processed_at', 'error')
+    actions = ['replay']
+
+    @admin.action(description='Обработать повторно')
+    def replay(self, request, queryset):
+        for event_pk in queryset.values_list('pk', flat=True):
+            process_stripe_event.delay(event_pk, force=True)
+
 @admin.register(Group)
 class CustomGroupAdmin(admin.ModelAdmin):
     filter_horizontal = ['permissions']
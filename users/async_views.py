@@ -0,0 +1,121 @@
+"""Асинхронные эндпоинты оплаты для ASGI (uvicorn config.asgi:application).
+
+Ответы те же, что у PaymentCreateAPIView и PaymentStatusAPIView, но ожидание Stripe и базы
+не занимает воркер: один процесс держит сотни оформлений оплаты одновременно.
+DRF не поддерживает async-представления, поэтому это обычные View Django с JWT-аутентификацией.
+"""
+import json
+
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+from config.lms.models import Course
+from config.lms.services.stripe_client import StripeUnavailable
+from config.lms.services.stripe_service import acreate_stripe_session, aget_stripe_price_id
+from .models import CustomUser, Payment
+
+
+async def authenticate(request):
+    """JWT-аутентификация без блокирующих вызовов: токен проверяется в памяти, пользователь читается async ORM"""
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    if header is None:
+        return None
+    # Здесь нет обработчика исключений DRF: ошибка разбора заголовка (например, "Bearer a b") - это 401, а не 500
+    try:
+        raw_token = auth.get_raw_token(header)
+        if raw_token is None:
+            return None
+        token = auth.get_validated_token(raw_token)
+    except (AuthenticationFailed, InvalidToken, TokenError):
+        return None
+    return await CustomUser.objects.filter(
+        **{api_settings.USER_ID_FIELD: token[api_settings.USER_ID_CLAIM]},
+        is_active=True,
+    ).afirst()
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncPaymentView(View):
+    async def dispatch(self, request, *args, **kwargs):
+        request.user = await authenticate(request)
+        if request.user is None:
+            return JsonResponse({'detail': 'Учетные данные не были предоставлены.'}, status=401)
+        return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncPaymentCreateView(AsyncPaymentView):
+    async def post(self, request):
+        if request.content_type == 'application/json':
+            try:
+                data = json.loads(request.body or b'{}')
+            except ValueError:
+                data = {}
+            if not isinstance(data, dict):
+                return JsonResponse({'error': 'Ожидается JSON-объект'}, status=400)
+        else:
+            data = request.POST
+        course_id = data.get('course_id')
+        if not course_id:
+            return JsonResponse({'error': 'course_id обязателен'}, status=400)
+        try:
+            course_id = Course._meta.pk.to_python(course_id)
+        except ValidationError:
+            return JsonResponse({'error': 'course_id должен быть числом'}, status=400)
+
+        course = await Course.objects.only('id', 'title', 'description', 'price').filter(pk=course_id).afirst()
+        if course is None:
+            return JsonResponse({'error': 'Курс не найден'}, status=404)
+
+        payment = await Payment.objects.acreate(
+            user=request.user,
+            paid_course=course,
+            amount=course.price,
+            payment_method='card',
+            status='pending'
+        )
+
+        try:
+            price_id = await aget_stripe_price_id(course, course.price)
+            session = await acreate_stripe_session(
+                price_id,
+                request.build_absolute_uri(reverse('payment-success', kwargs={'pk': payment.pk})),
+                request.build_absolute_uri(reverse('payment-cancel', kwargs={'pk': payment.pk})),
+            )
+        except Exception as e:
+            payment.status = 'failed'
+            await payment.asave(update_fields=['status'])
+            return JsonResponse({'error': str(e)}, status=503 if isinstance(e, StripeUnavailable) else 500)
+
+        payment.stripe_price_id = price_id
+        payment.stripe_session_id = session.id
+        payment.payment_url = session.url
+        await payment.asave(update_fields=['stripe_price_id', 'stripe_session_id', 'payment_url'])
+
+        return JsonResponse({
+            'payment_id': payment.id,
+            'payment_url': session.url,
+            'status': 'pending'
+        }, status=201)
+
+
+class AsyncPaymentStatusView(AsyncPaymentView):
+    async def get(self, request, pk):
+        payment = await Payment.objects.only('id', 'user_id', 'status').filter(pk=pk).afirst()
+        if payment is None:
+            return JsonResponse({'detail': 'Не найдено.'}, status=404)
+        if payment.user_id != request.user.id:
+            return JsonResponse({'error': 'Доступ запрещен'}, status=403)
+
+        return JsonResponse({
+            'payment_id': payment.id,
+            'status': payment.status,
+        })
@@ -0,0 +1,48 @@
+import json
+import platform
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from benchmarks.deactivation import run, seed_users
+from benchmarks.runner import benchmark_database
+from config.users.tasks import DEACTIVATION_BATCH_PAUSE_SECONDS, DEACTIVATION_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Compares single-statement and primary-key-range batched deactivation of inactive users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000_000)
+        parser.add_argument('--stale-ratio', type=float, default=0.5, help='Доля пользователей для деактивации')
+        parser.add_argument('--batch-size', type=int, nargs='+', default=[DEACTIVATION_BATCH_SIZE])
+        parser.add_argument('--pause', type=float, default=DEACTIVATION_BATCH_PAUSE_SECONDS,
+                            help='Пауза между пачками, с (учитывается в seconds_with_pauses)')
+        parser.add_argument('--report', help='Путь к JSON-отчёту')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.stdout.write(f'Seeding {options["users"]} users...')
+            seed_users(options['users'], options['stale_ratio'])
+            results = run(options['batch_size'], options['pause'])
+
+        for result in results:
+            self.stdout.write(
+                f'{result["name"]:<16} {result["seconds"]:>8}s  deactivated={result["deactivated"]} '
+                f'batches={result["batches"]} longest UPDATE={result["longest_update_seconds"]}s '
+                f'median UPDATE={result["median_update_seconds"]}s'
+            )
+        if options['report']:
+            report = {
+                'meta': {
+                    'database': connection.vendor,
+                    'python': platform.python_version(),
+                    'users': options['users'],
+                    'stale_ratio': options['stale_ratio'],
+                    'pause': options['pause'],
+                },
+                'results': results,
+            }
+            with open(options['report'], 'w') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+                f.write('\n')
@@ -0,0 +1,42 @@
+import json
+import platform
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from benchmarks.exports import run, seed_payments
+from benchmarks.runner import benchmark_database
+
+
+class Command(BaseCommand):
+    help = 'Measures time and peak memory of the streaming payment export against one-shot serialization'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--payments', type=int, default=1_000_000)
+        parser.add_argument('--legacy-rows', type=int, default=50_000,
+                            help='Строк для прежнего пути (0 - не прогонять); на миллионе он не укладывается в память')
+        parser.add_argument('--no-memory', action='store_true', help='Не измерять пиковую память (tracemalloc)')
+        parser.add_argument('--report', help='Путь к JSON-отчёту')
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.stdout.write(f'Seeding {options["payments"]} payments...')
+            admin = seed_payments(options['payments'])
+            results = run(admin, options['payments'], min(options['legacy_rows'], options['payments']),
+                          track_memory=not options['no_memory'])
+
+        for result in results:
+            memory = f'  peak={result["peak_memory_mb"]}MB' if 'peak_memory_mb' in result else ''
+            self.stdout.write(
+                f'{result["name"]:<12} rows={result["rows"]:<8} {result["seconds"]:>8}s  '
+                f'{result["rows_per_second"]:>8} rows/s  {result["bytes"] / 2 ** 20:.1f}MB{memory}'
+            )
+        if options['report']:
+            report = {
+                'meta': {'database': connection.vendor, 'python': platform.python_version(),
+                         'payments': options['payments']},
+                'results': results,
+            }
+            with open(options['report'], 'w') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+                f.write('\n')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from config.users.rollups import FOLD_BATCH_SIZE, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds daily revenue rollups from payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=FOLD_BATCH_SIZE,
+                            help='Платежей (диапазон id) в одной транзакции')
+
+    def handle(self, *args, **options):
+        folded = rebuild(options['batch_size'])
+        self.stdout.write(f'Rebuilt revenue rollups from {folded} paid payments')
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_datetime
+
+from config.users.models import StripeEvent
+from config.users.tasks import process_stripe_event
+
+
+class Command(BaseCommand):
+    help = 'Replays stored Stripe webhook events'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_ids', nargs='*', help='ID событий Stripe (evt_...)')
+        parser.add_argument('--type', help='Только события этого типа')
+        parser.add_argument('--since', help='Полученные не раньше (ISO 8601)')
+        parser.add_argument('--unprocessed', action='store_true', help='Только необработанные')
+        parser.add_argument('--failed', action='store_true', help='Только завершившиеся ошибкой')
+        parser.add_argument('--async', action='store_true', dest='run_async', help='Поставить в очередь Celery')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, что будет обработано')
+
+    def handle(self, *args, **options):
+        events = StripeEvent.objects.order_by('received_at')
+        if options['event_ids']:
+            events = events.filter(event_id__in=options['event_ids'])
+        if options['type']:
+            events = events.filter(type=options['type'])
+        if options['since']:
+            events = events.filter(received_at__gte=parse_datetime(options['since']))
+        if options['unprocessed']:
+            events = events.filter(processed_at__isnull=True)
+        if options['failed']:
+            events = events.exclude(error='')
+
+        replayed = updated = 0
+        for event_pk, event_id, event_type in events.values_list('pk', 'event_id', 'type').iterator():
+            self.stdout.write(f'{event_id} {event_type}')
+            if options['dry_run']:
+                continue
+            if options['run_async']:
+                process_stripe_event.delay(event_pk, force=True)
+            else:
+                result = process_stripe_event.apply(args=(event_pk,), kwargs={'force': True})
+                if result.failed():
+                    self.stderr.write(f'{event_id}: {result.result}')
+                    continue
+                updated += result.result
+            replayed += 1
+
+        message = f'Replayed {replayed} events'
+        if not options['run_async']:
+            message += f', {updated} payments updated'
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-18 05:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='payment_url',
+            field=models.URLField(blank=True, max_length=1000, verbose_name='Ссылка на оплату'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Ожидает оплаты'), ('paid', 'Оплачен'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Статус'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='stripe_price_id',
+            field=models.CharField(blank=True, max_length=255, verbose_name='ID цены в Stripe'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='stripe_session_id',
+            field=models.CharField(blank=True, max_length=255, verbose_name='ID сессии Stripe'),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='payment_method',
+            field=models.CharField(choices=[('cash', 'Наличные'), ('transfer', 'Перевод на счет'), ('card', 'Картой (Stripe)')], max_length=10, verbose_name='Способ оплаты'),
+        ),
+    ]
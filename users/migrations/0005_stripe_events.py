@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-18 05:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_stripe_price_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=255, unique=True, verbose_name='ID события')),
+                ('type', models.CharField(max_length=100, verbose_name='Тип')),
+                ('payload', models.JSONField(verbose_name='Данные события')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='Получено')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Обработано')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка обработки')),
+            ],
+            options={
+                'verbose_name': 'Событие Stripe',
+                'verbose_name_plural': 'События Stripe',
+                'ordering': ['received_at'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='stripe_session_id',
+            field=models.CharField(blank=True, db_index=True, max_length=255, verbose_name='ID сессии Stripe'),
+        ),
+    ]
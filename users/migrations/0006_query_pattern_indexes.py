@@ -0,0 +1,58 @@
+# Generated by Django 5.2 on 2026-10-18 06:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def zero_negative_amounts(apps, schema_editor):
+    # Отрицательная сумма - ошибочная запись (возвраты так не хранятся); иначе ограничение не создастся
+    Payment = apps.get_model('users', 'Payment')
+    Payment.objects.filter(amount__lt=0).update(amount=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms', '0006_query_pattern_indexes'),
+        ('users', '0005_stripe_events'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['last_login'], name='user_active_last_login_idx'),
+        ),
+        # Сначала составные индексы, потом удаление покрытых ими индексов внешних ключей
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['user', 'payment_date', 'id'], name='payment_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['paid_course', 'payment_date', 'id'], name='payment_course_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['payment_method', 'payment_date', 'id'], name='payment_method_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['payment_date'], name='payment_pending_date_idx'),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='paid_course',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payments', to='lms.course', verbose_name='Оплаченный курс'),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='payments', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.RunPython(zero_negative_amounts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='payment',
+            constraint=models.CheckConstraint(condition=models.Q(('amount__gte', 0)), name='payment_amount_non_negative'),
+        ),
+    ]
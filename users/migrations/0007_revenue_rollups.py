@@ -0,0 +1,79 @@
+# Generated by Django 5.2 on 2026-10-18 07:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lms', '0006_query_pattern_indexes'),
+        ('users', '0006_query_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Имя')),
+                ('last_payment_id', models.BigIntegerField(default=0, verbose_name='Последний учтённый платёж')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Отметка свёртки',
+                'verbose_name_plural': 'Отметки свёртки',
+            },
+        ),
+        migrations.CreateModel(
+            name='PaymentMethodDailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сумма')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Число платежей')),
+                ('payment_method', models.CharField(choices=[('cash', 'Наличные'), ('transfer', 'Перевод на счет'), ('card', 'Картой (Stripe)')], max_length=10, verbose_name='Способ оплаты')),
+            ],
+            options={
+                'verbose_name': 'Выручка по способу оплаты за день',
+                'verbose_name_plural': 'Выручка по способам оплаты и дням',
+                'ordering': ['day'],
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('day', 'payment_method'), name='method_revenue_day_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='CourseDailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сумма')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Число платежей')),
+                ('course', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_revenue', to='lms.course', verbose_name='Курс')),
+            ],
+            options={
+                'verbose_name': 'Выручка курса за день',
+                'verbose_name_plural': 'Выручка курсов по дням',
+                'ordering': ['day'],
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('course', 'day'), name='course_revenue_day_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LessonDailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сумма')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Число платежей')),
+                ('lesson', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_revenue', to='lms.lesson', verbose_name='Урок')),
+            ],
+            options={
+                'verbose_name': 'Выручка урока за день',
+                'verbose_name_plural': 'Выручка уроков по дням',
+                'ordering': ['day'],
+                'abstract': False,
+                'constraints': [models.UniqueConstraint(fields=('lesson', 'day'), name='lesson_revenue_day_unique')],
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
 from config.lms.models import Course, Lesson
 
@@ -10,6 +11,8 @@ class CustomUser(AbstractUser):
     phone = models.CharField(_('phone number'), max_length=15, blank=True, null=True)
     city = models.CharField(_('city'), max_length=100, blank=True, null=True)
     avatar = models.ImageField(_('avatar'), upload_to='users/avatars/', blank=True, null=True)
+    # Уменьшенные копии avatar для srcset, заполняется задачей generate_image_variants (lms.thumbnails)
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
@@ -17,6 +20,10 @@ class CustomUser(AbstractUser):
     class Meta:
         verbose_name = _('user')
         verbose_name_plural = _('users')
+        indexes = [
+            # Поиск неактивных для деактивации: только активные пользователи, по дате входа
+            models.Index(fields=['last_login'], name='user_active_last_login_idx', condition=Q(is_active=True)),
+        ]
 
     def __str__(self):
         return self.email
@@ -26,12 +33,19 @@ class Payment(models.Model):
     PAYMENT_METHOD_CHOICES = [
         ('cash', 'Наличные'),
         ('transfer', 'Перевод на счет'),
+        ('card', 'Картой (Stripe)'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Ожидает оплаты'),
+        ('paid', 'Оплачен'),
+        ('failed', 'Ошибка'),
     ]
 
     user = models.ForeignKey(
         CustomUser,
         on_delete=models.CASCADE,
         related_name='payments',
+        db_index=False,  # Покрыт индексом payment_user_date_idx
         verbose_name='Пользователь'
     )
     payment_date = models.DateTimeField(
@@ -44,6 +58,7 @@ class Payment(models.Model):
         null=True,
         blank=True,
         related_name='payments',
+        db_index=False,  # Покрыт индексом payment_course_date_idx
         verbose_name='Оплаченный курс'
     )
     paid_lesson = models.ForeignKey(
@@ -64,15 +79,117 @@ class Payment(models.Model):
         choices=PAYMENT_METHOD_CHOICES,
         verbose_name='Способ оплаты'
     )
-    product_id=None
-    price_id=None
-    session_id=None
-    session_url=None
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='pending',
+        verbose_name='Статус'
+    )
+    stripe_price_id = models.CharField(max_length=255, blank=True, verbose_name='ID цены в Stripe')
+    stripe_session_id = models.CharField(max_length=255, blank=True, db_index=True, verbose_name='ID сессии Stripe')
+    payment_url = models.URLField(max_length=1000, blank=True, verbose_name='Ссылка на оплату')
 
     class Meta:
         verbose_name = 'Платеж'
         verbose_name_plural = 'Платежи'
         ordering = ['-payment_date']
+        indexes = [
+            # Keyset-пагинация по (payment_date, id); индекс читается и в обратном порядке
+            models.Index(fields=['payment_date', 'id'], name='payment_date_id_idx'),
+            # Платежи пользователя и фильтры PaymentFilter в том же порядке (-payment_date, -id)
+            models.Index(fields=['user', 'payment_date', 'id'], name='payment_user_date_idx'),
+            models.Index(fields=['paid_course', 'payment_date', 'id'], name='payment_course_date_idx'),
+            models.Index(fields=['payment_method', 'payment_date', 'id'], name='payment_method_date_idx'),
+            # Сверка ожидающих платежей (reconcile_pending_payments): маленький частичный индекс
+            models.Index(fields=['payment_date'], name='payment_pending_date_idx', condition=Q(status='pending')),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=Q(amount__gte=0), name='payment_amount_non_negative'),
+        ]
+
+    def __str__(self):
+        return f"Платеж {self.id} от {self.user.email}"
+
+
+class StripeEvent(models.Model):
+    """Событие вебхука Stripe. Хранится один раз по ID события и обрабатывается в фоне."""
+    event_id = models.CharField('ID события', max_length=255, unique=True)
+    type = models.CharField('Тип', max_length=100)
+    payload = models.JSONField('Данные события')
+    received_at = models.DateTimeField('Получено', auto_now_add=True)
+    processed_at = models.DateTimeField('Обработано', null=True, blank=True)
+    error = models.TextField('Ошибка обработки', blank=True)
+
+    class Meta:
+        verbose_name = 'Событие Stripe'
+        verbose_name_plural = 'События Stripe'
+        ordering = ['received_at']
+
+    def __str__(self):
+        return f'{self.type} ({self.event_id})'
+
+
+class DailyRevenue(models.Model):
+    """Сумма и число оплаченных платежей за день. Заполняется из Payment в users/rollups.py."""
+    day = models.DateField('День')
+    total = models.DecimalField('Сумма', max_digits=14, decimal_places=2, default=0)
+    count = models.PositiveIntegerField('Число платежей', default=0)
+
+    class Meta:
+        abstract = True
+        ordering = ['day']
+
+
+class CourseDailyRevenue(DailyRevenue):
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name='daily_revenue',
+        db_index=False,  # Покрыт ограничением course_revenue_day_unique
+        verbose_name='Курс'
+    )
+
+    class Meta(DailyRevenue.Meta):
+        verbose_name = 'Выручка курса за день'
+        verbose_name_plural = 'Выручка курсов по дням'
+        constraints = [models.UniqueConstraint(fields=['course', 'day'], name='course_revenue_day_unique')]
+
+
+class LessonDailyRevenue(DailyRevenue):
+    lesson = models.ForeignKey(
+        Lesson,
+        on_delete=models.CASCADE,
+        related_name='daily_revenue',
+        db_index=False,  # Покрыт ограничением lesson_revenue_day_unique
+        verbose_name='Урок'
+    )
+
+    class Meta(DailyRevenue.Meta):
+        verbose_name = 'Выручка урока за день'
+        verbose_name_plural = 'Выручка уроков по дням'
+        constraints = [models.UniqueConstraint(fields=['lesson', 'day'], name='lesson_revenue_day_unique')]
+
+
+class PaymentMethodDailyRevenue(DailyRevenue):
+    payment_method = models.CharField('Способ оплаты', max_length=10, choices=Payment.PAYMENT_METHOD_CHOICES)
+
+    class Meta(DailyRevenue.Meta):
+        verbose_name = 'Выручка по способу оплаты за день'
+        verbose_name_plural = 'Выручка по способам оплаты и дням'
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'payment_method'], name='method_revenue_day_unique'),
+        ]
+
+
+class RollupWatermark(models.Model):
+    """До какого платежа (по id) свёрнуты таблицы выручки"""
+    name = models.CharField('Имя', max_length=50, unique=True)
+    last_payment_id = models.BigIntegerField('Последний учтённый платёж', default=0)
+    updated_at = models.DateTimeField('Обновлено', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Отметка свёртки'
+        verbose_name_plural = 'Отметки свёртки'
 
     def __str__(self):
-        return f"Платеж {self.id} от {self.user.email}"
\ No newline at end of file
+        return f'{self.name}: {self.last_payment_id}'
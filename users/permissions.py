@@ -1,8 +1,11 @@
 from rest_framework import permissions
 
+from .roles import is_moderator
+
+
 class IsModerator(permissions.BasePermission):
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='moderators').exists()
+        return is_moderator(request)
 
 class IsOwner(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
@@ -10,6 +13,6 @@ class IsOwner(permissions.BasePermission):
 
 class IsOwnerOrModerator(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
-        if request.user.groups.filter(name='moderators').exists():
+        if is_moderator(request):
             return True
-        return obj.owner == request.user
\ No newline at end of file
+        return obj.owner == request.user
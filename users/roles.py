@@ -0,0 +1,39 @@
+from django.core.cache import cache
+
+ROLES_CACHE_TIMEOUT = 60 * 5
+MODERATORS_GROUP = 'moderators'
+
+
+def roles_cache_key(user_id):
+    return f'users:{user_id}:roles'
+
+
+def load_roles(user):
+    """Названия групп пользователя: из кэша с коротким TTL, при промахе - из БД.
+
+    Кэш сбрасывается сигналами при изменении групп пользователя.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    key = roles_cache_key(user.pk)
+    roles = cache.get(key)
+    if roles is None:
+        roles = frozenset(user.groups.values_list('name', flat=True))
+        cache.set(key, roles, ROLES_CACHE_TIMEOUT)
+    return roles
+
+
+def get_roles(request):
+    """Роли текущего пользователя, вычисленные один раз за запрос"""
+    roles = getattr(request, '_roles', None)
+    if roles is None:
+        roles = request._roles = load_roles(request.user)
+    return roles
+
+
+def is_moderator(request):
+    return MODERATORS_GROUP in get_roles(request)
+
+
+def invalidate_roles(user_ids):
+    cache.delete_many([roles_cache_key(user_id) for user_id in user_ids])
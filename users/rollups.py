@@ -0,0 +1,166 @@
+"""Таблицы дневной выручки по курсам, урокам и способам оплаты (наследники DailyRevenue).
+
+Задача ``refresh_revenue_rollups`` сворачивает оплаченные платежи с id больше отметки RollupWatermark.
+Платёж, который стал оплаченным уже после того, как свёртка прошла его id, добавляется в выручку
+при смене статуса (``mark_paid``). Обе операции держат блокировку строки отметки, поэтому платёж
+не учитывается дважды. Расхождения (правки и удаления платежей в админке) чинит
+команда ``rebuild_revenue_rollups``.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import CourseDailyRevenue, LessonDailyRevenue, Payment, PaymentMethodDailyRevenue, RollupWatermark
+
+REVENUE_STATUS = 'paid'
+WATERMARK_NAME = 'revenue'
+FOLD_BATCH_SIZE = 50_000  # Платежей (диапазон id) в одной транзакции свёртки
+# Платежи моложе этого не сворачиваются: транзакция, которая их вставляет, может быть ещё не завершена,
+# а id из последовательности уже выдан
+FOLD_LAG = timedelta(minutes=1)
+
+# Таблица выручки, её поле ключа и поле платежа
+ROLLUPS = (
+    (CourseDailyRevenue, 'course', 'paid_course'),
+    (LessonDailyRevenue, 'lesson', 'paid_lesson'),
+    (PaymentMethodDailyRevenue, 'payment_method', 'payment_method'),
+)
+
+
+def lock_watermark():
+    """Отметка свёртки под блокировкой до конца транзакции"""
+    watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK_NAME)
+    return watermark
+
+
+def aggregate(payments):
+    """{(таблица, ключ, день): [сумма, число]} по оплаченным платежам одним запросом"""
+    rows = payments.filter(status=REVENUE_STATUS).order_by() \
+        .values('paid_course', 'paid_lesson', 'payment_method', day=TruncDate('payment_date')) \
+        .annotate(total=Sum('amount'), count=Count('pk'))
+    deltas = defaultdict(lambda: [Decimal(0), 0])
+    for row in rows:
+        for model, _, source in ROLLUPS:
+            if row[source] is not None:
+                delta = deltas[model, row[source], row['day']]
+                delta[0] += row['total']
+                delta[1] += row['count']
+    return deltas
+
+
+def apply(deltas):
+    """Прибавляет приращения к строкам таблиц выручки, недостающие строки создаёт.
+
+    Вызывается под блокировкой отметки: чтение и запись строк не пересекаются с другой свёрткой.
+    """
+    by_model = defaultdict(dict)
+    for (model, key, day), value in deltas.items():
+        by_model[model][key, day] = value
+    for model, field, _ in ROLLUPS:
+        values = by_model.get(model)
+        if not values:
+            continue
+        key_field = model._meta.get_field(field).attname
+        existing = model.objects.filter(**{
+            f'{key_field}__in': {key for key, _ in values},
+            'day__in': {day for _, day in values},
+        })
+        changed = []
+        for row in existing:
+            value = values.pop((getattr(row, key_field), row.day), None)
+            if value is not None:
+                row.total += value[0]
+                row.count += value[1]
+                changed.append(row)
+        model.objects.bulk_update(changed, ['total', 'count'], batch_size=1000)
+        model.objects.bulk_create([
+            model(day=day, total=total, count=count, **{key_field: key})
+            for (key, day), (total, count) in values.items()
+        ], batch_size=1000)
+
+
+def fold(batch_size=FOLD_BATCH_SIZE):
+    """Сворачивает платежи новее отметки пачками по диапазону id. Возвращает число учтённых платежей."""
+    # Последний платёж старше FOLD_LAG - по индексу (payment_date, id), без прохода по таблице
+    max_id = Payment.objects.filter(payment_date__lt=timezone.now() - FOLD_LAG) \
+        .order_by('-payment_date', '-id').values_list('pk', flat=True).first() or 0
+    folded = 0
+    while True:
+        with transaction.atomic():
+            watermark = lock_watermark()
+            if watermark.last_payment_id >= max_id:
+                return folded
+            upper = min(watermark.last_payment_id + batch_size, max_id)
+            deltas = aggregate(Payment.objects.filter(pk__gt=watermark.last_payment_id, pk__lte=upper))
+            apply(deltas)
+            watermark.last_payment_id = upper
+            watermark.save(update_fields=['last_payment_id', 'updated_at'])
+        # Способ оплаты есть у каждого платежа: его строки покрывают все учтённые платежи
+        folded += sum(count for (model, _, _), (_, count) in deltas.items() if model is PaymentMethodDailyRevenue)
+
+
+def mark_paid(payments):
+    """Переводит платежи в оплаченные. Возвращает число изменённых платежей.
+
+    Платежи, id которых свёртка уже прошла, сразу добавляются в выручку.
+    """
+    with transaction.atomic():
+        watermark = lock_watermark()
+        ids = list(payments.select_for_update().values_list('pk', flat=True))
+        updated = Payment.objects.filter(pk__in=ids).update(status=REVENUE_STATUS)
+        folded_ids = [pk for pk in ids if pk <= watermark.last_payment_id]
+        if folded_ids:
+            apply(aggregate(Payment.objects.filter(pk__in=folded_ids)))
+    return updated
+
+
+def rebuild(batch_size=FOLD_BATCH_SIZE):
+    """Пересобирает таблицы выручки из платежей. Пока идёт свёртка, суммы неполные."""
+    with transaction.atomic():
+        watermark = lock_watermark()
+        for model, _, _ in ROLLUPS:
+            model.objects.all().delete()
+        watermark.last_payment_id = 0
+        watermark.save(update_fields=['last_payment_id', 'updated_at'])
+    return fold(batch_size)
+
+
+def report(date_from, date_to, course=None, lesson=None, payment_method=None):
+    """Итог, число платежей и ряд по дням за период. Читает не больше строк, чем дней на способы оплаты."""
+    by_method = course is None and lesson is None
+    if course is not None:
+        rows = CourseDailyRevenue.objects.filter(course_id=course)
+    elif lesson is not None:
+        rows = LessonDailyRevenue.objects.filter(lesson_id=lesson)
+    else:
+        rows = PaymentMethodDailyRevenue.objects.all()
+        if payment_method is not None:
+            rows = rows.filter(payment_method=payment_method)
+    fields = ['day', 'total', 'count', 'payment_method'] if by_method else ['day', 'total', 'count']
+    rows = rows.filter(day__range=(date_from, date_to)).values_list(*fields)
+
+    series = {date_from + timedelta(days=n): [Decimal(0), 0] for n in range((date_to - date_from).days + 1)}
+    methods = defaultdict(Decimal)
+    for day, total, count, *method in rows:
+        series[day][0] += total
+        series[day][1] += count
+        if method:
+            methods[method[0]] += total
+
+    result = {
+        'date_from': date_from,
+        'date_to': date_to,
+        'total': sum(total for total, _ in series.values()),
+        'count': sum(count for _, count in series.values()),
+        'series': [{'day': day, 'total': total, 'count': count} for day, (total, count) in series.items()],
+        'updated_at': RollupWatermark.objects.filter(name=WATERMARK_NAME)
+        .values_list('updated_at', flat=True).first(),
+    }
+    if by_method:
+        result['by_payment_method'] = dict(methods)
+    return result
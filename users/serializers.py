@@ -1,11 +1,15 @@
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.serializers import ModelSerializer
 
 from .models import Payment
-from config.lms.serializers import CourseSerializer, LessonSerializer
+from config.lms.serializers import CourseSerializer, ImageVariantsField, LessonSerializer
 from django.contrib.auth.password_validation import validate_password
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from .models import CustomUser
+from .roles import load_roles
 
 
 class PaymentSerializer(serializers.ModelSerializer):
@@ -16,13 +20,15 @@ class PaymentSerializer(serializers.ModelSerializer):
         model = Payment
         fields = [
             'id', 'user', 'payment_date', 'paid_course',
-            'paid_lesson', 'amount', 'payment_method'
+            'paid_lesson', 'amount', 'payment_method', 'status'
         ]
 
 class UserSerializer(serializers.ModelSerializer):
+    avatar_srcset = ImageVariantsField('avatar')
+
     class Meta:
         model = CustomUser
-        fields = ['id', 'email', 'phone', 'city', 'avatar']
+        fields = ['id', 'email', 'phone', 'city', 'avatar', 'avatar_srcset']
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
@@ -52,9 +58,50 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     def get_token(cls, user):
         token = super().get_token(user)
         token['email'] = user.email
+        # Для клиентов; права на сервере проверяются по кэшу ролей, клейм до истечения токена не отзывается
+        token['roles'] = sorted(load_roles(user))
         return token
 
 class PaymentSerializer(ModelSerializer):
     class Meta:
         model = Payment
         fields = '__all__'
+
+
+class RevenueQuerySerializer(serializers.Serializer):
+    """Параметры отчёта о выручке: период и не больше одного ключа"""
+    MAX_DAYS = 366
+
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    course = serializers.IntegerField(required=False, min_value=1)
+    lesson = serializers.IntegerField(required=False, min_value=1)
+    payment_method = serializers.ChoiceField(choices=Payment.PAYMENT_METHOD_CHOICES, required=False)
+
+    def validate(self, attrs):
+        if len({'course', 'lesson', 'payment_method'} & set(attrs)) > 1:
+            raise serializers.ValidationError('Укажите только один из параметров course, lesson, payment_method')
+        date_to = attrs.setdefault('date_to', timezone.localdate())
+        date_from = attrs.setdefault('date_from', date_to - timedelta(days=29))
+        if date_from > date_to:
+            raise serializers.ValidationError({'date_from': 'Начало периода позже конца'})
+        if (date_to - date_from).days >= self.MAX_DAYS:
+            raise serializers.ValidationError({'date_from': f'Период не длиннее {self.MAX_DAYS} дней'})
+        return attrs
+
+
+class RevenuePointSerializer(serializers.Serializer):
+    day = serializers.DateField()
+    total = serializers.DecimalField(max_digits=14, decimal_places=2)
+    count = serializers.IntegerField()
+
+
+class RevenueSerializer(serializers.Serializer):
+    date_from = serializers.DateField()
+    date_to = serializers.DateField()
+    total = serializers.DecimalField(max_digits=16, decimal_places=2)
+    count = serializers.IntegerField()
+    series = RevenuePointSerializer(many=True)
+    by_payment_method = serializers.DictField(child=serializers.DecimalField(max_digits=16, decimal_places=2),
+                                              required=False)
+    updated_at = serializers.DateTimeField(allow_null=True)
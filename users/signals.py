@@ -0,0 +1,43 @@
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from config.lms.tasks import schedule_image_variants
+from config.lms.thumbnails import reset_stale_variants
+from .models import CustomUser
+from .roles import invalidate_roles
+
+
+@receiver(m2m_changed, sender=CustomUser.groups.through)
+def invalidate_roles_on_groups_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # После очистки со стороны группы список участников уже не получить
+        instance._cleared_user_ids = list(instance.user_set.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_roles([instance.pk])
+    elif action == 'post_clear':
+        invalidate_roles(getattr(instance, '_cleared_user_ids', []))
+    else:
+        invalidate_roles(pk_set)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_roles_on_group_change(sender, instance, **kwargs):
+    # Переименование или удаление группы меняет роли всех её участников
+    if instance.pk:
+        invalidate_roles(instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(pre_save, sender=CustomUser)
+def reset_avatar_variants(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        reset_stale_variants(instance, 'avatar', update_fields)
+
+
+@receiver(post_save, sender=CustomUser)
+def build_avatar_variants(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        schedule_image_variants(instance, 'avatar', update_fields)
@@ -1,32 +1,190 @@
 from celery import shared_task
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Max
 from django.utils import timezone
 from datetime import timedelta
 import logging
+import time
+
+from config.lms.services.stripe_service import get_stripe_session
+from .models import Payment, StripeEvent
+from .rollups import REVENUE_STATUS, fold, mark_paid
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
 
+# Деактивация идёт диапазонами первичного ключа: каждый UPDATE - короткая транзакция,
+# блокировки строк и WAL не копятся на всю таблицу; между пачками - пауза для остальной нагрузки
+DEACTIVATION_BATCH_SIZE = 5_000
+DEACTIVATION_BATCH_PAUSE_SECONDS = 0.1
+DEACTIVATION_CHECKPOINT_TIMEOUT = 60 * 60 * 24
+
+
+def deactivation_checkpoint_key(task_id):
+    # Ключ на запуск: retry сохраняет id задачи и продолжает, следующий запуск по расписанию начинает заново
+    return f'users:deactivate_inactive_users:checkpoint:{task_id}'
+
+
+def inactive_users(cutoff_date):
+    return User.objects.filter(is_active=True, last_login__lt=cutoff_date)
+
+
+def deactivation_batches(cutoff_date, batch_size, after_pk=0):
+    """Деактивирует пользователей диапазонами ``(after_pk, after_pk + batch_size]``.
+
+    Отдаёт (верхняя граница диапазона, число деактивированных) после каждого UPDATE.
+    """
+    max_pk = User.objects.aggregate(max_pk=Max('pk'))['max_pk'] or 0
+    while after_pk < max_pk:
+        upper_pk = after_pk + batch_size
+        count = inactive_users(cutoff_date).filter(pk__gt=after_pk, pk__lte=upper_pk).update(is_active=False)
+        yield upper_pk, count
+        after_pk = upper_pk
+
+
 @shared_task(bind=True, max_retries=3)
-def deactivate_inactive_users(self, months_inactive=6):
+def deactivate_inactive_users(self, months_inactive=6, batch_size=DEACTIVATION_BATCH_SIZE,
+                              pause=DEACTIVATION_BATCH_PAUSE_SECONDS):
     """
     Деактивирует пользователей, не проявлявших активность более X месяцев
     :param months_inactive: количество месяцев неактивности для деактивации
+    :param batch_size: ширина диапазона id в одном UPDATE; 0 - одним UPDATE по всей таблице
+    :param pause: пауза между пачками, секунды
     """
     try:
-        cutoff_date = timezone.now() - timedelta(days=months_inactive * 30)
+        if not batch_size:
+            cutoff_date = timezone.now() - timedelta(days=months_inactive * 30)
+            count = inactive_users(cutoff_date).update(is_active=False)
+            logger.info(f"Deactivated {count} inactive users (last login before {cutoff_date})")
+            return f"Deactivated {count} inactive users"
 
-        inactive_users = User.objects.filter(
-            is_active=True,
-            last_login__lt=cutoff_date
-        )
+        # После retry продолжаем с последней пройденной пачки с той же датой отсечения
+        checkpoint_key = deactivation_checkpoint_key(self.request.id)
+        checkpoint = cache.get(checkpoint_key)
+        if checkpoint is None or checkpoint['months_inactive'] != months_inactive:
+            checkpoint = {
+                'months_inactive': months_inactive,
+                'cutoff_date': timezone.now() - timedelta(days=months_inactive * 30),
+                'last_pk': 0,
+                'total': 0,
+            }
+        elif checkpoint['last_pk']:
+            logger.info(f"Resuming deactivation after id {checkpoint['last_pk']}")
 
-        count = inactive_users.update(is_active=False)
+        cutoff_date = checkpoint['cutoff_date']
+        for upper_pk, count in deactivation_batches(cutoff_date, batch_size, checkpoint['last_pk']):
+            logger.info(f"Deactivated {count} inactive users with id in ({checkpoint['last_pk']}, {upper_pk}]")
+            checkpoint['last_pk'] = upper_pk
+            checkpoint['total'] += count
+            cache.set(checkpoint_key, checkpoint, DEACTIVATION_CHECKPOINT_TIMEOUT)
+            if pause:
+                time.sleep(pause)
 
-        logger.info(f"Deactivated {count} inactive users (last login before {cutoff_date})")
-        return f"Deactivated {count} inactive users"
+        cache.delete(checkpoint_key)
+        logger.info(f"Deactivated {checkpoint['total']} inactive users (last login before {cutoff_date})")
+        return f"Deactivated {checkpoint['total']} inactive users"
 
     except Exception as e:
         logger.error(f"Error deactivating users: {e}")
-        self.retry(exc=e, countdown=60)
\ No newline at end of file
+        self.retry(exc=e, countdown=60)
+
+
+# Событие Stripe -> статус платежа. checkout.session.completed означает оплату,
+# только если деньги уже списаны: при отложенных способах оплаты придёт async_payment_*
+SESSION_EVENT_STATUSES = {
+    'checkout.session.async_payment_succeeded': 'paid',
+    'checkout.session.async_payment_failed': 'failed',
+    'checkout.session.expired': 'failed',
+}
+
+# Из каких статусов допустим переход: оплаченный платёж не откатывается поздним или повторным событием
+ALLOWED_TRANSITIONS = {
+    'paid': ['pending', 'failed'],
+    'failed': ['pending'],
+}
+
+# Платежи без вебхука сверяются со Stripe не раньше чем через столько минут после создания
+RECONCILE_AFTER_MINUTES = 15
+# Сессия Stripe Checkout живёт не дольше суток, более старые платежи уже не изменятся
+RECONCILE_WINDOW_HOURS = 24
+RECONCILE_BATCH_SIZE = 100
+
+
+def event_payment_status(event_type, session):
+    if event_type == 'checkout.session.completed':
+        return 'paid' if session.get('payment_status') == 'paid' else None
+    return SESSION_EVENT_STATUSES.get(event_type)
+
+
+def session_payment_status(session):
+    if session.payment_status == 'paid':
+        return 'paid'
+    if session.status == 'expired':
+        return 'failed'
+    return None
+
+
+def apply_payment_status(session_id, new_status):
+    """Атомарно переводит платеж по сессии Stripe в новый статус. Возвращает число изменённых платежей."""
+    payments = Payment.objects.filter(
+        stripe_session_id=session_id,
+        status__in=ALLOWED_TRANSITIONS[new_status],
+    )
+    if new_status == REVENUE_STATUS:
+        return mark_paid(payments)  # Заодно учитывает платёж в таблицах выручки
+    return payments.update(status=new_status)
+
+
+@shared_task(bind=True, max_retries=5)
+def process_stripe_event(self, event_pk, force=False):
+    """Применяет сохранённое событие вебхука к платежу. force=True - повторная обработка (replay)."""
+    event = StripeEvent.objects.get(pk=event_pk)
+    if event.processed_at and not force:
+        return 0
+
+    try:
+        session = event.payload['data']['object']
+        new_status = event_payment_status(event.type, session)
+        updated = apply_payment_status(session['id'], new_status) if new_status else 0
+    except Exception as e:
+        logger.error(f"Error processing Stripe event {event.event_id}: {e}")
+        StripeEvent.objects.filter(pk=event.pk).update(error=str(e))
+        raise self.retry(exc=e, countdown=30)
+
+    StripeEvent.objects.filter(pk=event.pk).update(processed_at=timezone.now(), error='')
+    return updated
+
+
+@shared_task(bind=True, max_retries=3)
+def reconcile_pending_payments(self):
+    """Сверяет со Stripe ожидающие платежи, по которым не пришёл вебхук"""
+    now = timezone.now()
+    session_ids = Payment.objects.filter(
+        status='pending',
+        payment_date__lt=now - timedelta(minutes=RECONCILE_AFTER_MINUTES),
+        payment_date__gte=now - timedelta(hours=RECONCILE_WINDOW_HOURS),
+    ).exclude(stripe_session_id='').values_list('stripe_session_id', flat=True)[:RECONCILE_BATCH_SIZE]
+
+    updated = 0
+    for session_id in session_ids:
+        try:
+            session = get_stripe_session(session_id)
+        except Exception as e:
+            logger.error(f"Error retrieving Stripe session {session_id}: {e}")
+            continue
+        new_status = session_payment_status(session)
+        if new_status:
+            updated += apply_payment_status(session_id, new_status)
+
+    logger.info(f"Reconciled {updated} pending payments")
+    return updated
+
+
+@shared_task
+def refresh_revenue_rollups():
+    """Добавляет в таблицы дневной выручки платежи, появившиеся после прошлой свёртки"""
+    folded = fold()
+    logger.info(f"Folded {folded} paid payments into revenue rollups")
+    return folded
@@ -1,3 +1,492 @@
-from django.test import TestCase
+import csv
+import hashlib
+import hmac
+import io
+import json
+import time
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from benchmarks.stripe_server import LocalStripeServer
+from config.lms.models import Course
+from config.lms.services import stripe_service
+from config.users import rollups, tasks
+from config.users.models import CourseDailyRevenue, CustomUser, Payment, StripeEvent
+from config.users.roles import get_roles, is_moderator, load_roles
+from config.users.serializers import CustomTokenObtainPairSerializer
+
+
+class RolesCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(email='roles@example.com', password='rolespass')
+        self.moderators = Group.objects.create(name='moderators')
+
+    def test_roles_resolved_once_per_request(self):
+        request = SimpleNamespace(user=self.user)
+        with self.assertNumQueries(1):
+            self.assertFalse(is_moderator(request))
+            self.assertFalse(is_moderator(request))
+
+    def test_roles_cached_between_requests(self):
+        load_roles(self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_roles(SimpleNamespace(user=self.user)), frozenset())
+
+    def test_groups_add_and_remove_invalidate_cache(self):
+        load_roles(self.user)
+        self.user.groups.add(self.moderators)
+        self.assertTrue(is_moderator(SimpleNamespace(user=self.user)))
+        self.user.groups.remove(self.moderators)
+        self.assertFalse(is_moderator(SimpleNamespace(user=self.user)))
+
+    def test_group_side_changes_invalidate_cache(self):
+        load_roles(self.user)
+        self.moderators.user_set.add(self.user)
+        self.assertTrue(is_moderator(SimpleNamespace(user=self.user)))
+        self.moderators.user_set.clear()
+        self.assertFalse(is_moderator(SimpleNamespace(user=self.user)))
+
+    def test_group_rename_invalidates_cache(self):
+        self.user.groups.add(self.moderators)
+        self.assertTrue(is_moderator(SimpleNamespace(user=self.user)))
+        self.moderators.name = 'editors'
+        self.moderators.save()
+        self.assertFalse(is_moderator(SimpleNamespace(user=self.user)))
+
+    def test_token_carries_roles_claim(self):
+        self.user.groups.add(self.moderators)
+        token = CustomTokenObtainPairSerializer.get_token(self.user)
+        self.assertEqual(token['roles'], ['moderators'])
+
+
+WEBHOOK_SECRET = 'whsec_test'
+
+
+def stripe_event(event_id, event_type, session_id, payment_status='paid'):
+    return json.dumps({
+        'id': event_id,
+        'object': 'event',
+        'type': event_type,
+        'data': {'object': {'id': session_id, 'object': 'checkout.session', 'payment_status': payment_status}},
+    })
+
+
+def sign(payload, secret=WEBHOOK_SECRET):
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+class StripeWebhookTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(email='payer@example.com')
+        self.payment = Payment.objects.create(
+            user=self.user, amount=100, payment_method='card', stripe_session_id='cs_1'
+        )
+
+    def post_event(self, payload, signature=None):
+        return self.client.post(
+            reverse('stripe-webhook'),
+            payload,
+            content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=signature or sign(payload),
+        )
+
+    def test_signed_event_stored_and_applied(self):
+        with mock.patch.object(tasks.process_stripe_event, 'delay', side_effect=tasks.process_stripe_event) as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.post_event(stripe_event('evt_1', 'checkout.session.completed', 'cs_1'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        delay.assert_called_once()
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'paid')
+        self.assertIsNotNone(StripeEvent.objects.get(event_id='evt_1').processed_at)
+
+    def test_invalid_signature_rejected(self):
+        payload = stripe_event('evt_1', 'checkout.session.completed', 'cs_1')
+        response = self.post_event(payload, signature=sign(payload, secret='whsec_other'))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(StripeEvent.objects.exists())
+
+    def test_duplicate_delivery_processed_once(self):
+        payload = stripe_event('evt_1', 'checkout.session.completed', 'cs_1')
+        with mock.patch.object(tasks.process_stripe_event, 'delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.post_event(payload)
+            response = self.post_event(payload)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(StripeEvent.objects.count(), 1)
+        delay.assert_called_once()
+
+    def test_late_failure_does_not_revert_paid_payment(self):
+        self.payment.status = 'paid'
+        self.payment.save()
+        event = StripeEvent.objects.create(
+            event_id='evt_2',
+            type='checkout.session.expired',
+            payload=json.loads(stripe_event('evt_2', 'checkout.session.expired', 'cs_1', 'unpaid')),
+        )
+
+        tasks.process_stripe_event.apply(args=(event.pk,))
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'paid')
+
+    def test_replay_reapplies_stored_events(self):
+        event = StripeEvent.objects.create(
+            event_id='evt_3',
+            type='checkout.session.async_payment_succeeded',
+            payload=json.loads(stripe_event('evt_3', 'checkout.session.async_payment_succeeded', 'cs_1')),
+        )
+        tasks.process_stripe_event.apply(args=(event.pk,))
+        Payment.objects.filter(pk=self.payment.pk).update(status='pending')
+
+        call_command('replay_stripe_events', 'evt_3', stdout=mock.Mock())
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'paid')
+
+
+class PaymentStatusTests(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stripe = cls.enterClassContext(LocalStripeServer())
+        cls.enterClassContext(cls.stripe.settings())
+
+    def setUp(self):
+        self.stripe.reset()
+        self.user = CustomUser.objects.create(email='payer@example.com')
+        self.session = self.stripe.create('checkout.session', 'cs', {})
+        self.payment = Payment.objects.create(
+            user=self.user, amount=100, payment_method='card', stripe_session_id=self.session['id']
+        )
+
+    def test_status_answered_from_database(self):
+        self.client.force_authenticate(user=self.user)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('payment-status', kwargs={'pk': self.payment.pk}))
+
+        self.assertEqual(response.data, {'payment_id': self.payment.pk, 'status': 'pending'})
+        self.assertEqual(self.stripe.total_calls, 0)
+
+    def test_reconcile_applies_stripe_state(self):
+        Payment.objects.filter(pk=self.payment.pk).update(
+            payment_date=self.payment.payment_date - timedelta(minutes=tasks.RECONCILE_AFTER_MINUTES + 1)
+        )
+        self.session['payment_status'] = 'paid'
+
+        self.assertEqual(tasks.reconcile_pending_payments.apply().get(), 1)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'paid')
+
+
+class DeactivateInactiveUsersTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        stale_login = timezone.now() - timedelta(days=200)
+        self.stale = [
+            CustomUser.objects.create(email=f'stale{i}@example.com', last_login=stale_login) for i in range(5)
+        ]
+        self.recent = CustomUser.objects.create(email='recent@example.com', last_login=timezone.now())
+
+    def assertDeactivated(self, users):
+        active = set(CustomUser.objects.filter(is_active=True).values_list('pk', flat=True))
+        self.assertFalse(active & {user.pk for user in users})
+        self.assertIn(self.recent.pk, active)
+
+    def deactivate(self, task_id='run-1'):
+        return tasks.deactivate_inactive_users.apply(kwargs={'batch_size': 2, 'pause': 0}, task_id=task_id).get()
+
+    def save_checkpoint(self, task_id, cutoff_date, last_pk):
+        cache.set(tasks.deactivation_checkpoint_key(task_id), {
+            'months_inactive': 6,
+            'cutoff_date': cutoff_date,
+            'last_pk': last_pk,
+            'total': 2,
+        })
+
+    def test_batches_by_primary_key_ranges(self):
+        with self.assertLogs(tasks.logger, 'INFO') as logs:
+            result = self.deactivate()
+
+        self.assertEqual(result, 'Deactivated 5 inactive users')
+        self.assertDeactivated(self.stale)
+        self.assertGreaterEqual(sum('with id in' in line for line in logs.output), 3)
+        self.assertIsNone(cache.get(tasks.deactivation_checkpoint_key('run-1')))
+
+    def test_resumes_from_checkpoint(self):
+        last_pk = self.stale[1].pk
+        self.save_checkpoint('run-1', timezone.now() - timedelta(days=180), last_pk)
+
+        result = self.deactivate('run-1')
+
+        self.assertEqual(result, 'Deactivated 5 inactive users')
+        self.assertDeactivated(self.stale[2:])
+        self.assertEqual(
+            set(CustomUser.objects.filter(pk__lte=last_pk, is_active=True).values_list('pk', flat=True)),
+            {self.stale[0].pk, self.stale[1].pk},
+        )
+
+    def test_next_run_ignores_failed_run_checkpoint(self):
+        # Вчерашний запуск упал после второй пачки: его дата отсечения раньше, чем вход сегодняшних пользователей
+        self.save_checkpoint('yesterday', timezone.now() - timedelta(days=181 + 30), self.stale[1].pk)
+
+        result = self.deactivate('today')
+
+        self.assertEqual(result, 'Deactivated 5 inactive users')
+        self.assertDeactivated(self.stale)
+
+    def test_single_statement_mode(self):
+        with self.assertNumQueries(1):
+            result = tasks.deactivate_inactive_users.apply(kwargs={'batch_size': 0}).get()
+
+        self.assertEqual(result, 'Deactivated 5 inactive users')
+        self.assertDeactivated(self.stale)
+
+
+class PaymentExportTests(APITestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser(email='finance@example.com', password='financepass')
+        self.user = CustomUser.objects.create(email='buyer@example.com')
+        self.course = Course.objects.create(title='Курс, "с запятой"', price=Decimal('500.00'))
+        self.course_payment = Payment.objects.create(
+            user=self.user, paid_course=self.course, amount=Decimal('500.00'), payment_method='card'
+        )
+        self.cash_payment = Payment.objects.create(user=self.user, amount=Decimal('10.50'), payment_method='cash')
+        self.client.force_authenticate(user=self.admin)
+
+    def export(self, query):
+        response = self.client.get(reverse('payment-export') + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv_streamed_in_one_query(self):
+        response = self.client.get(reverse('payment-export') + '?format=csv')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+
+        with self.assertNumQueries(1):
+            rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+        self.assertEqual(rows[0][:4], ['id', 'payment_date', 'user_id', 'user_email'])
+        self.assertEqual([row[0] for row in rows[1:]], [str(self.cash_payment.pk), str(self.course_payment.pk)])
+        self.assertEqual(rows[2][5], self.course.title)
+        self.assertEqual(rows[1][5], '')
+        self.assertEqual(rows[1][8], '10.50')
+
+    def test_ndjson_honours_filter(self):
+        response, content = self.export(f'?format=ndjson&course={self.course.pk}')
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        lines = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0]['id'], self.course_payment.pk)
+        self.assertEqual(lines[0]['user_email'], self.user.email)
+        self.assertEqual(lines[0]['amount'], '500.00')
+
+    def test_export_for_staff_only(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(reverse('payment-export') + '?format=ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertIn('detail', json.loads(response.content))
+
+
+class PaymentListTests(APITestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_superuser(email='ledger@example.com', password='ledgerpass')
+        self.user = CustomUser.objects.create(email='payer@example.com')
+        self.own = [
+            Payment.objects.create(user=self.user, amount=Decimal('100.00'), payment_method='card') for _ in range(3)
+        ]
+        self.other = Payment.objects.create(user=self.admin, amount=Decimal('50.00'), payment_method='cash')
+        self.url = reverse('payment-list')
+
+    def test_user_sees_own_payments(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({payment['id'] for payment in response.data['results']}, {p.pk for p in self.own})
+
+    def test_cursor_pages_newest_first(self):
+        self.client.force_authenticate(user=self.admin)
+
+        response = self.client.get(self.url + '?pagination=cursor&page_size=3')
+        seen = [payment['id'] for payment in response.data['results']]
+        response = self.client.get(response.data['next'])
+        seen.extend(payment['id'] for payment in response.data['results'])
+
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(seen, [self.other.pk] + [payment.pk for payment in reversed(self.own)])
+
+    def test_cursor_mode_rejects_custom_ordering(self):
+        self.client.force_authenticate(user=self.admin)
+
+        response = self.client.get(self.url + '?pagination=cursor&ordering=date_asc')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ordering', response.data)
+        self.assertEqual(self.client.get(self.url + '?ordering=date_asc').status_code, status.HTTP_200_OK)
+
+
+class RevenueRollupTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(email='buyer@example.com')
+        self.course = Course.objects.create(title='Курс', price=Decimal('500.00'))
+        self.today = timezone.localdate()
+        self.pay(Decimal('500.00'), 'card', days_ago=1, paid_course=self.course)
+        self.pay(Decimal('200.00'), 'cash', days_ago=1, paid_course=self.course)
+        self.pay(Decimal('100.00'), 'transfer', days_ago=3)
+        self.pay(Decimal('999.00'), 'card', days_ago=1, status='failed', paid_course=self.course)
+
+    def pay(self, amount, method, days_ago=0, **fields):
+        fields.setdefault('status', 'paid')
+        payment = Payment.objects.create(user=self.user, amount=amount, payment_method=method, **fields)
+        # payment_date заполняется auto_now_add; свёртка берёт платежи старше FOLD_LAG
+        Payment.objects.filter(pk=payment.pk).update(
+            payment_date=timezone.now() - timedelta(days=days_ago, minutes=5)
+        )
+        return payment
+
+    def report(self, **params):
+        return rollups.report(self.today - timedelta(days=6), self.today, **params)
+
+    def test_fold_only_new_payments(self):
+        self.assertEqual(rollups.fold(batch_size=2), 3)
+        self.assertEqual(rollups.fold(), 0)
+        self.pay(Decimal('50.00'), 'cash', days_ago=0)
+
+        self.assertEqual(tasks.refresh_revenue_rollups.apply().get(), 1)
+
+        report = self.report()
+        self.assertEqual((report['total'], report['count']), (Decimal('850.00'), 4))
+        self.assertEqual(report['by_payment_method'],
+                         {'card': Decimal('500.00'), 'cash': Decimal('250.00'), 'transfer': Decimal('100.00')})
+        self.assertEqual(self.report(course=self.course.pk)['total'], Decimal('700.00'))
+        days = {point['day']: point['total'] for point in report['series']}
+        self.assertEqual(len(days), 7)
+        self.assertEqual(days[self.today - timedelta(days=3)], Decimal('100.00'))
+
+    def test_payment_paid_after_fold_counted_once(self):
+        payment = self.pay(Decimal('300.00'), 'card', days_ago=1, status='pending', stripe_session_id='cs_late')
+        rollups.fold()
+
+        self.assertEqual(tasks.apply_payment_status('cs_late', 'paid'), 1)
+        rollups.fold()
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'paid')
+        self.assertEqual(self.report(payment_method='card')['total'], Decimal('800.00'))
+
+    def test_rebuild_fixes_drift(self):
+        rollups.fold()
+        CourseDailyRevenue.objects.update(total=Decimal('1.00'))
+
+        call_command('rebuild_revenue_rollups', stdout=io.StringIO())
+
+        self.assertEqual(self.report(course=self.course.pk)['total'], Decimal('700.00'))
+        self.assertEqual(self.report()['count'], 3)
+
+    def test_endpoint_reads_rollups_only(self):
+        rollups.fold()
+        self.client.force_authenticate(user=CustomUser.objects.create_superuser(email='cfo@example.com', password='x'))
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('revenue'), {'course': self.course.pk})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], '700.00')
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(len(response.data['series']), 30)
+        self.assertNotIn('by_payment_method', response.data)
+
+        response = self.client.get(reverse('revenue'), {'course': self.course.pk, 'lesson': 1})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_endpoint_for_staff_only(self):
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(reverse('revenue'))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class AsyncPaymentViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stripe = cls.enterClassContext(LocalStripeServer())
+        cls.enterClassContext(cls.stripe.settings())
+
+    def setUp(self):
+        cache.clear()
+        stripe_service._local_ids.clear()
+        self.stripe.reset()
+        self.user = CustomUser.objects.create(email='async@example.com')
+        self.course = Course.objects.create(title='Курс', price=Decimal('500.00'))
+        self.auth = {'headers': {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}}
+
+    async def test_create_and_status(self):
+        response = await self.async_client.post(
+            reverse('payment-create-async'), {'course_id': self.course.id}, content_type='application/json', **self.auth
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        payment = await Payment.objects.aget(pk=response.json()['payment_id'])
+        self.assertEqual(payment.payment_url, response.json()['payment_url'])
+        self.assertIn(payment.stripe_session_id, self.stripe.objects)
+
+        response = await self.async_client.get(reverse('payment-status-async', kwargs={'pk': payment.pk}), **self.auth)
+        self.assertEqual(response.json(), {'payment_id': payment.pk, 'status': 'pending'})
+        await stripe_service.get_stripe_client().aclose()
+
+    async def test_requires_token(self):
+        response = await self.async_client.post(reverse('payment-create-async'), {'course_id': self.course.id})
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_malformed_header_is_unauthorized(self):
+        response = await self.async_client.post(
+            reverse('payment-create-async'), {'course_id': self.course.id}, content_type='application/json',
+            headers={'Authorization': 'Bearer a b'},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_invalid_body_is_bad_request(self):
+        for body in ([], {'course_id': 'abc'}, {'course_id': [1]}):
+            with self.subTest(body=body):
+                response = await self.async_client.post(
+                    reverse('payment-create-async'), body, content_type='application/json', **self.auth
+                )
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_other_users_payment_forbidden(self):
+        other = await CustomUser.objects.acreate(email='other@example.com')
+        payment = await Payment.objects.acreate(user=other, amount=100, payment_method='card')
+
+        response = await self.async_client.get(reverse('payment-status-async', kwargs={'pk': payment.pk}), **self.auth)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
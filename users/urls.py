@@ -1,6 +1,8 @@
 from rest_framework.routers import DefaultRouter
-from .views import PaymentViewSet, PaymentCreateAPIView, PaymentStatusAPIView, PaymentSuccessView, PaymentCancelView
+from .views import PaymentViewSet, PaymentCreateAPIView, PaymentStatusAPIView, PaymentSuccessView, PaymentCancelView, \
+    StripeWebhookView, RevenueAPIView
 from django.urls import path
+from .async_views import AsyncPaymentCreateView, AsyncPaymentStatusView
 from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
     UserListView,
@@ -17,7 +19,13 @@ urlpatterns = [
     path('users/<int:pk>/', UserDetailView.as_view(), name='user-detail'),
     path('me/', UserDetailView.as_view(), name='current-user'),
     path('payments/', PaymentCreateAPIView.as_view(), name='payment-create'),
+    path('payments/webhook/', StripeWebhookView.as_view(), name='stripe-webhook'),
+    path('payments/history/', PaymentViewSet.as_view({'get': 'list'}), name='payment-list'),
+    path('payments/export/', PaymentViewSet.as_view({'get': 'export'}, **PaymentViewSet.export.kwargs), name='payment-export'),
     path('payments/<int:pk>/', PaymentStatusAPIView.as_view(), name='payment-status'),
-    path('payments/<int:pk>/success/', PaymentSuccessView, name='payment-success'),
-    path('payments/<int:pk>/cancel/', PaymentCancelView, name='payment-cancel'),
+    path('payments/async/', AsyncPaymentCreateView.as_view(), name='payment-create-async'),
+    path('payments/async/<int:pk>/', AsyncPaymentStatusView.as_view(), name='payment-status-async'),
+    path('revenue/', RevenueAPIView.as_view(), name='revenue'),
+    path('payments/<int:pk>/success/', PaymentSuccessView.as_view(), name='payment-success'),
+    path('payments/<int:pk>/cancel/', PaymentCancelView.as_view(), name='payment-cancel'),
 ]
\ No newline at end of file
@@ -1,20 +1,29 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.urls import reverse
 from django.views import View
 from rest_framework import viewsets, generics, permissions, status
+from rest_framework.decorators import action
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
 
-from .models import Payment
+from .models import Payment, StripeEvent
 from .serializers import PaymentSerializer
 from .filters import PaymentFilter
+from .exports import CSVRenderer, NDJSONRenderer
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView
 from .models import CustomUser
-from .serializers import UserSerializer, RegisterSerializer, CustomTokenObtainPairSerializer
+from .serializers import UserSerializer, RegisterSerializer, CustomTokenObtainPairSerializer, \
+    RevenueQuerySerializer, RevenueSerializer
+from .rollups import report
 from config.lms.models import Course
-from config.lms.services.stripe_service import get_stripe_session, create_stripe_product, create_stripe_price, \
-    create_stripe_session
+from config.lms.paginators import PaymentPaginator
+from config.lms.services.stripe_client import StripeUnavailable
+from config.lms.services.stripe_service import get_stripe_price_id, create_stripe_session, construct_webhook_event
+from .tasks import process_stripe_event
 
 
 class PaymentViewSet(viewsets.ModelViewSet):
@@ -22,6 +31,26 @@ class PaymentViewSet(viewsets.ModelViewSet):
     serializer_class = PaymentSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = PaymentFilter
+    pagination_class = PaymentPaginator
+
+    def get_queryset(self):
+        # Администратор видит все платежи, пользователь - только свои
+        queryset = super().get_queryset()
+        if self.request.user.is_staff:
+            return queryset
+        return queryset.filter(user=self.request.user)
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser],
+            renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        """Все платежи с фильтрами PaymentFilter потоком CSV или NDJSON (?format=csv|ndjson)"""
+        queryset = self.filter_queryset(self.get_queryset())
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(queryset), content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
+        response['Content-Disposition'] = f'attachment; filename="payments.{renderer.format}"'
+        return response
 
 class UserListView(generics.ListAPIView):
     queryset = CustomUser.objects.all()
@@ -70,15 +99,15 @@ class PaymentCreateAPIView(generics.CreateAPIView):
         # Создаем запись о платеже
         payment = Payment.objects.create(
             user=request.user,
-            course=course,
+            paid_course=course,
             amount=course.price,
+            payment_method='card',
             status='pending'
         )
 
-        # Создаем продукт и цену в Stripe
         try:
-            product = create_stripe_product(course)
-            price = create_stripe_price(product.id, float(course.price))
+            # Продукт и цена берутся из кэша: к Stripe идёт только запрос на создание сессии
+            price_id = get_stripe_price_id(course, course.price)
 
             # Создаем сессию оплаты
             success_url = request.build_absolute_uri(
@@ -89,17 +118,16 @@ class PaymentCreateAPIView(generics.CreateAPIView):
             )
 
             session = create_stripe_session(
-                price.id,
+                price_id,
                 success_url,
                 cancel_url
             )
 
             # Обновляем платеж
-            payment.stripe_product_id = product.id
-            payment.stripe_price_id = price.id
+            payment.stripe_price_id = price_id
             payment.stripe_session_id = session.id
             payment.payment_url = session.url
-            payment.save()
+            payment.save(update_fields=['stripe_price_id', 'stripe_session_id', 'payment_url'])
 
             return Response({
                 'payment_id': payment.id,
@@ -107,6 +135,13 @@ class PaymentCreateAPIView(generics.CreateAPIView):
                 'status': 'pending'
             }, status=status.HTTP_201_CREATED)
 
+        except StripeUnavailable as e:
+            payment.status = 'failed'
+            payment.save(update_fields=['status'])
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
         except Exception as e:
             payment.status = 'failed'
             payment.save()
@@ -116,37 +151,60 @@ class PaymentCreateAPIView(generics.CreateAPIView):
             )
 
 class PaymentStatusAPIView(generics.RetrieveAPIView):
+    """Статус платежа из базы. Его обновляют вебхуки Stripe и фоновая сверка (reconcile_pending_payments)."""
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
-    queryset = Payment.objects.all()
+    queryset = Payment.objects.only('id', 'user_id', 'status')
 
     def get(self, request, *args, **kwargs):
         payment = self.get_object()
-        if payment.user != request.user:
+        if payment.user_id != request.user.id:
             return Response(
                 {'error': 'Доступ запрещен'},
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        # Проверяем статус в Stripe
-        try:
-            session = get_stripe_session(payment.stripe_session_id)
-            if session.payment_status == 'paid':
-                payment.status = 'paid'
-                payment.save()
+        return Response({
+            'payment_id': payment.id,
+            'status': payment.status,
+        })
 
-            return Response({
-                'payment_id': payment.id,
-                'status': payment.status,
-                'stripe_status': session.payment_status
-            })
 
-        except Exception as e:
+class StripeWebhookView(APIView):
+    """Приём вебхуков Stripe: событие сохраняется один раз и обрабатывается в Celery"""
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        event = construct_webhook_event(request.body, request.META.get('HTTP_STRIPE_SIGNATURE', ''))
+        if event is None:
             return Response(
-                {'error': str(e)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {'error': 'Неверная подпись'},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
+        # Stripe повторяет доставку, пока не получит 2xx: дубликат подтверждаем без повторной обработки
+        stored, created = StripeEvent.objects.get_or_create(
+            event_id=event['id'],
+            defaults={'type': event['type'], 'payload': event},
+        )
+        if created:
+            transaction.on_commit(lambda: process_stripe_event.delay(stored.pk))
+        return Response({'received': True})
+
+
+class RevenueAPIView(APIView):
+    """Выручка за период из таблиц дневной выручки, без чтения платежей.
+
+    ?date_from=&date_to= (по умолчанию последние 30 дней) и один из course, lesson, payment_method.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        query = RevenueQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        return Response(RevenueSerializer(report(**query.validated_data)).data)
+
 
 class PaymentSuccessView(View):
     def get(self, request, pk):